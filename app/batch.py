@@ -0,0 +1,157 @@
+"""
+batch.py
+
+Forecasts for many locations in one request (POST /weather/batch), for dashboards.
+
+- Every location is resolved to its canonical location (locations.py), so spellings of the same
+  place share stored days and forecasts.
+- Known spellings are looked up locally and their stored days read with one IN + date range
+  query, before any upstream call. Locations with every requested day stored are streamed at once.
+- The rest (new spellings, days missing inside the forecast window) are resolved and fetched from
+  weatherapi.com concurrently, at most BATCH_CONCURRENCY calls at a time (through the shared
+  forecast cache), and each is streamed as soon as it finishes.
+- Upstream calls wait up to BATCH_RATE_LIMIT_MAX_WAIT_SECONDS for a rate limit token (limits.py),
+  so a large cold batch runs at the weatherapi refill rate instead of failing once the burst is spent.
+- Newly fetched days are read back after the insert, so every returned day has its id.
+- Results are streamed as NDJSON, one schemas.WeatherBatchResult line per location,
+  in the order locations finish. A failing location gets status "error" and doesn't affect the rest.
+"""
+
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+
+import httpx
+
+import app.schemas as schemas
+from app.clients import get_forecast, parse_forecast_day
+from app.crud import get_weather_for_locations, insert_weather_rows
+from app.database import run_in_session
+from app.location_index import location_index
+from app.locations import lookup_location, resolve_location
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("BATCH_RATE_LIMIT_MAX_WAIT_SECONDS", "60"))
+
+# forecast.json?days=5 covers today + 4 days
+FORECAST_DAYS = 5
+
+
+def _read_stored(db, names, start_date, end_date):
+    return {
+        name: {row.date: schemas.WeatherResponse.model_validate(row) for row in rows}
+        for name, rows in get_weather_for_locations(db, names, start_date, end_date).items()
+    }
+
+
+def _read_known(db, locations, start_date, end_date):
+    # ({location: ResolvedLocation} for spellings already known, their stored days); no upstream calls
+    known = {location: lookup_location(db, location) for location in locations}
+    known = {location: place for location, place in known.items() if place is not None}
+    names = list(dict.fromkeys(place.name for place in known.values()))
+    return known, _read_stored(db, names, start_date, end_date)
+
+
+def _save_new_days(db, name, new_rows, start_date, end_date):
+    # Inserts the fetched days and returns the stored ones with their ids
+    insert_weather_rows(db, new_rows)
+    return _read_stored(db, [name], start_date, end_date)[name]
+
+
+async def stream_batch_forecast(batch: schemas.WeatherBatchRequest, client: httpx.AsyncClient, api_key: str):
+    locations = list(dict.fromkeys(batch.locations))
+    requested = [
+        batch.start_date + timedelta(days=i) for i in range((batch.end_date - batch.start_date).days + 1)
+    ]
+    today = date.today()
+    window_end = today + timedelta(days=FORECAST_DAYS - 1)
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    def missing_days(rows):
+        # Only days the forecast can provide are worth an upstream call
+        return [day for day in requested if day not in rows and today <= day <= window_end]
+
+    def line(result):
+        return result.model_dump_json() + "\n"
+
+    # Invalid input is reported on that location's line straight away
+    valid = []
+    for location in locations:
+        try:
+            schemas.WeatherRequest(location=location, start_date=batch.start_date, end_date=batch.end_date)
+        except Exception as e:
+            yield line(schemas.WeatherBatchResult(location=location, status="error", error=str(e)))
+        else:
+            valid.append(location)
+
+    # DB work runs in worker threads (run_in_session), never on the event loop
+    known, stored = await run_in_session(_read_known, valid, batch.start_date, batch.end_date)
+
+    # Known locations with every day stored don't wait for anyone else's upstream calls
+    cold = []
+    for location in valid:
+        place = known.get(location)
+        if place is not None and not missing_days(stored[place.name]):
+            rows = stored[place.name]
+            yield line(schemas.WeatherBatchResult(
+                location=location, status="ok", weather=[rows[day] for day in sorted(rows)]
+            ))
+        else:
+            cold.append(location)
+
+    async def fetch_location(location):
+        try:
+            place = known.get(location)
+            if place is not None:
+                rows = stored[place.name]
+            else:
+                # New spelling; errors (e.g. over the weatherapi quota) end up on this location's line
+                async with slots:
+                    place = await resolve_location(client, api_key, location, BATCH_RATE_LIMIT_MAX_WAIT_SECONDS)
+                if place is None:
+                    raise LookupError(f"Location '{location}' not found or invalid.")
+                rows = (await run_in_session(_read_stored, [place.name], batch.start_date, batch.end_date))[place.name]
+
+            missing = missing_days(rows)
+            if missing:
+                if not api_key:
+                    raise RuntimeError("Server missing WEATHER_API_KEY configuration.")
+                async with slots:
+                    forecast_days = await get_forecast(
+                        client, api_key, place.query, days=FORECAST_DAYS, max_wait=BATCH_RATE_LIMIT_MAX_WAIT_SECONDS
+                    )
+                if not forecast_days and not rows:
+                    raise LookupError(f"Location '{location}' not found or invalid.")
+
+                fetched_at = datetime.utcnow()
+                new_rows = [
+                    {
+                        "location": place.name,
+                        "location_id": place.id,
+                        "date": datetime.strptime(forecast_day["date"], "%Y-%m-%d").date(),
+                        **parse_forecast_day(forecast_day),
+                        "fetched_at": fetched_at,
+                    }
+                    for forecast_day in forecast_days
+                ]
+                new_rows = [row for row in new_rows if row["date"] in missing]
+                if new_rows:
+                    rows.update(await run_in_session(
+                        _save_new_days, place.name, new_rows, batch.start_date, batch.end_date
+                    ))
+                    location_index.add([place.name])
+
+            return schemas.WeatherBatchResult(
+                location=location, status="ok", weather=[rows[day] for day in sorted(rows)]
+            )
+        except Exception as e:
+            return schemas.WeatherBatchResult(location=location, status="error", error=str(e))
+
+    tasks = [asyncio.ensure_future(fetch_location(location)) for location in cold]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield line(await done)
+    finally:
+        # Client disconnected: don't keep fetching for nobody
+        for task in tasks:
+            task.cancel()
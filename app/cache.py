@@ -0,0 +1,78 @@
+"""
+cache.py
+
+Small in-process caches shared by the app.
+
+LRUCache:
+- Thread-safe, bounded dictionary that evicts the least recently used entry.
+- Optional ttl (seconds): entries older than that are treated as missing.
+- Used in front of DB-backed caches so repeat lookups never leave the process.
+
+SingleFlight:
+- Concurrent async callers asking for the same key share one in-flight call
+  instead of each making their own upstream request.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires_at, value = self._data[key]
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        # Removes every entry whose value matches predicate(value)
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}  # key -> asyncio.Task
+
+    async def do(self, key, fn):
+        # fn is an async callable; only the first caller for `key` runs it
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the call other requests are waiting on
+        return await asyncio.shield(task)
@@ -0,0 +1,209 @@
+"""
+clients.py
+
+Outbound HTTP calls to weatherapi.com and the YouTube Data API.
+
+- One pooled httpx.AsyncClient is created in the FastAPI lifespan and shared by every request,
+  so TLS connections are kept alive and reused instead of opened per call.
+- Connect/read timeouts and pool limits come from environment variables.
+- HTTP/2 is enabled through `h2` (installed by httpx[http2] in requirements.txt); an install without it
+  falls back to HTTP/1.1.
+- Pass `transport=httpx.MockTransport(handler)` to create_http_client to run against local fakes.
+- Forecasts are cached per normalized location for FORECAST_CACHE_TTL_SECONDS, in process and in
+  the cache shared by all workers (shared_cache.py); concurrent misses for the same location share
+  one upstream request, across workers too.
+- Every call is timed and failures are counted per dependency (see metrics.py).
+- Every call takes a token from the service's bucket first (see limits.py); UpstreamRateLimited
+  is raised when the bucket is empty or the service answers 429 (or, for YouTube, 403 quotaExceeded,
+  which also closes the bucket for YOUTUBE_QUOTA_RETRY_SECONDS). Other YouTube errors raise
+  httpx.HTTPStatusError, so a failed search is never mistaken for "no videos".
+"""
+
+import importlib.util
+import os
+
+import httpx
+
+from app.limits import upstream_limiter, UpstreamRateLimited, RATE_LIMIT_MAX_WAIT_SECONDS
+from app.metrics import track_dependency, upstream_errors, record_cache
+from app.shared_cache import TieredCache
+
+WEATHER_API_BASE_URL = os.environ.get("WEATHER_API_BASE_URL", "https://api.weatherapi.com/v1")
+YOUTUBE_API_BASE_URL = os.environ.get("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# weatherapi.com refreshes forecasts a few times a day, an hour old forecast is still current
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get("FORECAST_CACHE_TTL_SECONDS", "3600"))
+FORECAST_CACHE_SIZE = int(os.environ.get("FORECAST_CACHE_SIZE", "2048"))
+
+# The YouTube daily quota resets at midnight Pacific time; no point asking again much sooner
+YOUTUBE_QUOTA_RETRY_SECONDS = float(os.environ.get("YOUTUBE_QUOTA_RETRY_SECONDS", "3600"))
+YOUTUBE_QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded", "rateLimitExceeded", "userRateLimitExceeded"}
+
+
+async def _check_rate_limit(service: str, response: httpx.Response):
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", "60"))
+        except ValueError:
+            retry_after = 60.0
+        # Every worker shares the bucket, so they all wait out the Retry-After
+        await upstream_limiter.penalize(service, retry_after)
+        raise UpstreamRateLimited(service, retry_after)
+
+
+def _count_http_error(dependency: str, response: httpx.Response):
+    # 429s raise UpstreamRateLimited and are counted by track_dependency
+    if response.is_error and response.status_code != 429:
+        upstream_errors.inc(dependency=dependency, error=f"http_{response.status_code}")
+
+
+def create_http_client(transport: httpx.AsyncBaseTransport = None) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(
+        connect=HTTP_CONNECT_TIMEOUT,
+        read=HTTP_READ_TIMEOUT,
+        write=HTTP_READ_TIMEOUT,
+        pool=HTTP_CONNECT_TIMEOUT,
+    )
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=limits,
+        http2=transport is None and importlib.util.find_spec("h2") is not None,
+        transport=transport,
+    )
+
+
+# -------------------------------
+# weatherapi.com
+# -------------------------------
+async def search_places(client: httpx.AsyncClient, api_key: str, q: str,
+                        max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS):
+    # Returns search.json matches as sent (name, region, country, lat, lon), best match first
+    # max_wait: how long to wait for a rate limit token (limits.py)
+    await upstream_limiter.acquire("weatherapi", max_wait)
+    with track_dependency("weatherapi_search"):
+        response = await client.get(f"{WEATHER_API_BASE_URL}/search.json", params={"key": api_key, "q": q})
+        _count_http_error("weatherapi_search", response)
+        await _check_rate_limit("weatherapi", response)
+        response.raise_for_status()
+        return response.json()
+
+
+def format_place(place: dict):
+    # "City, Region" as shown in the autocomplete dropdown
+    return place["name"] + (", " + place["region"] if place.get("region") else "")
+
+
+async def search_locations(client: httpx.AsyncClient, api_key: str, q: str):
+    # Returns "City, Region" strings for the autocomplete dropdown
+    return [format_place(place) for place in await search_places(client, api_key, q)]
+
+
+async def fetch_forecast(client: httpx.AsyncClient, api_key: str, location: str, days: int = 5,
+                         max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS):
+    # Returns the list of forecastday entries (empty if the location is unknown)
+    await upstream_limiter.acquire("weatherapi", max_wait)
+    with track_dependency("weatherapi_forecast"):
+        response = await client.get(
+            f"{WEATHER_API_BASE_URL}/forecast.json",
+            params={"key": api_key, "q": location, "days": days}
+        )
+        _count_http_error("weatherapi_forecast", response)
+        await _check_rate_limit("weatherapi", response)
+        # 4xx is how weatherapi.com says "no such location" (empty result); 5xx is a failure
+        if response.status_code >= 500:
+            response.raise_for_status()
+        api_data = response.json()
+    return api_data.get("forecast", {}).get("forecastday", [])
+
+
+def parse_forecast_day(forecast_day: dict):
+    # Weather columns from one forecastday entry
+    forecast = forecast_day["day"]
+    return {
+        "temperature": forecast["avgtemp_c"],
+        "description": forecast.get("condition", {}).get("text", "No data"),
+        "humidity": forecast.get("avghumidity"),
+        "wind_speed": forecast.get("maxwind_kph"),
+    }
+
+
+# "<normalized location>|<days>" -> forecastday entries, tagged with the normalized location
+forecast_cache = TieredCache("forecast", maxsize=FORECAST_CACHE_SIZE, ttl=FORECAST_CACHE_TTL_SECONDS)
+
+def normalize_location(location: str) -> str:
+    # "San Ramon, California" and " san ramon,  california " share a cache entry
+    return " ".join(location.lower().split())
+
+
+async def remember_forecast(location: str, days: int, forecast_days):
+    await forecast_cache.aset(f"{normalize_location(location)}|{days}", forecast_days, tag=normalize_location(location))
+
+
+async def get_forecast(client: httpx.AsyncClient, api_key: str, location: str, days: int = 5,
+                       max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS):
+    # Cached + single-flight wrapper around fetch_forecast
+    key = f"{normalize_location(location)}|{days}"
+    forecast_days = await forecast_cache.aget(key)
+    record_cache("forecast", forecast_days is not None)
+    if forecast_days is not None:
+        return forecast_days
+
+    # Unknown locations come back empty; don't remember those
+    return await forecast_cache.fetch(
+        key, lambda: fetch_forecast(client, api_key, location, days, max_wait), tag=normalize_location(location), cacheable=bool
+    )
+
+
+# -------------------------------
+# YouTube Data API v3
+# -------------------------------
+async def _check_youtube_quota(response: httpx.Response):
+    # YouTube reports an exhausted quota as 403 with the reason in the error body, not as 429
+    if response.status_code != 403:
+        return
+    try:
+        errors = response.json()["error"]["errors"]
+    except (ValueError, KeyError, TypeError):
+        return
+    if any(error.get("reason") in YOUTUBE_QUOTA_REASONS for error in errors):
+        await upstream_limiter.penalize("youtube", YOUTUBE_QUOTA_RETRY_SECONDS)
+        raise UpstreamRateLimited("youtube", YOUTUBE_QUOTA_RETRY_SECONDS)
+
+
+async def fetch_youtube_videos(client: httpx.AsyncClient, api_key: str, location: str, max_results: int = 4):
+    await upstream_limiter.acquire("youtube")
+    with track_dependency("youtube"):
+        response = await client.get(
+            f"{YOUTUBE_API_BASE_URL}/search",
+            params={
+                "part": "snippet",
+                "q": location,
+                "type": "video",
+                "maxResults": max_results,
+                "key": api_key
+            }
+        )
+        _count_http_error("youtube", response)
+        await _check_rate_limit("youtube", response)
+        await _check_youtube_quota(response)
+        response.raise_for_status()
+        yt_data = response.json()
+    return [
+        {
+            "title": item["snippet"]["title"],
+            "thumbnail": item["snippet"]["thumbnails"]["medium"]["url"],
+            "video_url": f"https://www.youtube.com/watch?v={item['id']['videoId']}"
+        }
+        for item in yt_data.get("items", [])
+    ]
@@ -1,18 +1,27 @@
+from sqlalchemy import inspect, text, func, tuple_
 from sqlalchemy.orm import Session
-from datetime import date
+from datetime import date, datetime
 from . import models, schemas
-from app.utils import weather_prompt_template
-from groq import Groq
-from langchain_groq import ChatGroq
+from app.clients import normalize_location
+from app.database import run_in_session
+from app.limits import upstream_limiter
+from app.metrics import track_dependency, record_cache, llm_tokens, llm_summary_failures
+from app.shared_cache import TieredCache
+from app.stats import refresh_weather_stats
+from app.utils import get_weather_prompt_template, get_weather_batch_prompt_template
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.output_parsers import PydanticOutputParser
-from pydantic import BaseModel
+from functools import lru_cache
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import logging
 import os
 
 # Load API key from .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # -------------------------------
 # CREATE: Add weather records
 # -------------------------------
@@ -20,8 +29,10 @@ load_dotenv()
 # Adds it to the database.
 # Returns the created record.
 def create_weather(db: Session, weather_data: schemas.WeatherResponse):
+    location = get_locations_for_names(db, [weather_data.location])[weather_data.location]
     db_weather = models.Weather(
-        location=weather_data.location,
+        location=location.name,
+        location_id=location.id,
         date=weather_data.date,
         temperature=weather_data.temperature,
         description=weather_data.description,
@@ -29,11 +40,36 @@ def create_weather(db: Session, weather_data: schemas.WeatherResponse):
         wind_speed=weather_data.wind_speed
     )
     db.add(db_weather)
+    weather_changed(db, [(db_weather.location, db_weather.date)])
     db.commit()
     db.refresh(db_weather)
     return db_weather
 
 
+# -------------------------------
+# Change tracking: every write to Weather goes through weather_changed (before its commit)
+# -------------------------------
+def bump_table_version(db: Session, name: str):
+    updated = db.query(models.TableVersion).filter(models.TableVersion.name == name)\
+        .update({"version": models.TableVersion.version + 1, "updated_at": datetime.utcnow()},
+                synchronize_session=False)
+    if not updated:
+        db.add(models.TableVersion(name=name, version=1, updated_at=datetime.utcnow()))
+
+
+def get_table_version(db: Session, name: str):
+    # (version, updated_at); a table that was never written to is version 0
+    row = db.query(models.TableVersion.version, models.TableVersion.updated_at)\
+        .filter(models.TableVersion.name == name).first()
+    return (row.version, row.updated_at) if row else (0, datetime(1970, 1, 1))
+
+
+def weather_changed(db: Session, keys):
+    # keys: (location, date) of every row inserted, updated or deleted
+    refresh_weather_stats(db, keys)
+    bump_table_version(db, "weather")
+
+
 # -------------------------------
 # READ: Get weather for location + date range
 # -------------------------------
@@ -46,6 +82,267 @@ def get_weather(db: Session, location: str, start_date: date, end_date: date):
         .all()
 
 
+# -------------------------------
+# READ: Get weather for many locations + date range
+# -------------------------------
+# One IN + range query; returns {location: [rows ordered by date]}
+def get_weather_for_locations(db: Session, locations: list, start_date: date, end_date: date):
+    found = {location: [] for location in locations}
+    rows = db.query(models.Weather)\
+        .filter(models.Weather.location.in_(locations))\
+        .filter(models.Weather.date.between(start_date, end_date))\
+        .order_by(models.Weather.location, models.Weather.date)
+    for row in rows:
+        found[row.location].append(row)
+    return found
+
+
+# -------------------------------
+# READ: Filtered listing ordered by id (keyset pagination)
+# -------------------------------
+# Every filter is optional; after_id is the cursor from the previous page.
+# Returns a query so callers can .limit() it or stream it with .yield_per().
+def list_weather(db: Session, location: str = None, start_date: date = None, end_date: date = None,
+                 after_id: int = None):
+    query = db.query(models.Weather)
+    if location:
+        query = query.filter(models.Weather.location == location)
+    if start_date:
+        query = query.filter(models.Weather.date >= start_date)
+    if end_date:
+        query = query.filter(models.Weather.date <= end_date)
+    if after_id is not None:
+        query = query.filter(models.Weather.id > after_id)
+    return query.order_by(models.Weather.id)
+
+
+# -------------------------------
+# BULK CREATE: Insert many weather rows in one transaction
+# -------------------------------
+# Takes a list of dicts with Weather columns.
+# Rows whose (location_id, date) already exists are skipped, so racing requests can't duplicate days.
+# Rows without a location_id are keyed on the canonical location of their name (see _with_locations).
+def _dialect_insert(db: Session, model):
+    # INSERT that supports ON CONFLICT for the database in use
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def insert_weather_rows(db: Session, rows: list):
+    if not rows:
+        return
+    rows = _with_locations(db, rows)
+    stmt = _dialect_insert(db, models.Weather).values(rows)\
+        .on_conflict_do_nothing(index_elements=["location_id", "date"])
+    result = db.execute(stmt)
+    # Every day already existed: nothing changed
+    if result.rowcount != 0:
+        weather_changed(db, [(row["location"], row["date"]) for row in rows])
+    db.commit()
+
+
+# Insert new days and refresh existing ones with newer forecast values.
+# Rows edited by hand (fetched_at is NULL) are left alone.
+def upsert_weather_rows(db: Session, rows: list):
+    if not rows:
+        return
+    rows = _with_locations(db, rows)
+    stmt = _dialect_insert(db, models.Weather).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["location_id", "date"],
+        set_={
+            column: stmt.excluded[column]
+            for column in ("temperature", "description", "humidity", "wind_speed", "fetched_at")
+        },
+        where=models.Weather.fetched_at.isnot(None)
+    )
+    db.execute(stmt)
+    weather_changed(db, [(row["location"], row["date"]) for row in rows])
+    db.commit()
+
+
+# -------------------------------
+# BULK IMPORT: observations and corrections (POST /weather/import)
+# -------------------------------
+# Inserts new days and overwrites existing ones, edited by hand or not; an empty (None) description,
+# humidity or wind_speed keeps the stored value, as in /weather/update. Imported rows are marked as
+# edited (fetched_at NULL) so the background refresh leaves them alone. One transaction.
+def import_weather_rows(db: Session, rows: list):
+    if not rows:
+        return
+    # The same day twice in one statement: the last one wins
+    rows = list({(row["location_id"], row["date"]): row for row in _with_locations(db, rows)}.values())
+    stmt = _dialect_insert(db, models.Weather)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["location_id", "date"],
+        set_={
+            "temperature": stmt.excluded.temperature,
+            "description": func.coalesce(stmt.excluded.description, models.Weather.description),
+            "humidity": func.coalesce(stmt.excluded.humidity, models.Weather.humidity),
+            "wind_speed": func.coalesce(stmt.excluded.wind_speed, models.Weather.wind_speed),
+            "fetched_at": None,
+        }
+    )
+    # executemany: one cached statement, instead of compiling a VALUES list per chunk
+    db.execute(stmt, [{**row, "fetched_at": None} for row in rows])
+    keys = [(row["location"], row["date"]) for row in rows]
+    weather_changed(db, keys)
+    invalidate_summary_caches(db, keys)
+    db.commit()
+
+
+# Locations with forecast rows in [start_date, end_date] loaded before `fetched_before`
+def get_stale_locations(db: Session, start_date: date, end_date: date, fetched_before: datetime):
+    return [
+        location for (location,) in db.query(models.Weather.location)
+        .filter(models.Weather.date.between(start_date, end_date))
+        .filter(models.Weather.fetched_at < fetched_before)
+        .distinct()
+    ]
+
+
+# -------------------------------
+# Known locations (autocomplete index)
+# -------------------------------
+def get_known_locations(db: Session):
+    # Names from past autocomplete results plus every location that has weather rows
+    names = {name for (name,) in db.query(models.KnownLocation.name)}
+    names.update(name for (name,) in db.query(models.Weather.location).distinct())
+    return names
+
+
+def save_known_locations(db: Session, names):
+    if not names:
+        return
+    stmt = _dialect_insert(db, models.KnownLocation).values([{"name": name} for name in names])\
+        .on_conflict_do_nothing(index_elements=["name"])
+    db.execute(stmt)
+    db.commit()
+
+
+# -------------------------------
+# Canonical locations (resolution lives in app/locations.py)
+# -------------------------------
+def get_location_by_alias(db: Session, alias: str):
+    return db.query(models.Location)\
+        .join(models.LocationAlias, models.LocationAlias.location_id == models.Location.id)\
+        .filter(models.LocationAlias.alias == alias)\
+        .first()
+
+
+def save_location_aliases(db: Session, location_id: int, aliases):
+    # An alias that already exists keeps pointing where it did
+    rows = [{"alias": alias, "location_id": location_id} for alias in dict.fromkeys(aliases) if alias]
+    if not rows:
+        return
+    stmt = _dialect_insert(db, models.LocationAlias).values(rows)\
+        .on_conflict_do_nothing(index_elements=["alias"])
+    db.execute(stmt)
+    db.commit()
+
+
+def save_location(db: Session, key: str, name: str, region: str = None, country: str = None,
+                  lat: float = None, lon: float = None):
+    # Returns the Location for `key`, creating it if needed. Display names are unique: when `name`
+    # is taken by another place, the country (then the key) is appended.
+    location = db.query(models.Location).filter(models.Location.key == key).first()
+    if location:
+        return location
+    candidates = [name, f"{name}, {country}" if country else None, f"{name} ({key})"]
+    for candidate in dict.fromkeys(c for c in candidates if c):
+        stmt = _dialect_insert(db, models.Location).values(
+            key=key, name=candidate, region=region, country=country, lat=lat, lon=lon,
+            created_at=datetime.utcnow()
+        ).on_conflict_do_nothing()
+        db.execute(stmt)
+        db.commit()
+        # Ours, or one a concurrent request created for the same key
+        location = db.query(models.Location).filter(models.Location.key == key).first()
+        if location:
+            return location
+    raise RuntimeError(f"No free display name for location {key}")
+
+
+def get_locations_for_names(db: Session, names):
+    # {name: Location} without any upstream call: known spellings through the alias table, any
+    # other name becomes a location of its own ("text:" key) until a backfill resolves it
+    aliases = {name: normalize_location(name) for name in names}
+    found = dict(
+        db.query(models.LocationAlias.alias, models.Location)
+        .join(models.Location, models.Location.id == models.LocationAlias.location_id)
+        .filter(models.LocationAlias.alias.in_(set(aliases.values())))
+    )
+    for name, alias in aliases.items():
+        if alias not in found:
+            location = save_location(db, "text:" + alias, " ".join(name.split()))
+            save_location_aliases(db, location.id, [alias, normalize_location(location.name)])
+            found[alias] = location
+    return {name: found[alias] for name, alias in aliases.items()}
+
+
+def _with_locations(db: Session, rows: list):
+    # Rows from callers that didn't resolve their location (seeds, imports) get the canonical
+    # location of their name, so they land on the same key as resolved ones
+    names = {row["location"] for row in rows if row.get("location_id") is None}
+    if not names:
+        return rows
+    locations = get_locations_for_names(db, names)
+    return [
+        row if row.get("location_id") is not None
+        else {**row, "location": locations[row["location"]].name, "location_id": locations[row["location"]].id}
+        for row in rows
+    ]
+
+
+# -------------------------------
+# YouTube videos per location (lookups live in app/videos.py)
+# -------------------------------
+def get_location_videos(db: Session, location_id: int):
+    return db.get(models.LocationVideos, location_id)
+
+
+def save_location_videos(db: Session, location_id: int, videos: list, fetched_at: datetime):
+    stmt = _dialect_insert(db, models.LocationVideos).values(
+        location_id=location_id, videos=videos, fetched_at=fetched_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["location_id"],
+        set_={"videos": stmt.excluded.videos, "fetched_at": stmt.excluded.fetched_at}
+    )
+    db.execute(stmt)
+    db.commit()
+
+
+# Which of several rows for the same day is kept when duplicates are merged (migrations 0001 and
+# 0005): a row edited by hand (fetched_at NULL) first, then the most recently fetched one, then the
+# oldest (the id /weather/update has been editing).
+def kept_weather_row(rows):
+    by_id = sorted(rows, key=lambda row: row.id)
+    # sorted() is stable with reverse=True too, so among equals the oldest stays first
+    return sorted(by_id, key=lambda row: (row.fetched_at is None, row.fetched_at or datetime.min), reverse=True)[0]
+
+
+# Databases created before (location, date) became unique may hold duplicate days.
+# Keeps one row of each day (same rule as kept_weather_row) and adds the index.
+def ensure_weather_unique_index(db: Session):
+    columns = {column["name"] for column in inspect(db.bind).get_columns("weather")}
+    # Databases this old have no fetched_at yet (migration 0002): the rule leaves the oldest row
+    order = "CASE WHEN fetched_at IS NULL THEN 0 ELSE 1 END, fetched_at DESC, id" \
+        if "fetched_at" in columns else "id"
+    db.execute(text(
+        "DELETE FROM weather WHERE id IN (SELECT id FROM ("
+        f"SELECT id, ROW_NUMBER() OVER (PARTITION BY location, date ORDER BY {order}) AS position FROM weather"
+        ") ranked WHERE position > 1)"
+    ))
+    db.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_weather_location_date ON weather (location, date)"
+    ))
+    db.commit()
+
+
 # -------------------------------
 # UPDATE: Update a weather record by ID
 # -------------------------------
@@ -55,8 +352,12 @@ def update_weather(db: Session, weather_id: int, update_data: dict):
     db_weather = db.query(models.Weather).filter(models.Weather.id == weather_id).first()
     if not db_weather:
         return None
+    # The old (location, date) too, in case the update moves the row
+    touched = [(db_weather.location, db_weather.date)]
     for key, value in update_data.items():
         setattr(db_weather, key, value)
+    touched.append((db_weather.location, db_weather.date))
+    weather_changed(db, touched)
     db.commit()
     db.refresh(db_weather)
     return db_weather
@@ -71,6 +372,7 @@ def delete_weather(db: Session, weather_id: int):
     if not db_weather:
         return False
     db.delete(db_weather)
+    weather_changed(db, [(db_weather.location, db_weather.date)])
     db.commit()
     return True
 
@@ -90,27 +392,405 @@ weather_schema = {
     "required": ["summary", "clothes", "precautions"]
 }
 
-# creating object of ChatGroq
-llm_model = ChatGroq(
-    model="llama-3.1-8b-instant",
-    max_tokens=250,
-    temperature=0.7
-)
-
-structured_model = llm_model.with_structured_output(weather_schema)
-
-def generate_summary_llm(location, date, temp, humidity, wind_speed, description):
-    # Inject dynamic variables into the prompt using invoke
-    prompt_value = weather_prompt_template.invoke({
-        "location": location,
-        "date": date,
-        "temp": temp,
-        "humidity": humidity,
-        "wind_speed": wind_speed,
-        "description": description,
+# Summary generation settings (can be overridden from environment)
+# SUMMARY_MODE: "parallel" -> one LLM call per day, all running at the same time
+#               "batched"  -> one LLM call with every day in a single prompt
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "parallel")
+SUMMARY_MAX_WORKERS = int(os.environ.get("SUMMARY_MAX_WORKERS", "6"))
+SUMMARY_TIMEOUT_SECONDS = float(os.environ.get("SUMMARY_TIMEOUT_SECONDS", "10"))
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", "1024"))
+# How long a summary stays in the shared cache; the summary_cache table keeps it after that
+SUMMARY_CACHE_TTL_SECONDS = float(os.environ.get("SUMMARY_CACHE_TTL_SECONDS", str(7 * 86400)))
+# SUMMARY_PROMPT: "full" or "compact" (see utils.py)
+# SUMMARY_OUTPUT_MODE: "function_calling" -> the schema is sent as a tool, the prompt needn't describe it
+#                      "json_mode"        -> JSON mode, the prompt names the keys and no schema is sent
+# Compare them with benchmarks/llm_prompts.py before switching.
+SUMMARY_PROMPT = os.environ.get("SUMMARY_PROMPT", "full")
+SUMMARY_OUTPUT_MODE = os.environ.get("SUMMARY_OUTPUT_MODE", "function_calling")
+# Output cap per day; a reply cut off by it doesn't parse and the day gets FALLBACK_SUMMARY.
+# The card shows every field in full, so the cap is sized to what the prompt asks for, not trimmed text.
+SUMMARY_MAX_TOKENS_BY_PROMPT = {"full": 250, "compact": 160}
+SUMMARY_MAX_TOKENS = int(os.environ.get("SUMMARY_MAX_TOKENS") or SUMMARY_MAX_TOKENS_BY_PROMPT.get(SUMMARY_PROMPT, 250))
+
+LLM_MODEL_NAME = "llama-3.1-8b-instant"
+# Point at any Groq/OpenAI-compatible server (e.g. the fake one in benchmarks/); None = api.groq.com
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL")
+
+# Shown for a day whose summary timed out or failed
+FALLBACK_SUMMARY = {
+    "summary": "Summary is not available right now. Please check the raw weather data below.",
+    "clothes": "N/A",
+    "precautions": "N/A"
+}
+
+SUMMARY_FIELDS = ("summary", "clothes", "precautions")
+
+# Same schema wrapped in a list for the multi-day prompt
+weather_batch_schema = {
+    "title": "WeatherSummaries",
+    "type": "object",
+    "properties": {
+        "days": {
+            "type": "array",
+            "items": {k: v for k, v in weather_schema.items() if k != "title"}
+        }
+    },
+    "required": ["days"]
+}
+
+# The ChatGroq clients are created on first use: importing langchain_groq is slow,
+# and constructing them fails without GROQ_API_KEY, which shouldn't stop the app from starting.
+# Async code gets them through llm_ready(), which builds them in a worker thread.
+@lru_cache(maxsize=None)
+def get_structured_model(output_mode=SUMMARY_OUTPUT_MODE, max_tokens=SUMMARY_MAX_TOKENS):
+    from langchain_groq import ChatGroq
+
+    # creating object of ChatGroq
+    llm_model = ChatGroq(
+        model=LLM_MODEL_NAME,
+        max_tokens=max_tokens,
+        temperature=0.7,
+        timeout=SUMMARY_TIMEOUT_SECONDS,
+        base_url=GROQ_BASE_URL
+    )
+    # include_raw keeps the AIMessage so token usage can be recorded (see _parsed)
+    return llm_model.with_structured_output(weather_schema, method=output_mode, include_raw=True)
+
+
+@lru_cache(maxsize=None)
+def get_structured_batch_model(output_mode=SUMMARY_OUTPUT_MODE, max_tokens=SUMMARY_MAX_TOKENS * 6):
+    from langchain_groq import ChatGroq
+
+    # Multi-day prompt needs room for up to 6 days (today + 5 forecast days)
+    batch_llm_model = ChatGroq(
+        model=LLM_MODEL_NAME,
+        max_tokens=max_tokens,
+        temperature=0.7,
+        timeout=SUMMARY_TIMEOUT_SECONDS,
+        base_url=GROQ_BASE_URL
+    )
+    return batch_llm_model.with_structured_output(weather_batch_schema, method=output_mode, include_raw=True)
+
+
+def _summary_prompt_template():
+    return get_weather_prompt_template(SUMMARY_PROMPT, SUMMARY_OUTPUT_MODE)
+
+
+def warm_up_llm():
+    # Imports langchain and builds the clients and prompts SUMMARY_MODE uses (about a second)
+    get_structured_model()
+    _summary_prompt_template()
+    if SUMMARY_MODE == "batched":
+        get_structured_batch_model()
+        get_weather_batch_prompt_template(SUMMARY_PROMPT, SUMMARY_OUTPUT_MODE)
+
+
+_llm_warm_up = None
+
+def _log_warm_up_failure(task):
+    if not task.cancelled() and task.exception():
+        logger.warning("LLM client setup failed: %r", task.exception())
+
+
+def start_llm_warm_up():
+    # Runs warm_up_llm in a worker thread, once; started from the app lifespan so the first
+    # request doesn't wait for it. A failed warm-up is retried by the next caller.
+    global _llm_warm_up
+    if _llm_warm_up is None or (_llm_warm_up.done() and (_llm_warm_up.cancelled() or _llm_warm_up.exception())):
+        _llm_warm_up = asyncio.ensure_future(asyncio.to_thread(warm_up_llm))
+        _llm_warm_up.add_done_callback(_log_warm_up_failure)
+    return _llm_warm_up
+
+
+async def llm_ready():
+    # Returns at once after the warm-up; never imports or builds the clients on the event loop
+    await asyncio.shield(start_llm_warm_up())
+
+def _parsed(response):
+    # Unwraps an include_raw response and records its token usage
+    if not (isinstance(response, dict) and "raw" in response):
+        return response
+    usage = getattr(response["raw"], "usage_metadata", None) or {}
+    llm_tokens.inc(usage.get("input_tokens", 0), type="prompt")
+    llm_tokens.inc(usage.get("output_tokens", 0), type="completion")
+    if response.get("parsing_error") or response.get("parsed") is None:
+        raise ValueError(f"Could not parse LLM response: {response.get('parsing_error')}")
+    return response["parsed"]
+
+
+def _check_summary(summary):
+    # json_mode output isn't validated against the schema; also catches empty fields
+    if not isinstance(summary, dict) or not all(
+        isinstance(summary.get(field), str) and summary[field].strip() for field in SUMMARY_FIELDS
+    ):
+        raise ValueError(f"LLM response is not a complete summary: {summary!r}")
+    return {field: summary[field] for field in SUMMARY_FIELDS}
+
+
+@asynccontextmanager
+async def _llm_call(dependency):
+    # Times the call; a 429 from Groq empties the shared "llm" bucket for its Retry-After
+    try:
+        with track_dependency(dependency):
+            yield
+    except Exception as e:
+        response = getattr(e, "response", None)
+        if getattr(e, "status_code", None) == 429 and response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after", "60"))
+            except ValueError:
+                retry_after = 60.0
+            await upstream_limiter.penalize("llm", retry_after)
+        raise
+
+
+def _summary_args(day):
+    # Maps a row from get_weather's results list to the summary prompt variables
+    return {
+        "location": day["location"],
+        "date": day["date"],
+        "temp": day["temperature"],
+        "humidity": day["humidity"],
+        "wind_speed": day["wind_speed"],
+        "description": day["description"],
+    }
+
+
+def _batch_prompt(days, variant=SUMMARY_PROMPT, output_mode=SUMMARY_OUTPUT_MODE):
+    # One prompt for all days; the model returns a list in the same order
+    return get_weather_batch_prompt_template(variant, output_mode).invoke({
+        "days": "\n".join(
+            f"{i}. Location: {d['location']}, Date: {d['date']}, Temperature: {d['temperature']}°C, "
+            f"Humidity: {d['humidity']}%, Wind: {d['wind_speed']} km/h, Description: {d['description']}"
+            for i, d in enumerate(days, start=1)
+        ),
+        "count": len(days),
     })
-    
-    response = structured_model.invoke(prompt_value)
 
-    # this is a dictionary
-    return response
+
+def _check_batch_response(response, days):
+    summaries = response.get("days", []) if isinstance(response, dict) else []
+    if len(summaries) != len(days):
+        raise ValueError(f"Expected {len(days)} summaries, got {len(summaries)}")
+    return [_check_summary(summary) for summary in summaries]
+
+
+# ----------------------------------
+# Summary cache (in-process + shared cache in front of the summary_cache table)
+# ----------------------------------
+
+# key -> {"summary", "clothes", "precautions"}, tagged "<location>|<date>" (see _summary_tag)
+summary_cache = TieredCache("summary", maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL_SECONDS)
+
+def summary_cache_key(day):
+    # Same inputs + same model -> same prompt -> same key (so each prompt variant has its own entries)
+    prompt_text = _summary_prompt_template().format(**_summary_args(day))
+    return hashlib.sha256(f"{LLM_MODEL_NAME}\n{prompt_text}".encode("utf-8")).hexdigest()
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _summary_tag(location, record_date):
+    return f"{location}|{_as_date(record_date)}"
+
+
+def get_cached_summaries(db: Session, keys):
+    # Returns {key: summary} for every key found in memory, in the shared cache or in the table
+    found = summary_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+
+    if missing:
+        rows = db.query(models.SummaryCache).filter(models.SummaryCache.key.in_(missing)).all()
+        for row in rows:
+            entry = {field: getattr(row, field) for field in SUMMARY_FIELDS}
+            summary_cache.set(row.key, entry, tag=_summary_tag(row.location, row.date))
+            found[row.key] = entry
+
+    for key in keys:
+        record_cache("summary", key in found)
+    return found
+
+
+def save_cached_summaries(db: Session, entries):
+    # entries: list of (key, day, summary)
+    rows = []
+    for key, day, summary in entries:
+        entry = {field: summary[field] for field in SUMMARY_FIELDS}
+        summary_cache.set(key, entry, tag=_summary_tag(day["location"], day["date"]))
+        rows.append({"key": key, "model": LLM_MODEL_NAME, "location": day["location"], "date": _as_date(day["date"]), **entry})
+    if not rows:
+        return
+    # Another request or worker may have saved the same summary first, theirs is just as good
+    db.execute(_dialect_insert(db, models.SummaryCache).values(rows).on_conflict_do_nothing(index_elements=["key"]))
+    db.commit()
+
+
+def invalidate_summary_cache(db: Session, location: str, record_date: date):
+    # Called whenever a weather row changes so stale summaries are not served, by any worker
+    summary_cache.invalidate([_summary_tag(location, record_date)])
+    db.query(models.SummaryCache)\
+        .filter(models.SummaryCache.location == location)\
+        .filter(models.SummaryCache.date == record_date)\
+        .delete(synchronize_session=False)
+    db.commit()
+
+
+def invalidate_summary_caches(db: Session, keys):
+    # Bulk invalidate_summary_cache for (location, date) keys; committed by the caller
+    keys = set(keys)
+    summary_cache.invalidate([_summary_tag(location, record_date) for location, record_date in keys])
+    db.query(models.SummaryCache)\
+        .filter(tuple_(models.SummaryCache.location, models.SummaryCache.date).in_(keys))\
+        .delete(synchronize_session=False)
+
+
+def _split_cached(db: Session, days):
+    # Returns (keys, cached summaries by key, [(key, day)] still to generate)
+    keys = [summary_cache_key(day) for day in days]
+    cached = get_cached_summaries(db, keys)
+    misses = [(key, day) for key, day in zip(keys, days) if key not in cached]
+    return keys, cached, misses
+
+
+def get_cached_summary_list(db: Session, days):
+    # Cached LLM summary per day, None where there is none (no LLM call is made)
+    keys, cached, _ = _split_cached(db, days)
+    return [
+        {field: cached[key][field] for field in SUMMARY_FIELDS} if key in cached else None
+        for key in keys
+    ]
+
+
+def _merge_generated(db: Session, keys, cached, misses, generated):
+    # Fallbacks are not cached so the next request retries the LLM
+    save_cached_summaries(db, [
+        (key, day, summary)
+        for (key, day), summary in zip(misses, generated)
+        if summary is not FALLBACK_SUMMARY
+    ])
+    cached.update({key: summary for (key, _), summary in zip(misses, generated)})
+    # FALLBACK_SUMMARY is returned as-is so callers can tell which days failed
+    return [
+        cached[key] if cached[key] is FALLBACK_SUMMARY
+        else {field: cached[key][field] for field in SUMMARY_FIELDS}
+        for key in keys
+    ]
+
+
+# ----------------------------------
+# LLM summaries (run on the event loop with `ainvoke`)
+# ----------------------------------
+
+# Bounds LLM calls in flight from the event loop
+summary_slots = asyncio.Semaphore(SUMMARY_MAX_WORKERS)
+
+def _summary_failed(call, error, days):
+    # Every fallback is logged and counted, so failing LLM calls show up in the logs and /metrics
+    llm_summary_failures.inc(call=call, error=type(error).__name__)
+    logger.warning(
+        "LLM summary call (%s) failed for %d day(s) of %s, using the fallback: %s: %s",
+        call, len(days), days[0]["location"], type(error).__name__, error
+    )
+
+
+def _record_call(breaker, succeeded):
+    # breaker: e.g. summarizers.CircuitBreaker; told about every LLM call made, never about cache hits
+    if breaker is not None:
+        if succeeded:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+
+async def agenerate_summary_llm(day, timeout=None, breaker=None):
+    # Waiting for a slot counts against the timeout too, so a day never takes longer than `timeout`
+    async def call():
+        await llm_ready()
+        async with summary_slots:
+            await upstream_limiter.acquire("llm")
+            async with _llm_call("llm"):
+                prompt_value = _summary_prompt_template().invoke(_summary_args(day))
+                return _check_summary(_parsed(await get_structured_model().ainvoke(prompt_value)))
+
+    try:
+        summary = await asyncio.wait_for(call(), timeout or SUMMARY_TIMEOUT_SECONDS)
+    except Exception as e:
+        _summary_failed("per_day", e, [day])
+        _record_call(breaker, False)
+        return FALLBACK_SUMMARY
+    _record_call(breaker, True)
+    return summary
+
+
+async def _ainvoke_batch_model(days):
+    await llm_ready()
+    await upstream_limiter.acquire("llm")
+    async with _llm_call("llm_batch"):
+        return _parsed(await get_structured_batch_model().ainvoke(_batch_prompt(days)))
+
+
+async def _agenerate_shared(key, day, timeout, breaker=None):
+    # One LLM call per summary across requests and workers; the others wait for its result
+    try:
+        return await asyncio.wait_for(summary_cache.fetch(
+            key, lambda: agenerate_summary_llm(day, timeout, breaker),
+            tag=_summary_tag(day["location"], day["date"]),
+            cacheable=lambda summary: summary is not FALLBACK_SUMMARY
+        ), timeout)
+    except Exception as e:
+        # Waiting for another worker's call, or that call failing
+        _summary_failed("shared", e, [day])
+        return FALLBACK_SUMMARY
+
+
+async def _agenerate_summaries_uncached(days, mode, timeout, keys=None, breaker=None):
+    # keys (summary_cache_key per day): share each day's call through the summary cache
+    if mode == "batched":
+        try:
+            response = await asyncio.wait_for(_ainvoke_batch_model(days), timeout)
+            summaries = _check_batch_response(response, days)
+        except asyncio.TimeoutError as e:
+            _summary_failed("batched", e, days)
+            _record_call(breaker, False)
+            return [FALLBACK_SUMMARY for _ in days]
+        except Exception as e:
+            # Falls back to one call per day below
+            _summary_failed("batched", e, days)
+            _record_call(breaker, False)
+        else:
+            _record_call(breaker, True)
+            return summaries
+
+    if keys is None:
+        return list(await asyncio.gather(*(agenerate_summary_llm(day, timeout, breaker) for day in days)))
+    return list(await asyncio.gather(
+        *(_agenerate_shared(key, day, timeout, breaker) for key, day in zip(keys, days))
+    ))
+
+
+async def agenerate_summaries_llm(days, mode=None, timeout=None, cache=True, breaker=None):
+    """
+    Generates {summary, clothes, precautions} for every day in `days`.
+
+    `days` are dicts with location, date, temperature, humidity, wind_speed and description.
+    Returns a list in the same order; a day that times out or fails gets FALLBACK_SUMMARY.
+    With `cache`, cached summaries are reused and new ones are saved; the lookups and saves run in
+    a worker thread (run_in_session).
+    `breaker` (record_success/record_failure) hears the outcome of each LLM call actually made.
+    """
+    if not days:
+        return []
+
+    mode = mode or SUMMARY_MODE
+    timeout = timeout or SUMMARY_TIMEOUT_SECONDS
+
+    if not cache:
+        return await _agenerate_summaries_uncached(days, mode, timeout, breaker=breaker)
+
+    keys, cached, misses = await run_in_session(_split_cached, days)
+    generated = await _agenerate_summaries_uncached(
+        [day for _, day in misses], mode, timeout, keys=[key for key, _ in misses], breaker=breaker
+    ) if misses else []
+    return await run_in_session(_merge_generated, keys, cached, misses, generated)
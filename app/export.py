@@ -0,0 +1,131 @@
+"""
+export.py
+
+Streaming exporters for weather records.
+
+- Rows are read in batches with yield_per, so memory stays flat no matter how big the table is.
+- Each generator opens its own session, because the request's session may be closed
+  before a StreamingResponse finishes sending.
+- Parquet and Arrow IPC exports need the optional `pyarrow` package.
+"""
+
+import csv
+import io
+from itertools import islice
+
+from app.crud import list_weather
+from app.database import SessionLocal
+import app.schemas as schemas
+
+EXPORT_BATCH_SIZE = 1000
+
+CSV_HEADER = ["Location", "Date", "Temperature(°C)", "Description", "Humidity(%)", "Wind Speed(kph)"]
+
+
+def iter_weather_batches(filters: dict, batch_size: int = EXPORT_BATCH_SIZE, limit: int = None):
+    # Yields lists of Weather rows matching `filters` (see crud.list_weather)
+    with SessionLocal() as db:
+        query = list_weather(db, **filters)
+        if limit:
+            query = query.limit(limit)
+        rows = iter(query.yield_per(batch_size))
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+
+# -------------------------------
+# NDJSON
+# -------------------------------
+def stream_weather_ndjson(filters: dict, limit: int = None):
+    for batch in iter_weather_batches(filters, limit=limit):
+        yield "".join(schemas.WeatherResponse.model_validate(r).model_dump_json() + "\n" for r in batch)
+
+
+# -------------------------------
+# CSV
+# -------------------------------
+def stream_weather_csv(filters: dict):
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    # Write header
+    writer.writerow(CSV_HEADER)
+
+    # Write data rows one batch at a time, sending each chunk as soon as it's ready
+    for batch in iter_weather_batches(filters):
+        for rec in batch:
+            writer.writerow([rec.location, rec.date, rec.temperature, rec.description, rec.humidity, rec.wind_speed])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+
+    # Header only when there are no rows
+    if output.tell():
+        yield output.getvalue()
+
+
+# -------------------------------
+# Parquet / Arrow IPC
+# -------------------------------
+class _ChunkSink(io.RawIOBase):
+    # Write-only file that hands written bytes back to the generator.
+    # Tracks its own position so the writers can record offsets after chunks are drained.
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("location", pa.string()),
+        ("date", pa.date32()),
+        ("temperature", pa.float64()),
+        ("description", pa.string()),
+        ("humidity", pa.int32()),
+        ("wind_speed", pa.float64()),
+    ])
+
+
+def _arrow_batch(pa, schema, rows):
+    return pa.record_batch([
+        pa.array([getattr(r, field.name) for r in rows], type=field.type) for field in schema
+    ], schema=schema)
+
+
+def stream_weather_columnar(filters: dict, file_format: str):
+    """Yields a Parquet file (one row group per batch) or an Arrow IPC stream."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    sink = _ChunkSink()
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+        write = writer.write_batch
+
+    for batch in iter_weather_batches(filters):
+        write(_arrow_batch(pa, schema, batch))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
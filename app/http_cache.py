@@ -0,0 +1,106 @@
+"""
+http_cache.py
+
+Conditional GET and response caching for read endpoints over the Weather table
+(GET /weather, /export/csv, /export/parquet, /export/arrow).
+
+- The table_versions counter (bumped by every write, see crud.weather_changed) is the ETag, and its
+  updated_at the Last-Modified. A client sending If-None-Match / If-Modified-Since that still
+  matches gets 304 after a single primary-key lookup; no Weather rows are read.
+- Otherwise the serialized body is kept in memory, keyed by table version + path + query string,
+  so repeated polls of an unchanged table are answered without rebuilding it.
+  Bodies over RESPONSE_CACHE_MAX_BYTES are streamed as usual and not cached.
+"""
+
+import os
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from itertools import chain
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache
+from app.crud import get_table_version
+from app.metrics import record_cache
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "128"))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+# (table, version, path, query) -> (body bytes, headers)
+response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE)
+
+
+def _http_date(value):
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _etag_matches(if_none_match, etag):
+    # Weak comparison, as required for If-None-Match
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _not_modified(request: Request, etag, updated_at):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def _encode(chunk):
+    return chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def versioned_response(request: Request, db: Session, build, media_type: str, headers: dict = None,
+                       table: str = "weather"):
+    """
+    Answers a GET over `table` with ETag/Last-Modified, a 304 when the client is up to date,
+    or the (cached) body.
+
+    build() -> (iterable of str/bytes chunks, extra headers); it is only called on a cache miss.
+    """
+    # Read the version before any rows, so a body is never cached under a newer version than its data
+    version, updated_at = get_table_version(db, table)
+    etag = f'W/"{table}-{version}"'
+    validators = {"ETag": etag, "Last-Modified": _http_date(updated_at), "Cache-Control": "no-cache"}
+
+    if _not_modified(request, etag, updated_at):
+        return Response(status_code=304, headers=validators)
+
+    key = (table, version, request.url.path, str(request.query_params))
+    cached = response_cache.get(key)
+    record_cache("response", cached is not None)
+    if cached is not None:
+        body, extra_headers = cached
+        return Response(body, media_type=media_type, headers={**(headers or {}), **extra_headers, **validators})
+
+    chunks, extra_headers = build()
+    chunks = iter(chunks)
+    consumed, size = [], 0
+    for chunk in chunks:
+        chunk = _encode(chunk)
+        consumed.append(chunk)
+        size += len(chunk)
+        if size > RESPONSE_CACHE_MAX_BYTES:
+            # Too big to keep: send what was read so far, then stream the rest
+            return StreamingResponse(
+                chain(consumed, (_encode(chunk) for chunk in chunks)),
+                media_type=media_type,
+                headers={**(headers or {}), **extra_headers, **validators}
+            )
+
+    body = b"".join(consumed)
+    response_cache.set(key, (body, extra_headers))
+    return Response(body, media_type=media_type, headers={**(headers or {}), **extra_headers, **validators})
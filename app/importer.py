@@ -0,0 +1,225 @@
+"""
+importer.py
+
+Bulk import and bulk edit of weather records (POST /weather/import), as CSV in the /export/csv
+format or as NDJSON records like GET /weather?format=ndjson sends.
+
+- The upload is parsed as it arrives and applied IMPORT_CHUNK_SIZE rows at a time, so memory stays
+  flat however big the file is.
+- Each chunk is validated column-wise (pandas) with the /weather/update rules: temperature
+  -100..100 °C, humidity a whole number 0..100 %, wind speed 0 or more. Invalid rows are reported
+  with their line number and skipped; they don't stop the rest of the load.
+- The valid rows of a chunk are upserted in one statement and one transaction
+  (crud.import_weather_rows): existing days are overwritten, empty optional columns keep the
+  stored value, and imported rows are never replaced by the background refresh.
+- Locations are matched on their known spellings, without upstream calls (see locations.py).
+"""
+
+import codecs
+import csv
+import json
+import os
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.crud import import_weather_rows
+from app.database import run_in_session
+from app.export import CSV_HEADER
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "1000"))
+# Errors listed in the report; the count covers all of them
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", "1000"))
+
+IMPORT_COLUMNS = ["location", "date", "temperature", "description", "humidity", "wind_speed"]
+REQUIRED_COLUMNS = ["location", "date", "temperature"]
+
+# /export/csv header -> column; the column names themselves are accepted too
+CSV_COLUMNS = dict(zip(CSV_HEADER, IMPORT_COLUMNS))
+
+
+class ImportFormatError(ValueError):
+    # The upload as a whole can't be read (e.g. a CSV header without a required column)
+    pass
+
+
+# -------------------------------
+# Parsing
+# -------------------------------
+async def _lines(body):
+    # body: async iterator of bytes -> text lines (a UTF-8 BOM is dropped)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for data in body:
+        pending += decoder.decode(data)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _csv_records(body):
+    # (line number, {column: text}); a quoted field may span lines
+    columns = None
+    number, start, buffered = 0, 0, []
+    async for line in _lines(body):
+        number += 1
+        if not buffered:
+            start = number
+        buffered.append(line)
+        text = "\n".join(buffered)
+        if text.count('"') % 2:
+            continue
+        buffered = []
+        if not text.strip():
+            continue
+
+        fields = next(csv.reader([text]))
+        if columns is None:
+            columns = [CSV_COLUMNS.get(field.strip(), field.strip().lower()) for field in fields]
+            missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+            if missing:
+                raise ImportFormatError(f"CSV header is missing column(s): {', '.join(missing)}")
+            continue
+        if len(fields) != len(columns):
+            yield start, f"Expected {len(columns)} fields, got {len(fields)}"
+            continue
+        yield start, dict(zip(columns, fields))
+
+
+async def _ndjson_records(body):
+    number = 0
+    async for line in _lines(body):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+# -------------------------------
+# Validation
+# -------------------------------
+def _text(series):
+    # Stripped strings, empty -> NA
+    text = series.astype("string").str.strip()
+    return text.mask(text == "")
+
+
+def _number(text):
+    # (float array with NaN where missing or invalid, mask of present but invalid values)
+    import pandas as pd
+
+    values = pd.to_numeric(text, errors="coerce").astype("Float64").to_numpy(dtype=float, na_value=np.nan)
+    return values, text.notna().to_numpy() & ~np.isfinite(values)
+
+
+def validate_chunk(chunk):
+    """
+    chunk: [(line number, record dict)] -> ([(line number, Weather row dict)], [(line number, error)])
+    Every rule is checked on whole columns; only failing rows are visited one by one.
+    """
+    import pandas as pd  # only needed here, kept out of app startup
+
+    lines = [line for line, _ in chunk]
+    frame = pd.DataFrame([record for _, record in chunk], columns=IMPORT_COLUMNS)
+
+    location = _text(frame["location"])
+    description = _text(frame["description"])
+    dates = pd.to_datetime(_text(frame["date"]), format="%Y-%m-%d", errors="coerce")
+    temperature, bad_temperature = _number(_text(frame["temperature"]))
+    humidity, bad_humidity = _number(_text(frame["humidity"]))
+    wind_speed, bad_wind_speed = _number(_text(frame["wind_speed"]))
+
+    with np.errstate(invalid="ignore"):
+        checks = [
+            (location.isna().to_numpy(), "Missing location"),
+            (dates.isna().to_numpy(), "Missing or invalid date, expected YYYY-MM-DD"),
+            (np.isnan(temperature) & ~bad_temperature, "Missing temperature"),
+            (bad_temperature, "Invalid temperature"),
+            ((temperature < -100) | (temperature > 100), "Temperature out of range (-100 to 100 °C)"),
+            (bad_humidity | (humidity < 0) | (humidity > 100) | ((humidity != np.floor(humidity)) & ~np.isnan(humidity)),
+             "Humidity must be a whole number between 0 and 100"),
+            (bad_wind_speed, "Invalid wind speed"),
+            (wind_speed < 0, "Wind speed cannot be negative"),
+        ]
+
+    problems = {}
+    for mask, message in checks:
+        for index in np.flatnonzero(mask):
+            problems.setdefault(index, []).append(message)
+    errors = [(lines[index], "; ".join(messages)) for index, messages in sorted(problems.items())]
+
+    locations = location.to_numpy(dtype=object, na_value=None)
+    descriptions = description.to_numpy(dtype=object, na_value=None)
+    days = dates.dt.date.to_numpy()
+    rows = []
+    for index in range(len(chunk)):
+        if index in problems:
+            continue
+        rows.append((lines[index], {
+            "location": " ".join(locations[index].split()),
+            "date": days[index],
+            "temperature": float(temperature[index]),
+            "description": descriptions[index],
+            "humidity": None if np.isnan(humidity[index]) else int(humidity[index]),
+            "wind_speed": None if np.isnan(wind_speed[index]) else float(wind_speed[index]),
+        }))
+    return rows, errors
+
+
+# -------------------------------
+# Import
+# -------------------------------
+def _apply_chunk(db, chunk):
+    # Returns (rows written, [(line number, error)])
+    rows, errors = validate_chunk(chunk)
+    try:
+        import_weather_rows(db, [row for _, row in rows])
+    except SQLAlchemyError as e:
+        db.rollback()
+        return 0, sorted(errors + [(line, f"Not saved: {e.__class__.__name__}") for line, _ in rows])
+    return len(rows), errors
+
+
+async def import_weather(body, file_format: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    body: async iterator of bytes (e.g. request.stream()); file_format: "csv" or "ndjson".
+    Returns the report: {"rows", "imported", "failed", "errors": [{"line", "error"}], "errors_truncated"}.
+    Raises ImportFormatError when the upload can't be read at all.
+    """
+    records = _csv_records(body) if file_format == "csv" else _ndjson_records(body)
+    report = {"rows": 0, "imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def add_errors(errors):
+        report["failed"] += len(errors)
+        room = IMPORT_MAX_ERRORS - len(report["errors"])
+        report["errors"].extend({"line": line, "error": error} for line, error in errors[:room])
+        report["errors_truncated"] |= len(errors) > room
+
+    async def flush(chunk, parse_errors):
+        # DB work runs in a worker thread so a big load doesn't stall other requests
+        imported, errors = await run_in_session(_apply_chunk, chunk) if chunk else (0, [])
+        report["imported"] += imported
+        # Rows that couldn't be parsed are reported with their chunk, so the errors stay in line order
+        add_errors(sorted(parse_errors + errors))
+
+    chunk, parse_errors = [], []
+    async for line, record in records:
+        report["rows"] += 1
+        if isinstance(record, str):
+            parse_errors.append((line, record))
+        else:
+            chunk.append((line, record))
+        if len(chunk) + len(parse_errors) >= chunk_size:
+            await flush(chunk, parse_errors)
+            chunk, parse_errors = [], []
+    if chunk or parse_errors:
+        await flush(chunk, parse_errors)
+    return report
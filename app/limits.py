@@ -0,0 +1,299 @@
+"""
+limits.py
+
+Upstream rate limits and admission control for the busiest endpoints.
+
+UpstreamLimiter (token buckets):
+- One bucket per upstream service (weatherapi, youtube, llm), refilled at
+  <SERVICE>_REQUESTS_PER_MINUTE up to <SERVICE>_BURST tokens. Every outbound call takes a token
+  first; when the bucket is empty the call waits up to RATE_LIMIT_MAX_WAIT_SECONDS, then fails fast
+  with UpstreamRateLimited instead of earning a 429 from the service. Background work that can
+  wait (POST /weather/batch) passes a longer max_wait and so runs at the refill rate.
+- near_quota(service) is true once less than RATE_LIMIT_RESERVE of the burst is left. Callers use it
+  to degrade early: cached or rule-based summaries instead of new LLM calls, no background prefetch.
+- A 429 from the service empties its bucket for the Retry-After period, so every worker backs off.
+- RATE_LIMIT_BACKEND=sqlite (default) keeps the buckets in a small SQLite file (RATE_LIMIT_DB_PATH)
+  shared by every uvicorn worker on the host; "memory" keeps them per process. SQLite access runs
+  in a worker thread, never on the event loop, and near_quota only reads.
+
+AdmissionMiddleware:
+- POST /weather, POST /weather/batch, POST /weather/import and GET /search_location each allow a number of requests in
+  progress and a bounded number waiting (ADMISSION_* settings, per process; the defaults follow the
+  DB pool size, see database.py). A request that finds the queue full, or waits longer than
+  ADMISSION_QUEUE_TIMEOUT_SECONDS, is answered 503 with a Retry-After header estimated from recent
+  request durations.
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from starlette.responses import PlainTextResponse
+
+from app.database import DB_CONNECTIONS
+from app.metrics import rate_limit_rejections, admission_rejections
+
+BASE_DIR = Path(__file__).resolve().parent
+
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "sqlite")
+RATE_LIMIT_DB_PATH = os.environ.get("RATE_LIMIT_DB_PATH", str(BASE_DIR / "rate_limits.db"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "0.5"))
+RATE_LIMIT_RESERVE = float(os.environ.get("RATE_LIMIT_RESERVE", "0.2"))
+
+# service -> (requests per minute, burst); defaults sit under the free tiers
+UPSTREAM_LIMITS = {
+    "weatherapi": (
+        float(os.environ.get("WEATHERAPI_REQUESTS_PER_MINUTE", "600")),
+        float(os.environ.get("WEATHERAPI_BURST", "60")),
+    ),
+    "youtube": (
+        float(os.environ.get("YOUTUBE_REQUESTS_PER_MINUTE", "60")),
+        float(os.environ.get("YOUTUBE_BURST", "20")),
+    ),
+    "llm": (
+        float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "30")),
+        float(os.environ.get("LLM_BURST", "10")),
+    ),
+}
+
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+
+# (method, path) -> (name, requests in progress, requests waiting)
+# Defaults follow the DB pool: every admitted request needs a connection for its reads and writes
+# (run_in_session), so more requests in progress than DB_CONNECTIONS only wait for one inside.
+ADMISSION_LIMITS = {
+    ("POST", "/weather"): (
+        "weather",
+        int(os.environ.get("ADMISSION_WEATHER_CONCURRENCY", str(DB_CONNECTIONS))),
+        int(os.environ.get("ADMISSION_WEATHER_QUEUE", str(2 * DB_CONNECTIONS))),
+    ),
+    ("POST", "/weather/batch"): (
+        "weather_batch",
+        int(os.environ.get("ADMISSION_BATCH_CONCURRENCY", "2")),
+        int(os.environ.get("ADMISSION_BATCH_QUEUE", "4")),
+    ),
+    ("POST", "/weather/import"): (
+        "weather_import",
+        int(os.environ.get("ADMISSION_IMPORT_CONCURRENCY", "2")),
+        int(os.environ.get("ADMISSION_IMPORT_QUEUE", "4")),
+    ),
+    # Most searches are answered from the in-memory index without touching the DB
+    ("GET", "/search_location"): (
+        "search_location",
+        int(os.environ.get("ADMISSION_SEARCH_CONCURRENCY", str(2 * DB_CONNECTIONS))),
+        int(os.environ.get("ADMISSION_SEARCH_QUEUE", str(8 * DB_CONNECTIONS))),
+    ),
+}
+
+
+class UpstreamRateLimited(Exception):
+    # The API answered 429, or our own bucket for it is empty; retry_after is in seconds
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"{service} rate limit reached, retry in {math.ceil(retry_after)}s")
+        self.service = service
+        self.retry_after = retry_after
+
+
+# -------------------------------
+# Bucket stores
+# -------------------------------
+class MemoryBucketStore:
+    blocking = False  # only takes an in-process lock, fine to call on the event loop
+
+    def __init__(self):
+        self._buckets = {}  # name -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def update(self, name, now, fn):
+        # fn(state or None) -> (new tokens, result), applied atomically
+        with self._lock:
+            tokens, result = fn(self._buckets.get(name))
+            self._buckets[name] = (tokens, now)
+            return result
+
+    def get(self, name):
+        with self._lock:
+            return self._buckets.get(name)
+
+
+class SQLiteBucketStore:
+    blocking = True  # file I/O and lock waits: called from a worker thread (UpstreamLimiter._call)
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()  # sqlite3 connections can't be shared between threads
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def update(self, name, now, fn):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+            tokens, result = fn(state)
+            conn.execute(
+                "INSERT INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def get(self, name):
+        # Plain read: in WAL mode it neither waits for nor blocks the writers above
+        return self._connection().execute(
+            "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)
+        ).fetchone()
+
+
+# -------------------------------
+# Token buckets per upstream
+# -------------------------------
+class UpstreamLimiter:
+    def __init__(self, store, limits=UPSTREAM_LIMITS):
+        self.store = store
+        # service -> (tokens per second, burst)
+        self.limits = {service: (per_minute / 60, burst) for service, (per_minute, burst) in limits.items()}
+
+    async def _call(self, fn, *args):
+        # Store access that may block (SQLite file locks) runs in a worker thread, off the event loop
+        if self.store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _refilled(self, service, state, now):
+        rate, burst = self.limits[service]
+        tokens, updated_at = state if state else (burst, now)
+        return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+    def _take(self, service, cost):
+        # Returns seconds until `cost` tokens are available; 0 if taken
+        rate, _ = self.limits[service]
+        now = time.time()
+
+        def apply(state):
+            tokens = self._refilled(service, state, now)
+            if tokens >= cost:
+                return tokens - cost, 0.0
+            return tokens, (cost - tokens) / rate
+
+        return self.store.update(service, now, apply)
+
+    async def acquire(self, service, max_wait=RATE_LIMIT_MAX_WAIT_SECONDS):
+        # Takes one token, waiting up to max_wait for one; callers waiting together share the refill
+        if service not in self.limits:
+            return
+        deadline = time.monotonic() + max_wait
+        wait = await self._call(self._take, service, 1)
+        while wait and time.monotonic() + wait <= deadline:
+            await asyncio.sleep(wait)
+            wait = await self._call(self._take, service, 1)
+        if wait:
+            rate_limit_rejections.inc(service=service)
+            raise UpstreamRateLimited(service, wait)
+
+    async def near_quota(self, service):
+        # Read-only: checking the level never takes the store's write lock
+        if service not in self.limits:
+            return False
+        state = await self._call(self.store.get, service)
+        return self._refilled(service, state, time.time()) < self.limits[service][1] * RATE_LIMIT_RESERVE
+
+    async def penalize(self, service, retry_after):
+        # The service said 429: no calls from any worker until retry_after has passed
+        if service not in self.limits:
+            return
+        rate, _ = self.limits[service]
+        await self._call(self.store.update, service, time.time(), lambda state: (-retry_after * rate, None))
+
+
+def _create_store():
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBucketStore()
+    return SQLiteBucketStore(RATE_LIMIT_DB_PATH)
+
+
+upstream_limiter = UpstreamLimiter(_create_store())
+
+
+# -------------------------------
+# Admission control
+# -------------------------------
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, please retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.service_time = 1.0  # moving average of request durations, seconds
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    def retry_after(self):
+        # Time for the requests ahead to drain at the recent pace
+        return max(1, math.ceil(self.service_time * (self.waiting + 1) / self.max_concurrent))
+
+    async def acquire(self):
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise Overloaded(self.retry_after())
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(self.retry_after())
+        finally:
+            self.waiting -= 1
+        return time.monotonic()
+
+    def release(self, started):
+        self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - started)
+        self._slots.release()
+
+
+class AdmissionMiddleware:
+    # Plain ASGI middleware so the slot is held until a streamed response has been fully sent
+    def __init__(self, app, limits=ADMISSION_LIMITS):
+        self.app = app
+        self.controllers = {key: AdmissionController(*config) for key, config in limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controllers.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if controller is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            started = await controller.acquire()
+        except Overloaded as e:
+            admission_rejections.inc(route=controller.name)
+            response = PlainTextResponse(str(e), status_code=503, headers={"Retry-After": str(e.retry_after)})
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(started)
@@ -0,0 +1,121 @@
+"""
+location_index.py
+
+Local prefix index for the /search_location autocomplete.
+
+- Names are kept in a sorted list; a prefix query is two bisects, so answers take microseconds.
+- The index is loaded on startup from the known_locations table and Weather.location,
+  and every upstream search result is added to it (and saved, so it survives restarts).
+- A prefix only goes to weatherapi.com when the index can't answer it:
+    - fewer than AUTOCOMPLETE_MIN_LOCAL_RESULTS local matches, and
+    - no worker has sent the same prefix upstream in the last AUTOCOMPLETE_REFRESH_SECONDS: the
+      results are kept in the shared cache (shared_cache.py), and added to this worker's index
+      when another worker fetched them.
+  Concurrent misses for the same prefix share one upstream call, across workers too.
+- Upstream results are also saved as canonical locations (locations.py), so submitting a
+  suggestion doesn't need another lookup.
+- Near or over the weatherapi rate limit (limits.py) only local matches are returned.
+"""
+
+import os
+from bisect import bisect_left, insort
+
+import httpx
+
+from app.clients import search_places, format_place, normalize_location
+from app.crud import get_known_locations, save_known_locations
+from app.database import run_in_session
+from app.limits import upstream_limiter, UpstreamRateLimited
+from app.locations import remember_places
+from app.metrics import record_cache
+from app.shared_cache import TieredCache
+
+AUTOCOMPLETE_MAX_RESULTS = int(os.environ.get("AUTOCOMPLETE_MAX_RESULTS", "10"))
+AUTOCOMPLETE_MIN_LOCAL_RESULTS = int(os.environ.get("AUTOCOMPLETE_MIN_LOCAL_RESULTS", "5"))
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.environ.get("AUTOCOMPLETE_REFRESH_SECONDS", "86400"))
+
+
+class LocationIndex:
+    def __init__(self):
+        self._keys = []    # sorted normalized names
+        self._names = {}   # normalized name -> display name
+
+    def add(self, names):
+        # Returns the names that were not in the index yet
+        added = []
+        for name in names:
+            key = normalize_location(name)
+            if key and key not in self._names:
+                self._names[key] = name
+                insort(self._keys, key)
+                added.append(name)
+        return added
+
+    def search(self, prefix, limit=AUTOCOMPLETE_MAX_RESULTS):
+        prefix = normalize_location(prefix)
+        start = bisect_left(self._keys, prefix)
+        results = []
+        for key in self._keys[start:]:
+            if not key.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(self._names[key])
+        return results
+
+    def load(self, db):
+        self.add(sorted(get_known_locations(db)))
+
+    def __len__(self):
+        return len(self._keys)
+
+
+location_index = LocationIndex()
+
+# Normalized prefix -> names weatherapi.com returned for it
+autocomplete_cache = TieredCache("autocomplete", maxsize=50_000, ttl=AUTOCOMPLETE_REFRESH_SECONDS)
+
+
+def _save_results(db, added, places):
+    if added:
+        save_known_locations(db, added)
+    remember_places(db, places)
+
+
+def _merge(first, second, limit=AUTOCOMPLETE_MAX_RESULTS):
+    # Keeps order, drops duplicates
+    return list(dict.fromkeys(first + second))[:limit]
+
+
+async def autocomplete(client: httpx.AsyncClient, api_key: str, q: str):
+    prefix = normalize_location(q)
+    local = location_index.search(prefix)
+    if len(local) >= AUTOCOMPLETE_MIN_LOCAL_RESULTS or not api_key:
+        record_cache("autocomplete", True)
+        return local
+
+    names = await autocomplete_cache.aget(prefix)
+    if names is not None:
+        # Possibly fetched by another worker: this index may not know them yet
+        location_index.add(names)
+        record_cache("autocomplete", True)
+        return _merge(names, local)
+
+    # Near the weatherapi quota, suggestions come from the index only so forecasts keep working
+    if await upstream_limiter.near_quota("weatherapi"):
+        record_cache("autocomplete", True)
+        return local
+    record_cache("autocomplete", False)
+
+    async def fetch():
+        places = await search_places(client, api_key, q)
+        names = [format_place(place) for place in places]
+        added = location_index.add(names)
+        await run_in_session(_save_results, added, places)
+        return names
+
+    try:
+        names = await autocomplete_cache.fetch(prefix, fetch)
+    except UpstreamRateLimited:
+        return local
+    location_index.add(names)
+    # Upstream ranking first, then anything else we know locally
+    return _merge(names, local)
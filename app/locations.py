@@ -0,0 +1,271 @@
+"""
+locations.py
+
+Maps free-text locations to one canonical location, so "San Ramon", "san ramon " and
+"San Ramon, California" share Weather rows, forecasts and summaries instead of each costing
+their own upstream calls.
+
+- Input is normalized (case, whitespace) and looked up in the location_aliases table, memoized in
+  an in-process LRU. Only a spelling never seen before goes to weatherapi.com search.json; its best
+  match (name, region, country, lat/lon) becomes a Location and the spelling one of its aliases.
+- Autocomplete results are saved the same way, so picking a suggestion needs no lookup at all.
+- Forecasts for a resolved location are requested by "lat,lon", so every alias shares one
+  forecast cache entry.
+- Names stored without a lookup (seeds, imports, rows from before canonical locations) get a
+  location of their own keyed on the normalized text. Migration 0005 merges rows whose names
+  differ only in case or whitespace; the rest is merged with weatherapi.com by running:
+
+    python -m app.locations backfill
+"""
+
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from typing import NamedTuple
+
+import httpx
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+import app.models as models
+from app.cache import LRUCache, SingleFlight
+from app.clients import create_http_client, forecast_cache, format_place, normalize_location, search_places
+from app.crud import (
+    get_location_by_alias, get_locations_for_names, kept_weather_row, save_location, save_location_aliases,
+    weather_changed
+)
+from app.database import run_in_session
+from app.limits import RATE_LIMIT_MAX_WAIT_SECONDS
+from app.metrics import record_cache
+
+LOCATION_ALIAS_CACHE_SIZE = int(os.environ.get("LOCATION_ALIAS_CACHE_SIZE", "50000"))
+
+
+class ResolvedLocation(NamedTuple):
+    id: int
+    name: str   # display name, as stored in Weather.location
+    query: str  # what to send to weatherapi.com: "lat,lon" when known, else the name
+
+
+# normalized alias -> ResolvedLocation; aliases never change while the app runs
+alias_cache = LRUCache(maxsize=LOCATION_ALIAS_CACHE_SIZE)
+_resolve_flights = SingleFlight()
+
+
+def _remember(alias, location: models.Location):
+    query = f"{location.lat},{location.lon}" if location.lat is not None and location.lon is not None \
+        else location.name
+    resolved = ResolvedLocation(location.id, location.name, query)
+    alias_cache.set(alias, resolved)
+    return resolved
+
+
+def place_key(place: dict):
+    # Canonical key of a weatherapi.com search match
+    key = "weatherapi:" + "|".join(normalize_location(str(place.get(f) or "")) for f in ("name", "region", "country"))
+    if place.get("lat") is not None and place.get("lon") is not None:
+        key += f"|{float(place['lat']):.2f},{float(place['lon']):.2f}"
+    return key
+
+
+def save_place(db: Session, place: dict):
+    location = save_location(
+        db, place_key(place), format_place(place),
+        place.get("region"), place.get("country"), place.get("lat"), place.get("lon")
+    )
+    save_location_aliases(db, location.id, [normalize_location(location.name), normalize_location(format_place(place))])
+    return location
+
+
+def remember_places(db: Session, places):
+    # Autocomplete results: the names users are about to submit
+    for place in places:
+        if alias_cache.get(normalize_location(format_place(place))) is None:
+            _remember(normalize_location(format_place(place)), save_place(db, place))
+
+
+def _memoized(alias):
+    resolved = alias_cache.get(alias)
+    record_cache("location_alias", resolved is not None)
+    return resolved
+
+
+def _lookup_alias(db: Session, alias):
+    location = get_location_by_alias(db, alias)
+    return _remember(alias, location) if location else None
+
+
+def lookup_location(db: Session, text: str):
+    # Known spellings only, never calls upstream; None for a spelling never seen
+    alias = normalize_location(text)
+    if not alias:
+        return None
+    return _memoized(alias) or _lookup_alias(db, alias)
+
+
+def canonical_location_name(db: Session, text: str):
+    # For filters on stored rows (GET /weather, exports, stats): any known spelling works
+    resolved = lookup_location(db, text)
+    return resolved.name if resolved else text
+
+
+def invalidate_forecast(db: Session, name: str):
+    # Drops the cached forecast of a stored location in every worker, so it is fetched fresh
+    resolved = lookup_location(db, name)
+    forecast_cache.invalidate([normalize_location(resolved.query if resolved else name)])
+
+
+def _save_text_location(db: Session, alias, text):
+    return _remember(alias, get_locations_for_names(db, [text])[text])
+
+
+def _save_resolved(db: Session, alias, place: dict):
+    location = save_place(db, place)
+    save_location_aliases(db, location.id, [alias])
+    return _remember(alias, location)
+
+
+async def resolve_location(client: httpx.AsyncClient, api_key: str, text: str,
+                           max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS):
+    """
+    Canonical location for free text, or None when weatherapi.com has no such place.
+    Raises UpstreamRateLimited when the spelling is new and weatherapi.com is over quota
+    (after waiting up to max_wait for a rate limit token).
+    Known spellings are answered from memory; the DB is only used from a worker thread.
+    """
+    alias = normalize_location(text)
+    if not alias:
+        return None
+    resolved = _memoized(alias) or await run_in_session(_lookup_alias, alias)
+    if resolved:
+        return resolved
+
+    if not api_key:
+        # Nothing to ask: the text is its own location until a backfill resolves it
+        return await run_in_session(_save_text_location, alias, text)
+
+    # Concurrent first searches for the same spelling share one upstream call
+    places = await _resolve_flights.do(alias, lambda: search_places(client, api_key, text, max_wait))
+    if not places:
+        return None
+    return await run_in_session(_save_resolved, alias, places[0])
+
+
+# -------------------------------
+# Merging rows of the same place
+# -------------------------------
+def merge_location_rows(db: Session, location: models.Location, names):
+    """
+    Moves the Weather rows stored under any of `names` onto `location`, one row per day
+    (crud.kept_weather_row: edited by hand, then most recently fetched, then oldest).
+    Every name becomes an alias of the location. Commits.
+    """
+    names = set(names) | {location.name}
+    rows = db.query(models.Weather)\
+        .filter(or_(models.Weather.location.in_(names), models.Weather.location_id == location.id))\
+        .all()
+    by_date = defaultdict(list)
+    for row in rows:
+        by_date[row.date].append(row)
+
+    touched, kept = set(), []
+    for day, day_rows in by_date.items():
+        winner = kept_weather_row(day_rows)
+        for loser in (row for row in day_rows if row is not winner):
+            touched.add((loser.location, day))
+            db.delete(loser)
+        touched.add((winner.location, day))
+        kept.append(winner)
+    # Losers go first, so no kept row collides with them on the unique indexes
+    db.flush()
+
+    for row in kept:
+        row.location, row.location_id = location.name, location.id
+        touched.add((location.name, row.date))
+
+    # Summaries are keyed on the display name; the old names' ones will never be read again
+    old_names = names - {location.name}
+    if old_names:
+        db.query(models.SummaryCache).filter(models.SummaryCache.location.in_(old_names))\
+            .delete(synchronize_session=False)
+    if touched:
+        weather_changed(db, touched)
+    db.commit()
+    save_location_aliases(db, location.id, [normalize_location(name) for name in names])
+
+
+def _display_rank(name):
+    # "San Ramon" reads better than "SAN RAMON", which reads better than "san ramon"
+    return name != name.lower() and name != name.upper(), name != name.lower()
+
+
+def merge_duplicate_locations(db: Session):
+    # Rows from before canonical locations: names that differ only in case or whitespace
+    # become one location, named after the best cased spelling (the one with the most rows of those)
+    counts = db.query(models.Weather.location, func.count(models.Weather.id))\
+        .filter(models.Weather.location_id.is_(None))\
+        .group_by(models.Weather.location)\
+        .all()
+    groups = defaultdict(list)
+    for name, count in sorted(counts, key=lambda item: (_display_rank(item[0]), item[1]), reverse=True):
+        groups[normalize_location(name)].append(name)
+
+    locations = get_locations_for_names(db, [names[0] for names in groups.values()])
+    for names in groups.values():
+        merge_location_rows(db, locations[names[0]], names)
+
+
+async def backfill_locations(db: Session, client: httpx.AsyncClient, api_key: str):
+    """
+    Resolves every location created without a lookup ("text:" key) with weatherapi.com and
+    merges its rows, aliases and summaries into the canonical place.
+    Returns (resolved, not found) counts.
+    """
+    resolved = not_found = 0
+    local = db.query(models.Location).filter(models.Location.key.like("text:%")).order_by(models.Location.id).all()
+    for location in local:
+        places = await search_places(client, api_key, location.name)
+        if not places:
+            not_found += 1
+            continue
+
+        # Free the display name first, so the resolved place can take it
+        old_name = location.name
+        location.name = f"{old_name} (merging {location.id})"
+        db.commit()
+        try:
+            canonical = save_place(db, places[0])
+        except Exception:
+            db.rollback()
+            location.name = old_name
+            db.commit()
+            raise
+
+        merge_location_rows(db, canonical, [old_name])
+        db.query(models.LocationAlias).filter(models.LocationAlias.location_id == location.id)\
+            .update({"location_id": canonical.id}, synchronize_session=False)
+        db.delete(location)
+        db.commit()
+        resolved += 1
+    return resolved, not_found
+
+
+async def _backfill():
+    from app.database import SessionLocal
+    from app.migrations import run_migrations
+
+    api_key = os.getenv("WEATHER_API_KEY")
+    if not api_key:
+        sys.exit("WEATHER_API_KEY is required to resolve locations.")
+    run_migrations()
+    async with create_http_client() as client:
+        with SessionLocal() as db:
+            return await backfill_locations(db, client, api_key)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("Usage: python -m app.locations backfill")
+    resolved, not_found = asyncio.run(_backfill())
+    print(f"Merged {resolved} location(s) into their canonical place; {not_found} not found by weatherapi.com.")
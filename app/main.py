@@ -1,23 +1,102 @@
-from fastapi import FastAPI, Request, Form, Depends
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, Depends, Query
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, RedirectResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import requests
-import csv
-from typing import List
-from io import StringIO
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, date as date_type
+import asyncio
+import httpx
+import json
+import logging
+import math
+import time
+import importlib.util
+from typing import List, Optional
 from fastapi import HTTPException, status
-from app.database import SessionLocal, engine
+from app.database import SessionLocal, run_in_session
+from app.migrations import run_migrations
 import app.models as models
+import app.schemas as schemas
 from fastapi.staticfiles import StaticFiles
 import os
-from app.crud import generate_summary_llm
-
-# Create tables if not exist
-models.Base.metadata.create_all(bind=engine)
+from app.crud import invalidate_summary_cache, weather_changed, start_llm_warm_up
+from app.summarizers import summary_policy
+from app.crud import get_weather as get_stored_weather, insert_weather_rows, list_weather
+from app.timing import StageTimer
+from app.metrics import http_request_duration, render_metrics
+from app.stats import get_weather_stats, PERIODS, DEFAULT_PERCENTILES
+from app.export import stream_weather_ndjson, stream_weather_csv, stream_weather_columnar
+from app.limits import AdmissionMiddleware, UpstreamRateLimited
+from app.compression import CompressionMiddleware
+from app.http_cache import versioned_response
+from app.clients import create_http_client, get_forecast, parse_forecast_day
+from app.location_index import location_index, autocomplete
+from app.locations import resolve_location, canonical_location_name, invalidate_forecast
+from app.shared_cache import start_invalidation_listener, stop_invalidation_listener
+from app.batch import stream_batch_forecast
+from app.importer import import_weather, ImportFormatError
+from app.scheduler import ForecastScheduler, PREFETCH_ENABLED, popularity
+from app.videos import get_videos, wait_for_videos
+
+logger = logging.getLogger(__name__)
+
+# Shared HTTP client lives for the whole app so connections are pooled across requests
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables if not exist and upgrade older databases
+    run_migrations()
+    app.state.http_client = create_http_client()
+    with SessionLocal() as db:
+        location_index.load(db)
+    # Cache entries invalidated by other workers are dropped here too
+    start_invalidation_listener()
+    # langchain_groq is imported and the LLM client built in a worker thread, not during a request
+    if summary_policy.backend != "local" and os.environ.get("GROQ_API_KEY"):
+        start_llm_warm_up()
+
+    # Keep popular and stale locations fresh in the background
+    scheduler = None
+    if PREFETCH_ENABLED and WEATHER_API_KEY:
+        scheduler = ForecastScheduler(app.state.http_client, WEATHER_API_KEY)
+        scheduler.start()
+
+    yield
+
+    if scheduler:
+        await scheduler.stop()
+    stop_invalidation_listener()
+    await app.state.http_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+# gzip/brotli for listings and exports
+app.add_middleware(CompressionMiddleware)
+
+# Bounded queues with 503 + Retry-After for the endpoints that call upstream services
+app.add_middleware(AdmissionMiddleware)
+
+# Requests slower than this are logged with their stage breakdown (0 turns logging off)
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "0"))
+
+# Latency of every request, labelled with the route template (not the raw path) to keep series bounded
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        http_request_duration.observe(elapsed, method=request.method, route=route_path, status=status_code)
 
-app = FastAPI()
+        if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+            timer = getattr(request.state, "timer", None)
+            stages = timer.server_timing() if timer else ""
+            logger.warning("Slow request %s %s: %.0fms %s", request.method, route_path, elapsed * 1000, stages)
 
 # Setup Jinja2 templates folder
 templates = Jinja2Templates(directory="app/templates") 
@@ -33,10 +112,18 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get the shared HTTP client (override in tests with a MockTransport client)
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
 # Get API keys from environment variables
 WEATHER_API_KEY = os.environ.get("WEATHER_API_KEY")
 YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
 
+# The search form asks for the progressively streamed results page (see get_weather)
+STREAM_WEATHER_PAGE = os.environ.get("STREAM_WEATHER_PAGE", "true").lower() == "true"
+templates.env.globals["stream_weather_page"] = STREAM_WEATHER_PAGE
+
 # Home page route: shows the input form
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request, success_delete: str = None): #type: ignore
@@ -50,37 +137,209 @@ def home(request: Request, success_delete: str = None): #type: ignore
     
 # Route to search valid locations (autocomplete)
 @app.get("/search_location", response_class=JSONResponse)
-def search_location(q: str):
+async def search_location(q: str, client: httpx.AsyncClient = Depends(get_http_client)):
     try:
         if not q or len(q) < 2:
             return {"locations": []}
         
-        if not WEATHER_API_KEY:
-            return {"locations": [], "error": "Server missing WEATHER_API_KEY configuration."}
+        # Answered from the local prefix index when possible, weatherapi.com otherwise
+        location_names = await autocomplete(client, WEATHER_API_KEY, q)
 
-        response = requests.get(
-            "https://api.weatherapi.com/v1/search.json",
-            params={"key": WEATHER_API_KEY, "q": q}
-        )
-        locations = response.json()
+        if not location_names and not WEATHER_API_KEY:
+            return {"locations": [], "error": "Server missing WEATHER_API_KEY configuration."}
 
-        location_names = [
-            loc["name"] + (", " + loc["region"] if loc.get("region") else "") for loc in locations
-        ]
         return {"locations": location_names}
 
     except Exception as e:
         return {"locations": [], "error": str(e)}
 
+class LocationNotFound(Exception):
+    pass
+
+def start_summaries(days, timer: StageTimer, tasks: list, per_day: bool = False):
+    """
+    Starts summary tasks for the days that have complete weather data.
+    Returns {date: (task, index)}: the day's summary is `(await task)[index]`.
+    per_day=True gives every day its own task so each can be shown as soon as it's done.
+    """
+    days = [
+        item for item in days
+        if item["temperature"] is not None
+        and item["humidity"] is not None
+        and item["wind_speed"] is not None
+        and item["description"] is not None
+    ]
+    batches = [[day] for day in days] if per_day else ([days] if days else [])
+
+    summary_tasks = {}
+    for batch in batches:
+        task = asyncio.create_task(timer.track("summaries", summary_policy.summarize(batch)))
+        tasks.append(task)
+        for index, day in enumerate(batch):
+            summary_tasks[day["date"]] = (task, index)
+    return summary_tasks
+
+def read_stored_days(db: Session, location: str, start, end):
+    # {date: raw weather} for the days already stored; one range query for the whole date range
+    return {
+        weather_entry.date: {
+            "location": weather_entry.location,
+            "date": weather_entry.date.strftime("%Y-%m-%d"),
+            "temperature": weather_entry.temperature,
+            "description": weather_entry.description,
+            "humidity": weather_entry.humidity,
+            "wind_speed": weather_entry.wind_speed
+        }
+        for weather_entry in get_stored_weather(db, location, start, end)
+    }
+
+async def collect_weather(place, start, end, client: httpx.AsyncClient,
+                          timer: StageTimer, tasks: list, per_day: bool = False):
+    """
+    Raw weather for every day in [start, end] of a canonical location (locations.ResolvedLocation),
+    from the DB or the forecast API for missing days, with summary tasks started as soon as
+    each day's data exists.
+    DB reads and writes run in worker threads with short-lived sessions (run_in_session), so no
+    connection is held while the forecast is awaited.
+    Returns (results in date order, {date: (task, index)}); raises LocationNotFound.
+    """
+    location = place.name
+    # STEP 1: COLLECT RAW WEATHER FOR EACH DAY
+    # Days already in the DB can be summarized while the forecast is still loading
+    rows = await timer.track("db_read", run_in_session(read_stored_days, location, start, end))
+
+    summary_tasks = start_summaries(list(rows.values()), timer, tasks, per_day)
+
+    # Every requested day is stored: the location is known good, skip the upstream call
+    requested_days = (end - start).days + 1
+    forecast_days = []
+    rate_limited = False
+    if len(rows) < requested_days:
+        try:
+            forecast_days = await timer.track(
+                "forecast", get_forecast(client, WEATHER_API_KEY, place.query, days=5)
+            )
+        except UpstreamRateLimited:
+            # Over the weatherapi quota: show the stored days instead of failing the page
+            if not rows:
+                raise
+            rate_limited = True
+
+    if len(rows) < requested_days and not forecast_days and not rate_limited:
+        # Location not found or API returned no forecast
+        raise LocationNotFound(f"Location '{location}' not found or invalid.")
+
+    new_rows = []
+    current = start
+    while current <= end:
+        if current not in rows:
+            # Find forecast for current date from API data
+            date_str = current.strftime("%Y-%m-%d")
+            forecast_day = next(
+                (day for day in forecast_days if day["date"] == date_str),
+                None
+            )
+
+            if forecast_day:
+                rows[current] = {
+                    "location": location,
+                    "date": date_str,
+                    **parse_forecast_day(forecast_day)
+                }
+                new_rows.append(rows[current])
+            else:
+                # No data for this date
+                rows[current] = {
+                    "location": location,
+                    "date": date_str,
+                    "temperature": None,
+                    "description": "No data",
+                    "humidity": None,
+                    "wind_speed": None
+                }
+        current += timedelta(days=1)
+
+    # Save all missing days in one transaction
+    if new_rows:
+        fetched_at = datetime.utcnow()
+        await timer.track("db_write", run_in_session(insert_weather_rows, [
+            {**row, "date": datetime.strptime(row["date"], "%Y-%m-%d").date(), "location_id": place.id,
+             "fetched_at": fetched_at}
+            for row in new_rows
+        ]))
+        location_index.add([location])
+
+    summary_tasks.update(start_summaries(new_rows, timer, tasks, per_day))
+    return [rows[day] for day in sorted(rows)], summary_tasks
+
+def with_summary(item, summary):
+    # Card data for the template: raw weather + summary (or the no-data message)
+    if summary:
+        return {
+             **item,  # keep raw weather data
+             "summary": summary["summary"],
+             "clothes": summary["clothes"],
+             "precautions": summary["precautions"],
+        }
+    return {
+        **item,
+        "summary": "No weather data available for this date.",
+        "clothes": "N/A",
+        "precautions": "N/A"
+    }
+
+def slot_fragment(slot_id, html):
+    # Streamed chunk that replaces the element with id `slot_id` (see fillSlot in index.html)
+    return f'<template data-slot="{slot_id}">{html}</template><script>fillSlot("{slot_id}")</script>\n'
+
+async def stream_weather_page(page_html, location, place, results, summary_tasks, youtube_task, tasks):
+    """Sends the page with placeholders first, then each summary card and the videos as they finish."""
+    head, tail = page_html.rsplit("</body>", 1)
+    rows_by_date = {item["date"]: item for item in results}
+    card_template = templates.get_template("_weather_card.html")
+    youtube_template = templates.get_template("_youtube_videos.html")
+
+    async def day_summary(date_str, task, index):
+        card = with_summary(rows_by_date[date_str], (await task)[index])
+        return f"card-{date_str}", card_template.render(entry=card)
+
+    async def videos():
+        # On a first visit get_videos returned none: the page is out, so wait for the search here
+        youtube_videos = await youtube_task or await wait_for_videos(place)
+        return "youtube-slot", youtube_template.render(youtube_videos=youtube_videos, location=location)
+
+    try:
+        yield head
+
+        waiting = [asyncio.ensure_future(day_summary(d, t, i)) for d, (t, i) in summary_tasks.items()]
+        waiting.append(asyncio.ensure_future(videos()))
+        tasks.extend(waiting)
+        for done in asyncio.as_completed(waiting):
+            slot_id, html = await done
+            yield slot_fragment(slot_id, html)
+
+        yield "</body>" + tail
+
+    finally:
+        # Client went away or everything was sent: stop leftover work
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
 # Weather route with date range
 @app.post("/weather", response_class=HTMLResponse)
-def get_weather(
+async def get_weather(
     request: Request,
     location: str = Form(...),
     start_date: str = Form(...),
     end_date: str = Form(...),
-    db: Session = Depends(get_db)
+    stream: bool = Form(False),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
+    timer = StageTimer()
+    request.state.timer = timer  # read by the metrics middleware for slow-request logs
+    tasks = []
+    streaming = False
     try:
         today = datetime.today().date()
         max_forecast_date = today + timedelta(days=5)
@@ -109,203 +368,240 @@ def get_weather(
                 "index.html",
                 {"request": request, "error": "Server missing WEATHER_API_KEY configuration."}
             )
-        
-        api_response = requests.get(
-            "https://api.weatherapi.com/v1/forecast.json",
-            params={"key": WEATHER_API_KEY, "q": location, "days": 5}
-        )
-        api_data = api_response.json()
-        forecast_days = api_data.get("forecast", {}).get("forecastday", [])
 
-        if not forecast_days:
-            # Location not found or API returned no forecast
+        # Everything below runs as a small task graph:
+        #            ┌─> youtube (cached per location, misses searched in background) ───┐
+        #   resolve ─┼─> DB read ──> days already stored ──> their summaries ────────────┤──> render
+        #            │            └─> (only if days are missing) forecast ──> summaries ─┘
+        # so the page waits for the slowest branch, not the sum of all of them.
+        try:
+            # Every spelling of a place shares its stored days, forecast, summaries and videos
+            place = await timer.track("resolve", resolve_location(client, WEATHER_API_KEY, location))
+            if place is None:
+                raise LocationNotFound(f"Location '{location}' not found or invalid.")
+            popularity.record(place.name)
+
+            youtube_task = asyncio.create_task(timer.track("youtube", get_videos(client, YOUTUBE_API_KEY, place)))
+            tasks.append(youtube_task)
+
+            results, summary_tasks = await collect_weather(
+                place, start, end, client, timer, tasks, per_day=stream
+            )
+        except LocationNotFound as e:
+            return templates.TemplateResponse(
+                "index.html", {"request": request, "error": str(e)}
+            )
+        except UpstreamRateLimited as e:
+            # Nothing stored for this search and no quota left to fetch it
+            retry_after = max(1, math.ceil(e.retry_after))
             return templates.TemplateResponse(
-                "index.html", {"request": request, "error": f"Location '{location}' not found or invalid."}
+                "index.html",
+                {"request": request, "error": f"The weather service is busy, please try again in {retry_after} seconds."},
+                status_code=503,
+                headers={"Retry-After": str(retry_after)}
             )
 
-        # STEP 1: COLLECT RAW WEATHER FOR EACH DAY
-        current = start
-        results = []
-
-        while current <= end:
-            # Check DB first
-            weather_entry = db.query(models.Weather).filter_by(location=location, date=current).first()
-
-            if weather_entry:
-                # Fetch from DB
-                results.append({
-                    "location": weather_entry.location,
-                    "date": weather_entry.date.strftime("%Y-%m-%d"),
-                    "temperature": weather_entry.temperature,
-                    "description": weather_entry.description,
-                    "humidity": weather_entry.humidity,
-                    "wind_speed": weather_entry.wind_speed
+        # STREAMING: raw weather now, summary cards and videos as they complete
+        if stream:
+            with timer.stage("render"):
+                page_html = templates.get_template("index.html").render({
+                    "request": request,
+                    "weather_data": [
+                        {**item, "pending": True} if item["date"] in summary_tasks else with_summary(item, None)
+                        for item in results
+                    ],
+                    "youtube_pending": True,
+                    "location": location
                 })
-            else:
-                # Find forecast for current date from API data
-                date_str = current.strftime("%Y-%m-%d")
-                forecast_day = next(
-                    (day for day in forecast_days if day["date"] == date_str),
-                    None
-                )
+            streaming = True
+            return StreamingResponse(
+                stream_weather_page(page_html, location, place, results, summary_tasks, youtube_task, tasks),
+                media_type="text/html",
+                headers={"Server-Timing": timer.server_timing()}
+            )
 
-                if forecast_day:
-                    forecast = forecast_day["day"]
-                    temp = forecast["avgtemp_c"]
-                    description = forecast.get("condition", {}).get("text", "No data")
-                    humidity = forecast.get("avghumidity")
-                    wind_speed = forecast.get("maxwind_kph")
-
-                    # Save to DB
-                    weather_entry = models.Weather(
-                        location=location,
-                        date=current,
-                        temperature=temp,
-                        description=description,
-                        humidity=humidity,
-                        wind_speed=wind_speed
-                    )
-                    db.add(weather_entry)
-                    db.commit()
-                    db.refresh(weather_entry)
-
-                    results.append({
-                        "location": location,
-                        "date": date_str,
-                        "temperature": temp,
-                        "description": description,
-                        "humidity": humidity,
-                        "wind_speed": wind_speed
-                    })
-                else:
-                    # No data for this date
-                    results.append({
-                        "location": location,
-                        "date": date_str,
-                        "temperature": None,
-                        "description": "No data",
-                        "humidity": None,
-                        "wind_speed": None
-                    })
-
-            current += timedelta(days=1)
-        
-        # STEP 2: LLM SUMMARIES FOR EACH DAY
+        # STEP 2: LLM SUMMARIES FOR EACH DAY (started above as soon as each day's data existed)
         final_output = []
 
         for item in results:
-            if (
-                item["temperature"] is not None
-                and item["humidity"] is not None
-                and item["wind_speed"] is not None
-                and item["description"] is not None
-            ):
-                summary = generate_summary_llm(
-                    location=item["location"],
-                    date=item["date"],
-                    temp=item["temperature"],
-                    humidity=item["humidity"],
-                    wind_speed=item["wind_speed"],
-                    description=item["description"]
-                )
-
-                final_output.append({
-                     **item,  # keep raw weather data
-                     "summary": summary["summary"],
-                     "clothes": summary["clothes"],
-                     "precautions": summary["precautions"],
-                })
-            else:
-                final_output.append({
-                    **item,
-                    "summary": "No weather data available for this date.",
-                    "clothes": "N/A",
-                    "precautions": "N/A"
-                 })  
-                
-            print(final_output)
+            summary = None
+            if item["date"] in summary_tasks:
+                task, index = summary_tasks[item["date"]]
+                summary = (await task)[index]
+            final_output.append(with_summary(item, summary))
         
-        # Step 3 # Fetch YouTube videos for the location
-        youtube_videos = []
-        if not YOUTUBE_API_KEY:
-            youtube_videos = []
-        try:
-            url = "https://www.googleapis.com/youtube/v3/search"
-            params = {
-                "part": "snippet",
-                "q": location,
-                "type": "video",
-                "maxResults": 4,
-                "key": YOUTUBE_API_KEY
-            }
-            yt_response = requests.get(url, params=params)
-            yt_data = yt_response.json()
-            for item in yt_data.get("items", []):
-                youtube_videos.append({
-                    "title": item["snippet"]["title"],
-                    "thumbnail": item["snippet"]["thumbnails"]["medium"]["url"],
-                    "video_url": f"https://www.youtube.com/watch?v={item['id']['videoId']}"
-                })
-        except Exception as e:
-            youtube_videos = []
+        # Step 3 # YouTube videos for the location (started as soon as it was resolved)
+        youtube_videos = await youtube_task
 
         # STEP 4: RETURN EVERYTHING TO TEMPLATE
-        return templates.TemplateResponse(
-            "index.html",
-            {
-                "request": request,
-                "weather_data": final_output,
-                "youtube_videos": youtube_videos,
-                "location": location
-            }
-        )
+        with timer.stage("render"):
+            response = templates.TemplateResponse(
+                "index.html",
+                {
+                    "request": request,
+                    "weather_data": final_output,
+                    "youtube_videos": youtube_videos,
+                    "location": location
+                }
+            )
+        response.headers["Server-Timing"] = timer.server_timing()
+        return response
 
     except Exception as e:
         return templates.TemplateResponse(
             "index.html", {"request": request, "error": str(e)}
         )
+
+    finally:
+        # Early returns and errors must not leave upstream calls running
+        # (a streamed page cleans up when the stream ends instead)
+        if not streaming:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
     
+# JSON forecasts for many locations at once, streamed as NDJSON (one line per location)
+@app.post("/weather/batch")
+async def get_weather_batch(
+    batch: schemas.WeatherBatchRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    return StreamingResponse(
+        stream_batch_forecast(batch, client, WEATHER_API_KEY),
+        media_type="application/x-ndjson"
+    )
+
+# Bulk import / bulk edit: CSV in the /export/csv format or NDJSON records, sent as the raw body
+@app.post("/weather/import")
+async def import_weather_records(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="default: from Content-Type")
+):
+    file_format = format or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    try:
+        report = await import_weather(request.stream(), file_format)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return JSONResponse(report)
+
+# Page size for GET /weather (JSON mode)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 @app.get("/weather")
-def get_all_weather(db: Session = Depends(get_db)):
-    records = db.query(models.Weather).all()
-    return [
-        {
-            "id": r.id,  # <-- include the unique ID
-            "location": r.location,
-            "date": r.date.strftime("%Y-%m-%d"),
-            "temperature": r.temperature,
-            "description": r.description,
-            "humidity": r.humidity,
-            "wind_speed": r.wind_speed
-        }
-        for r in records
-    ]
+def get_all_weather(
+    request: Request,
+    location: Optional[str] = None,
+    start_date: Optional[date_type] = None,
+    end_date: Optional[date_type] = None,
+    cursor: Optional[int] = Query(None, description="id of the last row from the previous page"),
+    limit: Optional[int] = Query(None, ge=1),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    if location:
+        location = canonical_location_name(db, location)
+    filters = {"location": location, "start_date": start_date, "end_date": end_date, "after_id": cursor}
+
+    # NDJSON: one record per line, read in batches so the full table is never in memory
+    if format == "ndjson":
+        return versioned_response(
+            request, db, lambda: (stream_weather_ndjson(filters, limit), {}), "application/x-ndjson"
+        )
+
+    # JSON: one page, next page cursor in the X-Next-Cursor header
+    def build_page():
+        page_size = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        records = list_weather(db, **filters).limit(page_size + 1).all()
+
+        headers = {}
+        if len(records) > page_size:
+            records = records[:page_size]
+            headers["X-Next-Cursor"] = str(records[-1].id)
+
+        page = [schemas.WeatherResponse.model_validate(r).model_dump(mode="json") for r in records]
+        return [json.dumps(page, ensure_ascii=False, separators=(",", ":"))], headers
+
+    return versioned_response(request, db, build_page, "application/json")
+
+# Per-location rollups read from the weather_stats table (see stats.py)
+@app.get("/weather/stats")
+def get_weather_statistics(
+    request: Request,
+    location: Optional[str] = None,
+    start_date: Optional[date_type] = None,
+    end_date: Optional[date_type] = None,
+    period: str = Query("month", pattern="^(" + "|".join(PERIODS) + ")$"),
+    percentiles: str = Query(",".join(str(p) for p in DEFAULT_PERCENTILES), description="comma separated, 0-100"),
+    db: Session = Depends(get_db)
+):
+    try:
+        requested = tuple(float(p) for p in percentiles.split(",") if p.strip())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="percentiles must be comma separated numbers")
+    if not requested or any(p < 0 or p > 100 for p in requested):
+        raise HTTPException(status_code=422, detail="percentiles must be between 0 and 100")
+    if location:
+        location = canonical_location_name(db, location)
+
+    return versioned_response(
+        request, db,
+        lambda: ([json.dumps(get_weather_stats(db, location, start_date, end_date, period, requested), separators=(",", ":"))], {}),
+        "application/json"
+    )
 
 @app.get("/export/csv")
-def export_weather_csv(db: Session = Depends(get_db)):
-    # Fetch all weather records
-    records = db.query(models.Weather).all()
-    
-    # Create a CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(["Location", "Date", "Temperature(°C)", "Description", "Humidity(%)", "Wind Speed(kph)"])
-    
-    # Write data rows
-    for rec in records:
-        writer.writerow([rec.location, rec.date, rec.temperature, rec.description, rec.humidity, rec.wind_speed])
-    
-    output.seek(0)
-    
+def export_weather_csv(
+    request: Request,
+    location: Optional[str] = None,
+    start_date: Optional[date_type] = None,
+    end_date: Optional[date_type] = None,
+    db: Session = Depends(get_db)
+):
+    # Same filters as GET /weather; rows are written and sent in chunks
+    if location:
+        location = canonical_location_name(db, location)
+    filters = {"location": location, "start_date": start_date, "end_date": end_date}
+
     # Return as downloadable file
-    return StreamingResponse(
-        output,
-        media_type="text/csv",
+    return versioned_response(
+        request, db,
+        lambda: (stream_weather_csv(filters), {}),
+        "text/csv",
         headers={"Content-Disposition": "attachment; filename=weather_data.csv"}
     )
 
+# Columnar exports for analysts (need the optional pyarrow package)
+COLUMNAR_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "weather_data.parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "weather_data.arrows"),
+}
+
+@app.get("/export/{file_format}")
+def export_weather_columnar(
+    request: Request,
+    file_format: str,
+    location: Optional[str] = None,
+    start_date: Optional[date_type] = None,
+    end_date: Optional[date_type] = None,
+    db: Session = Depends(get_db)
+):
+    if file_format not in COLUMNAR_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown export format '{file_format}'")
+    if importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Server missing pyarrow for columnar export.")
+
+    if location:
+        location = canonical_location_name(db, location)
+    filters = {"location": location, "start_date": start_date, "end_date": end_date}
+    media_type, filename = COLUMNAR_FORMATS[file_format]
+    return versioned_response(
+        request, db,
+        lambda: (stream_weather_columnar(filters, file_format), {}),
+        media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @app.post("/weather/update", response_class=HTMLResponse)
 def update_weather(
     request: Request,
@@ -326,7 +622,8 @@ def update_weather(
                 "index.html", {"request": request, "error_update": "Invalid date format"}
             )
 
-        # Find record
+        # Find record (under any known spelling of the location)
+        location = canonical_location_name(db, location)
         weather_entry = db.query(models.Weather).filter_by(location=location, date=record_date).first()
         if not weather_entry:
             return templates.TemplateResponse(
@@ -379,9 +676,16 @@ def update_weather(
         if description.strip() != "":
             weather_entry.description = description # type: ignore
 
+        # Edited by hand: the background refresh must not overwrite it
+        weather_entry.fetched_at = None # type: ignore
+
+        weather_changed(db, [(location, record_date)])
         db.commit()
         db.refresh(weather_entry)
 
+        # Summaries generated for the old values must not be served again
+        invalidate_summary_cache(db, location, record_date)
+
         return templates.TemplateResponse(
             "index.html",
             {
@@ -402,9 +706,19 @@ def delete_weather(weather_id: int, db: Session = Depends(get_db)):
     if not weather_entry:
         raise HTTPException(status_code=404, detail="Record not found")
 
+    location, record_date = weather_entry.location, weather_entry.date
     db.delete(weather_entry)
+    weather_changed(db, [(location, record_date)])
     db.commit()
+    invalidate_summary_cache(db, location, record_date)
+    # The day is gone; the next search fetches it again rather than refilling it from a cached forecast
+    invalidate_forecast(db, location)
 
     # Redirect back to home page with a success message
-    message = f"Weather record for {weather_entry.location} on {weather_entry.date.strftime('%Y-%m-%d')} deleted successfully."
+    message = f"Weather record for {location} on {record_date.strftime('%Y-%m-%d')} deleted successfully."
     return RedirectResponse(url=f"/?success_delete={message}", status_code=303)
+
+# Prometheus scrape endpoint (see metrics.py for the series)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
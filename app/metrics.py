@@ -0,0 +1,169 @@
+"""
+metrics.py
+
+In-process counters and latency histograms, exported in Prometheus text format at GET /metrics.
+
+- http_request_duration_seconds{method, route, status}: every request (middleware in main.py).
+  For streamed responses this is the time until the response starts.
+- stage_duration_seconds{stage}: get_weather stages (db_read, db_write, forecast, summaries, youtube, render).
+- dependency_duration_seconds{dependency} / upstream_errors_total{dependency, error}: each call to
+  weatherapi.com, YouTube and the LLM.
+- cache_requests_total{cache, result}: hits and misses of the summary, forecast, autocomplete and youtube caches;
+  "<cache>_shared" counts the lookups that missed in process and went to the shared cache.
+- shared_cache_errors_total{operation}: failed calls to the shared cache (app/shared_cache.py).
+- llm_tokens_total{type}: prompt/completion tokens reported by the LLM.
+- llm_summary_failures_total{call, error}: LLM summary calls that failed or timed out, so their
+  days got the fallback summary (call: per_day, batched, or shared for a wait on another worker's call).
+- rate_limit_rejections_total{service} / admission_rejections_total{route}: calls and requests
+  refused by app/limits.py.
+
+Values are per process; with several uvicorn workers, Prometheus scrapes each one.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+REGISTRY = []
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+http_request_duration = _register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+))
+stage_duration = _register(Histogram(
+    "stage_duration_seconds", "Duration of each get_weather stage.", ["stage"]
+))
+dependency_duration = _register(Histogram(
+    "dependency_duration_seconds", "Latency of calls to external services.", ["dependency"]
+))
+upstream_errors = _register(Counter(
+    "upstream_errors_total", "Failed calls to external services.", ["dependency", "error"]
+))
+cache_requests = _register(Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss).", ["cache", "result"]
+))
+shared_cache_errors = _register(Counter(
+    "shared_cache_errors_total", "Failed calls to the shared (L2) cache.", ["operation"]
+))
+rate_limit_rejections = _register(Counter(
+    "rate_limit_rejections_total", "Upstream calls refused by our own token buckets.", ["service"]
+))
+admission_rejections = _register(Counter(
+    "admission_rejections_total", "Requests shed with 503 by admission control.", ["route"]
+))
+llm_tokens = _register(Counter(
+    "llm_tokens_total", "Tokens used by LLM calls.", ["type"]
+))
+llm_summary_failures = _register(Counter(
+    "llm_summary_failures_total", "LLM summary calls that failed or timed out.", ["call", "error"]
+))
+
+
+@contextmanager
+def track_dependency(dependency):
+    # Times one external call and counts it as an error if it raises. A cancelled call (client
+    # disconnect, timeout of the caller) is not the dependency's fault and isn't counted.
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_errors.inc(dependency=dependency, error=type(e).__name__)
+        raise
+    finally:
+        dependency_duration.observe(time.perf_counter() - start, dependency=dependency)
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,95 @@
+"""
+migrations.py
+
+Schema setup and upgrades, run once on app startup or by hand with:
+
+    python -m app.migrations
+
+- Base.metadata.create_all creates any table that doesn't exist yet (fresh databases get the
+  current schema straight away).
+- MIGRATIONS upgrade tables that already existed. Each runs once per database, in order, and its
+  name is recorded in schema_migrations. Migrations must be idempotent, since a fresh database
+  already has the current schema when they run.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.crud import ensure_weather_unique_index
+from app.database import SessionLocal, engine
+from app.locations import merge_duplicate_locations
+from app.stats import rebuild_weather_stats
+import app.models as models
+
+def add_weather_fetched_at(db):
+    # Existing rows came from the forecast API at an unknown time: mark them as stale
+    columns = {column["name"] for column in inspect(db.bind).get_columns("weather")}
+    if "fetched_at" not in columns:
+        db.execute(text("ALTER TABLE weather ADD COLUMN fetched_at TIMESTAMP"))
+        db.execute(text("UPDATE weather SET fetched_at = :epoch"), {"epoch": datetime(1970, 1, 1)})
+        db.commit()
+
+
+def add_weather_table_version(db):
+    # Create the counter up front so concurrent first writes only ever UPDATE it
+    if not db.get(models.TableVersion, "weather"):
+        db.add(models.TableVersion(name="weather", version=1, updated_at=datetime.utcnow()))
+        db.commit()
+
+
+def add_weather_location_id(db):
+    # Key existing rows on canonical locations, merging spellings that only differ in case/whitespace
+    columns = {column["name"] for column in inspect(db.bind).get_columns("weather")}
+    if "location_id" not in columns:
+        db.execute(text("ALTER TABLE weather ADD COLUMN location_id INTEGER REFERENCES locations (id)"))
+        db.commit()
+    merge_duplicate_locations(db)
+    db.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_weather_location_id_date ON weather (location_id, date)"
+    ))
+    db.commit()
+
+
+def replace_weather_stats_histograms(db):
+    # Rollups used to keep fixed-bin histograms: rebuild them with the sorted values instead
+    columns = {column["name"] for column in inspect(db.bind).get_columns("weather_stats")}
+    if "sorted_values" not in columns:
+        db.execute(text("DROP TABLE weather_stats"))
+        models.WeatherStats.__table__.create(bind=db.connection())
+        db.commit()
+        rebuild_weather_stats(db)
+
+
+# (name, function(db)) in the order they must run; append new ones at the end
+MIGRATIONS = [
+    ("0001_weather_unique_location_date", ensure_weather_unique_index),
+    ("0002_weather_fetched_at", add_weather_fetched_at),
+    ("0003_weather_stats", rebuild_weather_stats),
+    ("0004_weather_table_version", add_weather_table_version),
+    ("0005_weather_canonical_locations", add_weather_location_id),
+    ("0006_weather_stats_sorted_values", replace_weather_stats_histograms),
+]
+
+
+def run_migrations():
+    models.Base.metadata.create_all(bind=engine)
+
+    with SessionLocal() as db:
+        applied = {name for (name,) in db.query(models.SchemaMigration.name)}
+        for name, migrate in MIGRATIONS:
+            if name in applied:
+                continue
+            migrate(db)
+            db.add(models.SchemaMigration(name=name))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker applied it at the same time
+                db.rollback()
+
+
+if __name__ == "__main__":
+    run_migrations()
+    print("Database is up to date.")
@@ -7,18 +7,81 @@ Weather Table:
 - Stores weather information for different locations and dates.
 - Columns:
     - id: Primary key, unique identifier for each record
-    - location: Name, ZIP code, or any string representing the location
+    - location: Display name of the canonical location (see Location below)
+    - location_id: Canonical location the row belongs to
     - date: Date of the weather reading
     - temperature: Temperature value (float)
     - description: Optional text describing the weather (e.g., Sunny, Rainy)
     - humidity: Optional humidity percentage (integer)
     - wind_speed: Optional wind speed value (float)
+    - fetched_at: When the values were last loaded from the forecast API.
+                  NULL means the row was edited by hand and is never refreshed automatically.
+- (location_id, date) is unique so concurrent inserts for the same day can't create duplicates,
+  and is the conflict target of bulk inserts. (location, date) is unique as well, since every
+  canonical location has its own display name.
 
-Note: The actual table in the SQLite database will be created when
-      Base.metadata.create_all(bind=engine) is executed.
+Location Table:
+- One row per real place, so different spellings of it share Weather rows (app/locations.py).
+- Columns:
+    - id: Primary key, stored in Weather.location_id
+    - key: canonical key (unique); "weatherapi:<name>|<region>|<country>|<lat>,<lon>" for places
+           resolved with weatherapi.com, "text:<normalized name>" for names stored without a lookup
+    - name: unique display name ("City, Region"), stored in Weather.location
+    - region, country, lat, lon: from weatherapi.com (NULL for "text:" locations)
+    - created_at: when the location was first seen
+
+LocationAlias Table:
+- Memoized free-text -> location mapping, so each spelling is looked up upstream only once.
+- Columns:
+    - alias: normalized input text, lowercase with single spaces (primary key)
+    - location_id: Location it resolves to (indexed, for merges)
+
+SummaryCache Table:
+- Stores LLM generated summaries so the same weather is never summarized twice.
+- Columns:
+    - key: sha256 of the model name + rendered prompt (primary key)
+    - model: LLM model name used to generate the summary
+    - location, date: weather row the summary belongs to (used for invalidation)
+    - summary, clothes, precautions: LLM output
+    - created_at: when the summary was generated
+
+LocationVideos Table:
+- YouTube search results per canonical location, so search.list runs once per place (app/videos.py).
+- Columns:
+    - location_id: Location the videos were searched for (primary key)
+    - videos: JSON list of {title, thumbnail, video_url}
+    - fetched_at: when they were fetched; refreshed after YOUTUBE_CACHE_TTL_SECONDS
+
+KnownLocation Table:
+- Every "City, Region" name seen from the autocomplete API or stored in Weather.
+- Loaded into the in-memory prefix index (app/location_index.py) on startup.
+- Columns:
+    - name: display name as shown in the dropdown (primary key)
+
+WeatherStats Table:
+- Per-location monthly rollups of Weather, maintained on every write by app/stats.py.
+- Columns:
+    - location, period ("YYYY-MM"), metric (temperature, humidity or wind_speed): primary key
+    - count, total, minimum, maximum: over the non-null values of that month
+    - sorted_values: that month's values in ascending order (float64 array, at most 31) for percentiles
+
+TableVersion Table:
+- A counter per table, bumped in the same transaction as every write to it.
+- Drives the ETag/Last-Modified headers of GET /weather and the exports (app/http_cache.py).
+- Columns:
+    - name: table name (primary key)
+    - version: incremented on every change
+    - updated_at: time of the last change
+
+SchemaMigration Table:
+- Names of the migrations in app/migrations.py already applied to this database.
+
+Note: The tables are created by app/migrations.py (Base.metadata.create_all + migrations)
+      when the app starts or when `python -m app.migrations` is run.
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, JSON, LargeBinary, ForeignKey
+from datetime import datetime
 from .database import Base
 
 class Weather(Base):
@@ -26,9 +89,95 @@ class Weather(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     location = Column(String, index=True, nullable=False) #for quick loopkup used index
+    # NULL only on rows from before migration 0005
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=True)
     date = Column(Date, nullable=False)
     temperature = Column(Float, nullable=False)
     description = Column(String, nullable=True)
     humidity = Column(Integer, nullable=True)
     wind_speed = Column(Float, nullable=True)
+    fetched_at = Column(DateTime, nullable=True)
+
+    # One row per location per day; (location_id, date) is the conflict target for bulk upserts
+    __table_args__ = (
+        Index("uq_weather_location_date", "location", "date", unique=True),
+        Index("uq_weather_location_id_date", "location_id", "date", unique=True),
+    )
+
+
+class Location(Base):
+    __tablename__ = "locations"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, nullable=False, unique=True)
+    name = Column(String, nullable=False, unique=True)
+    region = Column(String, nullable=True)
+    country = Column(String, nullable=True)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LocationAlias(Base):
+    __tablename__ = "location_aliases"
+
+    alias = Column(String, primary_key=True)
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=False, index=True)
+
+
+class SummaryCache(Base):
+    __tablename__ = "summary_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    location = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    summary = Column(String, nullable=False)
+    clothes = Column(String, nullable=False)
+    precautions = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # /weather/update invalidates by location + date
+    __table_args__ = (Index("ix_summary_cache_location_date", "location", "date"),)
+
+
+class LocationVideos(Base):
+    __tablename__ = "location_videos"
+
+    location_id = Column(Integer, ForeignKey("locations.id"), primary_key=True)
+    videos = Column(JSON, nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+
+
+class KnownLocation(Base):
+    __tablename__ = "known_locations"
+
+    name = Column(String, primary_key=True)
+
+
+class WeatherStats(Base):
+    __tablename__ = "weather_stats"
+
+    location = Column(String, primary_key=True)
+    period = Column(String(7), primary_key=True)
+    metric = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    minimum = Column(Float, nullable=False)
+    maximum = Column(Float, nullable=False)
+    sorted_values = Column(LargeBinary, nullable=False)
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
 
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,198 @@
+"""
+scheduler.py
+
+Background forecast prefetch and refresh, started from the FastAPI lifespan.
+
+- PopularityTracker counts /weather searches per location (older searches count less after every
+  cycle), so the busiest locations are known without a DB query.
+- ForecastScheduler runs every PREFETCH_INTERVAL_SECONDS and, for
+    - the PREFETCH_TOP_N most searched locations, and
+    - every location whose stored forecast is older than REFRESH_MAX_AGE_SECONDS,
+  fetches the 5-day forecast, upserts the rows (new days inserted, stale days refreshed, hand-edited
+  rows left alone) and generates their summaries, so those searches are served from the DB and caches.
+- At most PREFETCH_CONCURRENCY locations are worked on at once, upstream calls are spaced to stay under
+  PREFETCH_REQUESTS_PER_MINUTE, and a 429 from weatherapi pauses the scheduler for its Retry-After.
+- Every uvicorn worker runs a scheduler. Before refreshing a location, a worker claims it in the
+  shared cache for PREFETCH_CLAIM_SECONDS (shared_cache.claim), so within a cycle only one worker
+  calls upstream for it and the others skip it. With CACHE_BACKEND=none each worker refreshes alone.
+- Prefetch only uses spare quota: a location is skipped while the weatherapi bucket (limits.py) is
+  nearly empty, leaving the rest for user requests.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import httpx
+
+from app.clients import fetch_forecast, normalize_location, parse_forecast_day, remember_forecast, UpstreamRateLimited
+from app.crud import get_weather, get_stale_locations, upsert_weather_rows
+from app.limits import upstream_limiter
+from app.database import run_in_session
+from app.location_index import location_index
+from app.locations import lookup_location
+from app.shared_cache import claim
+from app.summarizers import summary_policy
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_INTERVAL_SECONDS = float(os.environ.get("PREFETCH_INTERVAL_SECONDS", "900"))
+PREFETCH_TOP_N = int(os.environ.get("PREFETCH_TOP_N", "20"))
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", "4"))
+PREFETCH_REQUESTS_PER_MINUTE = float(os.environ.get("PREFETCH_REQUESTS_PER_MINUTE", "30"))
+REFRESH_MAX_AGE_SECONDS = float(os.environ.get("REFRESH_MAX_AGE_SECONDS", str(6 * 3600)))
+# How long a worker's claim on a location keeps the other workers from refreshing it too
+PREFETCH_CLAIM_SECONDS = float(os.environ.get("PREFETCH_CLAIM_SECONDS", str(PREFETCH_INTERVAL_SECONDS / 2)))
+
+# forecast.json?days=5 covers today + 4 days
+FORECAST_DAYS = 5
+
+
+class PopularityTracker:
+    def __init__(self):
+        self._counts = Counter()
+        self._names = {}  # normalized -> name as last searched
+
+    def record(self, location: str):
+        key = normalize_location(location)
+        self._counts[key] += 1
+        self._names[key] = location
+
+    def top(self, n: int):
+        return [self._names[key] for key, _ in self._counts.most_common(n)]
+
+    def decay(self, factor: float = 0.5):
+        # Halve every count so recent searches matter more; forget locations that drop to ~0
+        for key in list(self._counts):
+            self._counts[key] *= factor
+            if self._counts[key] < 0.1:
+                del self._counts[key]
+                del self._names[key]
+
+
+popularity = PopularityTracker()
+
+
+class ForecastScheduler:
+    def __init__(self, client: httpx.AsyncClient, api_key: str):
+        self.client = client
+        self.api_key = api_key
+        self._task = None
+        self._slots = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+        self._pace_lock = asyncio.Lock()
+        self._next_call_at = 0.0  # monotonic time the next upstream call may start
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Forecast prefetch cycle failed")
+            popularity.decay()
+            await asyncio.sleep(PREFETCH_INTERVAL_SECONDS)
+
+    def plan(self, db):
+        # Popular locations first, then anything else with stale rows
+        today = date.today()
+        cutoff = datetime.utcnow() - timedelta(seconds=REFRESH_MAX_AGE_SECONDS)
+        stale = get_stale_locations(db, today, today + timedelta(days=FORECAST_DAYS - 1), cutoff)
+        popular = [loc for loc in popularity.top(PREFETCH_TOP_N) if self._needs_refresh(db, loc, today, cutoff)]
+        return list(dict.fromkeys(popular + stale))
+
+    def _needs_refresh(self, db, location, today, cutoff):
+        rows = get_weather(db, location, today, today + timedelta(days=FORECAST_DAYS - 1))
+        return len(rows) < FORECAST_DAYS or any(r.fetched_at and r.fetched_at < cutoff for r in rows)
+
+    async def run_once(self):
+        # DB work runs in worker threads (run_in_session), never on the event loop
+        locations = await run_in_session(self.plan)
+        if locations:
+            logger.info("Prefetching forecasts for %d locations", len(locations))
+        await asyncio.gather(*(self.refresh_location(location) for location in locations))
+
+    async def _wait_for_turn(self):
+        # Space upstream calls evenly: one every 60 / PREFETCH_REQUESTS_PER_MINUTE seconds
+        async with self._pace_lock:
+            delay = self._next_call_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_call_at = time.monotonic() + 60 / PREFETCH_REQUESTS_PER_MINUTE
+
+    async def refresh_location(self, location: str):
+        async with self._slots:
+            # Searched and stored names are canonical, so this never needs an upstream lookup
+            place = await run_in_session(lookup_location, location)
+            if place is None:
+                logger.debug("Prefetch skipped for %s: not a known location", location)
+                return
+            # Claimed before waiting for a turn, so skipped locations don't use up the pacing
+            if not await claim(f"prefetch:{normalize_location(place.query)}", PREFETCH_CLAIM_SECONDS):
+                logger.debug("Prefetch skipped for %s: another worker is refreshing it", location)
+                return
+            await self._wait_for_turn()
+            if await upstream_limiter.near_quota("weatherapi"):
+                logger.debug("Prefetch skipped for %s: weatherapi quota reserved for users", location)
+                return
+            try:
+                forecast_days = await fetch_forecast(self.client, self.api_key, place.query, days=FORECAST_DAYS)
+            except UpstreamRateLimited as e:
+                # Push every following call back until the API lets us in again
+                self._next_call_at = max(self._next_call_at, time.monotonic() + e.retry_after)
+                logger.warning("Prefetch paused: %s", e)
+                return
+            except Exception:
+                logger.exception("Prefetch failed for %s", location)
+                return
+
+            if not forecast_days:
+                return
+            await remember_forecast(place.query, FORECAST_DAYS, forecast_days)
+
+            fetched_at = datetime.utcnow()
+            rows = []
+            for forecast_day in forecast_days:
+                rows.append({
+                    "location": place.name,
+                    "location_id": place.id,
+                    "date": datetime.strptime(forecast_day["date"], "%Y-%m-%d").date(),
+                    **parse_forecast_day(forecast_day),
+                    "fetched_at": fetched_at,
+                })
+
+            days = await run_in_session(_store_forecast, place.name, rows)
+            location_index.add([place.name])
+            # Warm the summary cache with the values now stored
+            await summary_policy.summarize(days)
+
+
+def _store_forecast(db, location, rows):
+    # Upserts the fetched days and returns the stored values as summary inputs
+    upsert_weather_rows(db, rows)
+    stored = get_weather(db, location, rows[0]["date"], rows[-1]["date"])
+    return [
+        {
+            "location": r.location,
+            "date": r.date.strftime("%Y-%m-%d"),
+            "temperature": r.temperature,
+            "description": r.description,
+            "humidity": r.humidity,
+            "wind_speed": r.wind_speed,
+        }
+        for r in stored
+        if None not in (r.temperature, r.humidity, r.wind_speed, r.description)
+    ]
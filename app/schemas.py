@@ -4,7 +4,7 @@ Output model → defines what is returned from the API (weather details)
 """
 from pydantic import BaseModel, Field, field_validator
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 # -------------------------------
 # Input model for CREATE/READ
@@ -16,8 +16,8 @@ class WeatherRequest(BaseModel):
 
     # Validator to ensure start_date <= end_date
     @field_validator('end_date')
-    def check_date_range(cls, v, values):
-        start = values.get('start_date')
+    def check_date_range(cls, v, info):
+        start = info.data.get('start_date')
         if start and v < start:
             raise ValueError("end_date must be after or equal to start_date")
         return v
@@ -27,6 +27,7 @@ class WeatherRequest(BaseModel):
 # Output model for responses
 # -------------------------------
 class WeatherResponse(BaseModel):
+    id: Optional[int] = None
     location: str
     date: date
     temperature: float
@@ -35,4 +36,27 @@ class WeatherResponse(BaseModel):
     wind_speed: Optional[float]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# -------------------------------
+# Batch forecast (POST /weather/batch)
+# -------------------------------
+class WeatherBatchRequest(BaseModel):
+    locations: List[str] = Field(..., min_length=1, max_length=500, description="City names or zip codes")
+    start_date: date
+    end_date: date
+
+    @field_validator('end_date')
+    def check_date_range(cls, v, info):
+        start = info.data.get('start_date')
+        if start and v < start:
+            raise ValueError("end_date must be after or equal to start_date")
+        return v
+
+
+class WeatherBatchResult(BaseModel):
+    location: str
+    status: str  # "ok" or "error"
+    weather: List[WeatherResponse] = []
+    error: Optional[str] = None
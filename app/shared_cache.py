@@ -0,0 +1,528 @@
+"""
+shared_cache.py
+
+Two-level cache for forecasts, autocomplete results and LLM summaries, shared by every uvicorn
+worker on every node so each one doesn't warm up (and call upstream) on its own.
+
+- L1: a bounded in-process LRUCache with a TTL (cache.py); a hit never leaves the process.
+- L2: a store every worker reads and writes, picked with CACHE_BACKEND:
+    - "sqlite" (default): a SQLite file (CACHE_DB_PATH), shared by the workers of one host.
+    - "redis": any Redis-protocol server (CACHE_REDIS_URL), shared by every node. The client below
+      speaks RESP itself, no extra package; benchmarks/fake_redis.py is a local stand-in server.
+    - "none": L1 only, per process.
+  An L1 miss found in L2 fills L1. A failing L2 counts as a miss (shared_cache_errors_total) and is
+  skipped for CACHE_RETRY_SECONDS, so the app keeps working from L1 and the upstreams.
+- Stampede protection: fetch() runs one fetch per key per process (SingleFlight) and one per key
+  across workers: the first takes a lock entry in L2 (CACHE_LOCK_TIMEOUT_SECONDS), the others
+  wait for its value to show up in L2.
+- Invalidation: entries carry a tag (e.g. location and date of a weather row). invalidate(tags)
+  deletes them from L2 and tells every worker to drop them from its L1, through Redis pub/sub or,
+  with SQLite, an event table each worker polls every CACHE_INVALIDATION_POLL_SECONDS.
+  The listener runs in a thread started with the app (start_invalidation_listener).
+- claim(name, ttl): a lease across workers, for work only one of them should do (e.g. the
+  background forecast refresh, which runs in every worker).
+- Values are stored as JSON.
+- L2 calls block (file or socket I/O). Async code uses aget/aget_many/aset/ainvalidate and fetch,
+  which run them in a worker thread; an L1 hit stays on the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+from app.cache import LRUCache, SingleFlight
+from app.metrics import record_cache, shared_cache_errors
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", str(BASE_DIR / "shared_cache.db"))
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+CACHE_REDIS_TIMEOUT_SECONDS = float(os.environ.get("CACHE_REDIS_TIMEOUT_SECONDS", "1"))
+# Prefix of every Redis key and of the invalidation channel, so apps can share a server
+CACHE_KEY_PREFIX = os.environ.get("CACHE_KEY_PREFIX", "weather-app:")
+CACHE_LOCK_TIMEOUT_SECONDS = float(os.environ.get("CACHE_LOCK_TIMEOUT_SECONDS", "10"))
+CACHE_INVALIDATION_POLL_SECONDS = float(os.environ.get("CACHE_INVALIDATION_POLL_SECONDS", "1"))
+CACHE_RETRY_SECONDS = float(os.environ.get("CACHE_RETRY_SECONDS", "5"))
+
+# How often a waiting worker looks for the value another one is fetching: every 50 ms at first,
+# backing off to every 500 ms for a slow fetch
+LOCK_POLL_SECONDS = 0.05
+LOCK_POLL_MAX_SECONDS = 0.5
+
+
+# -------------------------------
+# SQLite store (one host)
+# -------------------------------
+class SQLiteCacheStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()  # sqlite3 connections can't be shared between threads
+        self._writes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, tag TEXT, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_tag ON cache_entries (tag)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_events "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(conn.execute(
+                f"SELECT key, value FROM cache_entries WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, time.time())
+            ))
+        return found
+
+    def set(self, key, value, ttl, tag=None):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, tag, expires_at) VALUES (?, ?, ?, ?)",
+            (key, value, tag, time.time() + ttl)
+        )
+        # Expired entries are only skipped by reads; clear them out now and then
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+
+    def add(self, key, value, ttl):
+        # Sets key only if it's missing or expired; True if it was set
+        conn = self._connection()
+        now = time.time()
+        conn.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?", (key, now))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def invalidate(self, tags):
+        conn = self._connection()
+        for start in range(0, len(tags), 500):
+            chunk = tags[start:start + 500]
+            conn.execute(f"DELETE FROM cache_entries WHERE tag IN ({','.join('?' * len(chunk))})", chunk)
+
+    def publish(self, message):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("INSERT INTO cache_events (message, created_at) VALUES (?, ?)", (message, now))
+        # Every listener has long read anything this old
+        conn.execute("DELETE FROM cache_events WHERE created_at < ?", (now - 600,))
+
+    def listen(self, callback, stop):
+        # Polls the event table; runs until stop is set
+        cursor = None
+        while not stop.is_set():
+            try:
+                conn = self._connection()
+                if cursor is None:
+                    cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_events").fetchone()[0]
+                for event_id, message in conn.execute(
+                    "SELECT id, message FROM cache_events WHERE id > ? ORDER BY id", (cursor,)
+                ).fetchall():
+                    cursor = event_id
+                    callback(message)
+            except sqlite3.Error:
+                logger.exception("Reading cache invalidations failed")
+            stop.wait(CACHE_INVALIDATION_POLL_SECONDS)
+
+    def interrupt(self):
+        # The poll loop notices stop by itself
+        pass
+
+
+# -------------------------------
+# Redis store (every node)
+# -------------------------------
+class RedisError(Exception):
+    # An error reply from the server
+    pass
+
+
+class RedisConnection:
+    # Minimal RESP2 client: one socket, one command (or pipeline) at a time
+    def __init__(self, url, timeout=CACHE_REDIS_TIMEOUT_SECONDS):
+        parsed = urlparse(url)
+        self.sock = socket.create_connection((parsed.hostname or "127.0.0.1", parsed.port or 6379), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if parsed.password:
+            self.execute("AUTH", *([parsed.username] if parsed.username else []), parsed.password)
+        database = parsed.path.strip("/")
+        if database and database != "0":
+            self.execute("SELECT", database)
+
+    def send(self, *commands):
+        parts = []
+        for command in commands:
+            parts.append(b"*%d\r\n" % len(command))
+            for arg in command:
+                data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+                parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+
+    def read(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            return None if size < 0 else self.reader.read(size + 2)[:-2].decode("utf-8")
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self.read() for _ in range(size)]
+        raise ConnectionError(f"Unexpected Redis reply {line!r}")
+
+    def pipeline(self, *commands):
+        # All commands in one round trip; raises the first error reply
+        self.send(*commands)
+        replies = [self.read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline(args)[0]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class RedisCacheStore:
+    def __init__(self, url, prefix=CACHE_KEY_PREFIX):
+        self.url = url
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+        self._local = threading.local()
+        self._subscriber = None
+
+    def _pipeline(self, *commands):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = RedisConnection(self.url)
+        try:
+            return conn.pipeline(*commands)
+        except OSError:
+            # Half-read replies would corrupt the next command: start over on a new connection
+            self._local.conn = None
+            conn.close()
+            raise
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        values = self._pipeline(("MGET", *map(self._key, keys)))[0]
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set(self, key, value, ttl, tag=None):
+        ttl_ms = max(1, int(ttl * 1000))
+        commands = [("SET", self._key(key), value, "PX", ttl_ms)]
+        if tag:
+            # tag -> set of its keys, kept as long as its newest entry
+            commands += [("SADD", self._key(f"tag:{tag}"), key), ("PEXPIRE", self._key(f"tag:{tag}"), ttl_ms)]
+        self._pipeline(*commands)
+
+    def add(self, key, value, ttl):
+        return self._pipeline(("SET", self._key(key), value, "PX", max(1, int(ttl * 1000)), "NX"))[0] == "OK"
+
+    def delete(self, key):
+        self._pipeline(("DEL", self._key(key)))
+
+    def invalidate(self, tags):
+        tag_keys = [self._key(f"tag:{tag}") for tag in tags]
+        members = self._pipeline(*(("SMEMBERS", tag_key) for tag_key in tag_keys)) if tag_keys else []
+        doomed = tag_keys + [self._key(key) for keys in members for key in keys or []]
+        for start in range(0, len(doomed), 1000):
+            self._pipeline(("DEL", *doomed[start:start + 1000]))
+
+    def publish(self, message):
+        self._pipeline(("PUBLISH", self.channel, message))
+
+    def listen(self, callback, stop):
+        # Subscribes on its own connection; reconnects until stop is set (see interrupt)
+        while not stop.is_set():
+            conn = None
+            try:
+                conn = self._subscriber = RedisConnection(self.url)
+                conn.send(("SUBSCRIBE", self.channel))
+                conn.read()
+                conn.sock.settimeout(None)  # waits for messages as long as it takes
+                while not stop.is_set():
+                    reply = conn.read()
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == "message":
+                        callback(reply[2])
+            except OSError as e:
+                if not stop.is_set():
+                    logger.warning("Cache invalidation subscription lost: %s", e)
+                    stop.wait(CACHE_RETRY_SECONDS)
+            finally:
+                self._subscriber = None
+                if conn is not None:
+                    conn.close()
+
+    def interrupt(self):
+        # Unblocks the subscriber's read so listen() can see stop
+        conn = self._subscriber
+        if conn is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _create_store():
+    if CACHE_BACKEND == "redis":
+        return RedisCacheStore(CACHE_REDIS_URL)
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCacheStore(CACHE_DB_PATH)
+    return None
+
+
+store = _create_store()
+_skip_store_until = 0.0
+
+
+def _shared(operation, call, default=None):
+    # Runs one L2 call; an unavailable L2 is a miss, not an error for the request
+    global _skip_store_until
+    if store is None or time.monotonic() < _skip_store_until:
+        return default
+    try:
+        return call()
+    except (OSError, sqlite3.Error, RedisError) as e:
+        shared_cache_errors.inc(operation=operation)
+        logger.warning("Shared cache %s failed, using the local cache only for %ss: %s", operation, CACHE_RETRY_SECONDS, e)
+        _skip_store_until = time.monotonic() + CACHE_RETRY_SECONDS
+        return default
+
+
+def _store_usable():
+    # False while there is no L2 or it is being skipped after a failure: nothing to do off the loop
+    return store is not None and time.monotonic() >= _skip_store_until
+
+# -------------------------------
+# L1 + L2
+# -------------------------------
+# name -> TieredCache, for invalidations sent by other workers
+_caches = {}
+
+
+class TieredCache:
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)  # key -> (tag, value)
+        self._flights = SingleFlight()
+        _caches[name] = self
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def _tag(self, tag):
+        return f"{self.name}:{tag}"
+
+    def _get_local(self, keys):
+        # ({key: value} found in L1, keys to look up in L2)
+        found, missing = {}, []
+        for key in keys:
+            entry = self.local.get(key)
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = entry[1]
+        return found, missing
+
+    def _get_shared(self, missing):
+        # {key: value} found in L2 for keys L1 didn't have; fills L1 with them
+        found = {}
+        shared = _shared("get", lambda: store.get_many([self._key(key) for key in missing]), default={})
+        for key in missing:
+            raw = shared.get(self._key(key))
+            if store is not None:
+                record_cache(f"{self.name}_shared", raw is not None)
+            if raw is not None:
+                tag, value = json.loads(raw)
+                self.local.set(key, (tag, value))
+                found[key] = value
+        return found
+
+    # The plain methods block on L2 (file or socket I/O): use them from worker threads (e.g.
+    # run_in_session) and the a-prefixed ones from async code, which run L2 calls in a thread.
+    def get_many(self, keys):
+        # {key: value} for the keys found in L1 or L2
+        found, missing = self._get_local(keys)
+        if missing:
+            found.update(self._get_shared(missing))
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key, value, tag=None):
+        self.local.set(key, (tag, value))
+        payload = json.dumps([tag, value], default=str)
+        _shared("set", lambda: store.set(self._key(key), payload, self.ttl, self._tag(tag) if tag else None))
+
+    def invalidate(self, tags):
+        # Drops every entry with one of `tags`, here, in L2 and in every other worker's L1
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        self._drop_local(tags)
+        _shared("invalidate", lambda: store.invalidate([self._tag(tag) for tag in tags]))
+        _shared("publish", lambda: store.publish(json.dumps([self.name, tags])))
+
+    async def aget_many(self, keys):
+        found, missing = self._get_local(keys)
+        if missing and _store_usable():
+            # An L1 hit never leaves the event loop; only L2 lookups go to a thread
+            found.update(await asyncio.to_thread(self._get_shared, missing))
+        return found
+
+    async def aget(self, key, default=None):
+        return (await self.aget_many([key])).get(key, default)
+
+    async def aset(self, key, value, tag=None):
+        if _store_usable():
+            await asyncio.to_thread(self.set, key, value, tag)
+        else:
+            self.set(key, value, tag)
+
+    async def ainvalidate(self, tags):
+        if _store_usable():
+            await asyncio.to_thread(self.invalidate, tags)
+        else:
+            self.invalidate(tags)
+
+    def _drop_local(self, tags):
+        tags = set(tags)
+        self.local.delete_where(lambda entry: entry[0] in tags)
+
+    def _take_lock(self, lock):
+        # True if taken, False if another worker holds it, None without a working L2
+        return _shared("lock", lambda: store.add(lock, uuid.uuid4().hex, CACHE_LOCK_TIMEOUT_SECONDS), default=None)
+
+    def _poll_lock(self, key, lock):
+        # One wait step in one thread hop: (value if it showed up in L2, lock state otherwise)
+        value = self.get(key)
+        return (value, None) if value is not None else (None, self._take_lock(lock))
+
+    async def fetch(self, key, fetch, tag=None, cacheable=lambda value: value is not None):
+        """
+        Runs fetch() (async) for a key the caller found missing and caches its result if
+        cacheable(result). Concurrent callers in this process share one call; in other workers
+        they wait up to CACHE_LOCK_TIMEOUT_SECONDS for it to show up in L2 instead of fetching too,
+        checking less often the longer they wait. L2 calls run in a worker thread.
+        """
+        async def load():
+            lock = self._key(f"lock:{key}")
+            deadline = time.monotonic() + CACHE_LOCK_TIMEOUT_SECONDS
+            # Without a working L2 there is no one to wait for
+            locked = await asyncio.to_thread(self._take_lock, lock) if _store_usable() else None
+            poll = LOCK_POLL_SECONDS
+            while locked is False and time.monotonic() < deadline:
+                await asyncio.sleep(poll)
+                poll = min(poll * 2, LOCK_POLL_MAX_SECONDS)
+                value, locked = await asyncio.to_thread(self._poll_lock, key, lock)
+                if value is not None:
+                    return value
+
+            try:
+                value = await fetch()
+                if cacheable(value):
+                    await self.aset(key, value, tag)
+                return value
+            finally:
+                if locked:
+                    await asyncio.to_thread(_shared, "unlock", lambda: store.delete(lock))
+
+        return await self._flights.do(key, load)
+
+
+# -------------------------------
+# Leases across workers
+# -------------------------------
+def _take_claim(name, ttl):
+    taken = _shared("claim", lambda: store.add(f"claim:{name}", uuid.uuid4().hex, ttl), default=None)
+    return taken is not False
+
+
+async def claim(name, ttl):
+    """
+    True if this worker now holds `name` for `ttl` seconds, False if another worker holds it.
+    Without a working L2 there is no one to share with and the claim always succeeds.
+    The lease is not released early: it also keeps later callers out until it expires.
+    """
+    if not _store_usable():
+        return True
+    return await asyncio.to_thread(_take_claim, name, ttl)
+
+
+def _apply_invalidation(message):
+    try:
+        name, tags = json.loads(message)
+    except ValueError:
+        return
+    cache = _caches.get(name)
+    if cache is not None:
+        cache._drop_local(tags)
+
+
+_listener_stop = threading.Event()
+
+
+def start_invalidation_listener():
+    # Called on app startup: applies other workers' invalidations to this process's L1
+    if store is None:
+        return None
+    _listener_stop.clear()
+    thread = threading.Thread(
+        target=store.listen, args=(_apply_invalidation, _listener_stop), name="cache-invalidations", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_invalidation_listener():
+    _listener_stop.set()
+    if store is not None:
+        store.interrupt()
@@ -0,0 +1,160 @@
+"""
+stats.py
+
+Per-location rollups (count, mean, min, max, percentiles) of temperature, humidity and wind_speed.
+
+- The weather_stats table holds one row per (location, month, column): count, sum, min, max and
+  the month's values, sorted (at most 31, one per day). It is kept up to date by the crud write
+  functions: every write recomputes the months it touched (at most ~31 weather rows each) in the
+  same transaction.
+- Queries only read weather_stats, never the weather table. Months are merged into years or
+  all-time rollups with NumPy; percentiles are exact (numpy.percentile over the merged values,
+  linear interpolation between the closest ones).
+"""
+
+import calendar
+from collections import defaultdict
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import app.models as models
+
+STAT_COLUMNS = ("temperature", "humidity", "wind_speed")
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+
+PERIODS = ("month", "year", "all")
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _month(value):
+    return _as_date(value).strftime("%Y-%m")
+
+
+def _month_bounds(month):
+    year, month_number = int(month[:4]), int(month[5:7])
+    return date(year, month_number, 1), date(year, month_number, calendar.monthrange(year, month_number)[1])
+
+
+# -------------------------------
+# Maintenance (called by crud before commit)
+# -------------------------------
+def refresh_weather_stats(db: Session, keys):
+    """
+    Recomputes weather_stats for the months touched by `keys`, an iterable of (location, date).
+
+    Every (location, month) pair in the cross product of the touched locations and months is
+    rebuilt from one range query, so the result is exact whatever the write did.
+    Does not commit; the caller commits together with its own changes.
+    """
+    months_by_location = defaultdict(set)
+    for location, day in keys:
+        months_by_location[location].add(_month(day))
+    if not months_by_location:
+        return
+
+    # Pending ORM changes (e.g. /weather/update) must be visible to the query below
+    db.flush()
+
+    locations = list(months_by_location)
+    months = sorted(set().union(*months_by_location.values()))
+    first_day, last_day = _month_bounds(months[0])[0], _month_bounds(months[-1])[1]
+
+    rows = db.query(
+        models.Weather.location, models.Weather.date,
+        models.Weather.temperature, models.Weather.humidity, models.Weather.wind_speed
+    ).filter(models.Weather.location.in_(locations))\
+        .filter(models.Weather.date.between(first_day, last_day))\
+        .all()
+
+    groups = defaultdict(list)
+    for location, day, *values in rows:
+        groups[(location, _month(day))].append(values)
+
+    db.query(models.WeatherStats)\
+        .filter(models.WeatherStats.location.in_(locations))\
+        .filter(models.WeatherStats.period.in_(months))\
+        .delete(synchronize_session=False)
+
+    for (location, month), values in groups.items():
+        if month not in months:
+            continue
+        # None -> NaN, one column per entry of STAT_COLUMNS
+        table = np.array(values, dtype=float)
+        for i, column in enumerate(STAT_COLUMNS):
+            column_values = table[:, i][~np.isnan(table[:, i])]
+            if not column_values.size:
+                continue
+            db.add(models.WeatherStats(
+                location=location,
+                period=month,
+                metric=column,
+                count=int(column_values.size),
+                total=float(column_values.sum()),
+                minimum=float(column_values.min()),
+                maximum=float(column_values.max()),
+                sorted_values=np.sort(column_values).tobytes(),
+            ))
+
+
+def rebuild_weather_stats(db: Session):
+    # Fills weather_stats from scratch, one location at a time (used by the migration)
+    locations = [location for (location,) in db.query(models.Weather.location).distinct()]
+    for location in locations:
+        days = db.query(models.Weather.date).filter(models.Weather.location == location).distinct()
+        refresh_weather_stats(db, [(location, day) for (day,) in days])
+        db.commit()
+
+
+# -------------------------------
+# Queries
+# -------------------------------
+def _period_key(month, period):
+    if period == "month":
+        return month
+    if period == "year":
+        return month[:4]
+    return "all"
+
+
+def get_weather_stats(db: Session, location: str = None, start_date: date = None, end_date: date = None,
+                      period: str = "month", percentiles=DEFAULT_PERCENTILES):
+    """
+    Returns [{"location", "period", "temperature": {...}, "humidity": {...}, "wind_speed": {...}}].
+
+    Each column holds count, mean, min, max and p<N> for every requested percentile.
+    start_date/end_date select whole months (the months containing them).
+    """
+    query = db.query(models.WeatherStats)
+    if location:
+        query = query.filter(models.WeatherStats.location == location)
+    if start_date:
+        query = query.filter(models.WeatherStats.period >= _month(start_date))
+    if end_date:
+        query = query.filter(models.WeatherStats.period <= _month(end_date))
+
+    groups = defaultdict(list)
+    for row in query:
+        groups[(row.location, _period_key(row.period, period), row.metric)].append(row)
+
+    results = {}
+    for (location_name, period_key, column), rows in groups.items():
+        values = np.concatenate([np.frombuffer(row.sorted_values, dtype=np.float64) for row in rows])
+        results.setdefault((location_name, period_key), {})[column] = {
+            "count": int(values.size),
+            "mean": round(float(sum(row.total for row in rows) / values.size), 2),
+            "min": min(row.minimum for row in rows),
+            "max": max(row.maximum for row in rows),
+            **{f"p{p:g}": round(float(value), 2) for p, value in zip(percentiles, np.percentile(values, percentiles))},
+        }
+
+    return [
+        {"location": location_name, "period": period_key,
+         **{column: columns[column] for column in STAT_COLUMNS if column in columns}}
+        for (location_name, period_key), columns in sorted(results.items())
+    ]
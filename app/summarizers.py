@@ -0,0 +1,198 @@
+"""
+summarizers.py
+
+Summary backends for the weather page and the policy that picks between them.
+
+- LLMSummarizer: Groq LLM (app/crud.py), cached in summary_cache.
+- LocalSummarizer: deterministic rule-based text from temperature, humidity, wind and description
+  thresholds. No I/O, so it answers in microseconds.
+- SummaryPolicy: chooses the backend per request (SUMMARY_BACKEND):
+    - "auto" (default): LLM within the SUMMARY_TIMEOUT_SECONDS latency budget; any day that times out
+      or fails gets a local summary instead. After SUMMARY_BREAKER_FAILURES failed calls in a row the
+      circuit opens and every day goes local until SUMMARY_BREAKER_RESET_SECONDS have passed,
+      then one trial call decides whether the LLM is back.
+      While the circuit is open or the LLM rate limit is nearly used up (limits.py), days with a
+      cached LLM summary keep it and only the rest get local summaries.
+    - "llm": LLM only; failed days show crud.FALLBACK_SUMMARY.
+    - "local": rule-based only.
+"""
+
+import os
+import time
+from threading import Lock
+
+from app.crud import agenerate_summaries_llm, get_cached_summary_list, FALLBACK_SUMMARY
+from app.database import run_in_session
+from app.limits import upstream_limiter
+
+SUMMARY_BACKEND = os.environ.get("SUMMARY_BACKEND", "auto")
+SUMMARY_BREAKER_FAILURES = int(os.environ.get("SUMMARY_BREAKER_FAILURES", "5"))
+SUMMARY_BREAKER_RESET_SECONDS = float(os.environ.get("SUMMARY_BREAKER_RESET_SECONDS", "60"))
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+class LLMSummarizer:
+    name = "llm"
+
+    async def summarize_many(self, days, breaker=None):
+        return await agenerate_summaries_llm(days, breaker=breaker)
+
+
+class LocalSummarizer:
+    name = "local"
+
+    async def summarize_many(self, days):
+        return [self.summarize(day) for day in days]
+
+    def summarize(self, day):
+        temp = day["temperature"]
+        humidity = day["humidity"]
+        wind = day["wind_speed"]
+        description = (day["description"] or "").strip()
+        condition = description.lower()
+
+        rainy = any(word in condition for word in ("rain", "drizzle", "shower"))
+        snowy = any(word in condition for word in ("snow", "sleet", "ice", "blizzard"))
+        stormy = "thunder" in condition
+        foggy = any(word in condition for word in ("fog", "mist"))
+        sunny = any(word in condition for word in ("sunny", "clear"))
+
+        if temp < 0:
+            feel, clothes = "freezing", ["a heavy winter coat", "hat", "gloves", "a scarf"]
+        elif temp < 10:
+            feel, clothes = "cold", ["a warm jacket", "long sleeves", "closed shoes"]
+        elif temp < 18:
+            feel, clothes = "cool", ["a light jacket or sweater", "long pants"]
+        elif temp < 25:
+            feel, clothes = "pleasant", ["light layers", "comfortable shoes"]
+        elif temp < 32:
+            feel, clothes = "warm", ["breathable, light-colored clothing", "a hat"]
+        else:
+            feel, clothes = "hot", ["loose, lightweight clothing", "a wide-brimmed hat"]
+
+        if wind >= 50:
+            wind_text = "strong winds"
+        elif wind >= 25:
+            wind_text = "breezy conditions"
+        else:
+            wind_text = "light winds"
+
+        if humidity >= 80:
+            humidity_text = "humid air"
+        elif humidity <= 30:
+            humidity_text = "dry air"
+        else:
+            humidity_text = "moderate humidity"
+
+        precautions = []
+        if rainy:
+            clothes.append("a waterproof jacket or umbrella")
+            precautions.append("Carry an umbrella and allow extra travel time on wet roads.")
+        if snowy:
+            clothes.append("insulated, waterproof boots")
+            precautions.append("Watch for slippery sidewalks and roads.")
+        if stormy:
+            precautions.append("Thunderstorms are possible, so stay indoors during lightning.")
+        if foggy:
+            precautions.append("Visibility may be low, so drive carefully.")
+        if sunny and temp >= 18:
+            clothes.append("sunglasses")
+            precautions.append("Wear sunscreen.")
+        if temp >= 30 or (temp >= 25 and humidity >= 70):
+            precautions.append("Stay hydrated and take breaks from the heat.")
+        if temp <= 0:
+            precautions.append("Limit time outdoors and cover exposed skin.")
+        if wind >= 50:
+            precautions.append("Secure loose outdoor items and take care near trees.")
+        if not precautions:
+            precautions.append("No special precautions needed, enjoy your day.")
+
+        return {
+            "summary": (
+                f"The forecast for {day['location']} on {day['date']} is {condition or 'mixed conditions'}, "
+                f"with {feel} temperatures around {temp}°C, {humidity_text} ({humidity}%) "
+                f"and {wind_text} ({wind} km/h)."
+            ),
+            "clothes": ", ".join(clothes).capitalize() + ".",
+            "precautions": " ".join(precautions),
+        }
+
+
+# -------------------------------
+# Circuit breaker
+# -------------------------------
+class CircuitBreaker:
+    def __init__(self, failure_threshold=SUMMARY_BREAKER_FAILURES, reset_seconds=SUMMARY_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = Lock()
+
+    def allow(self):
+        # Closed: always. Open: only once reset_seconds have passed (one trial call, "half-open").
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Push the window forward so concurrent requests don't all become trial calls
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+# -------------------------------
+# Policy
+# -------------------------------
+class SummaryPolicy:
+    def __init__(self, backend=SUMMARY_BACKEND, remote=None, local=None, breaker=None):
+        self.backend = backend
+        self.remote = remote or LLMSummarizer()
+        self.local = local or LocalSummarizer()
+        self.breaker = breaker or CircuitBreaker()
+
+    async def summarize(self, days):
+        if not days:
+            return []
+        if self.backend == "local":
+            return await self.local.summarize_many(days)
+        if self.backend == "llm":
+            return await self.remote.summarize_many(days)
+
+        # auto
+        if await upstream_limiter.near_quota("llm") or not self.breaker.allow():
+            return await self._cached_or_local(days)
+
+        # The breaker counts the LLM calls made for this request, not the cached days
+        summaries = await self.remote.summarize_many(days, breaker=self.breaker)
+
+        # Per-day fallback: only the days the LLM couldn't do get local summaries
+        return [
+            self.local.summarize(day) if summary is FALLBACK_SUMMARY else summary
+            for summary, day in zip(summaries, days)
+        ]
+
+    async def _cached_or_local(self, days):
+        # No new LLM calls: reuse cached LLM summaries, rule-based text for the rest
+        cached = await run_in_session(get_cached_summary_list, days)
+        return [summary or self.local.summarize(day) for summary, day in zip(cached, days)]
+
+
+summary_policy = SummaryPolicy()
@@ -0,0 +1,45 @@
+"""
+timing.py
+
+Per-request stage timing, reported to the browser through the Server-Timing header.
+
+Each stage records the wall-clock span from its first start to its last end, so stages that run
+concurrently (e.g. YouTube and the forecast fetch) can be compared with the total request time.
+Every individual stage run is also observed in the stage_duration_seconds histogram (see metrics.py).
+"""
+
+import time
+from contextlib import contextmanager
+
+from app.metrics import stage_duration
+
+
+class StageTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}  # stage name -> [first start, last end]
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stage_duration.observe(end - start, stage=name)
+            span = self.spans.setdefault(name, [start, end])
+            span[0] = min(span[0], start)
+            span[1] = max(span[1], end)
+
+    async def track(self, name, awaitable):
+        # Await `awaitable` and record it under `name`
+        with self.stage(name):
+            return await awaitable
+
+    def durations_ms(self):
+        durations = {name: (end - start) * 1000 for name, (start, end) in self.spans.items()}
+        durations["total"] = (time.perf_counter() - self.started) * 1000
+        return durations
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.durations_ms().items())
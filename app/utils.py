@@ -1,9 +1,21 @@
-from langchain_core.prompts import PromptTemplate
+"""
+Prompt templates for the summary LLM.
+
+The template text lives in plain strings; the langchain PromptTemplate objects are built on first
+use (importing langchain_core takes a noticeable part of a second), so importing this module is cheap.
+Use get_weather_prompt_template() / get_weather_batch_prompt_template(), or the
+weather_prompt_template / weather_batch_prompt_template attributes which call them.
+
+Prompt variants (SUMMARY_PROMPT in crud.py):
+- "full":    the original instructions, including an inline JSON example.
+- "compact": the same data and rules in under half the tokens. With function calling the
+             output format is left to the tool schema that with_structured_output sends anyway;
+             with json_mode (no schema is sent) one line naming the keys is added.
+"""
 
-weather_prompt_template = PromptTemplate(
-    input_variables=["location", "date", "temp", "humidity", "wind_speed", "description"],
-    validate_template = True,
-    template="""
+from functools import lru_cache
+
+WEATHER_PROMPT = """
 You are a helpful assistant that converts raw weather data into a clear, concise, and friendly daily weather summary for a user.
 
 Input Data:
@@ -30,4 +42,97 @@ Instructions:
 6. Make it human-friendly and easy to read, but avoid greetings like "Hey there".
 7. Friendly, casual tone.
 """
-)
\ No newline at end of file
+
+# Multi-day variant: one call returns summaries for every requested day
+WEATHER_BATCH_PROMPT = """
+You are a helpful assistant that converts raw weather data into clear, concise, and friendly daily weather summaries for a user.
+
+Input Data ({count} days):
+{days}
+
+Instructions:
+1. For EACH day, in the same order as the input, write a short human-readable paragraph summarizing the weather. Mention key aspects: temperature, wind, humidity, and description.
+2. For each day, suggest clothing appropriate for the weather.
+3. For each day, suggest any precautions or things the user should keep in mind.
+4. Output ONLY in JSON format, with a key "days" holding a list of exactly {count} objects with keys: "summary", "clothes", "precautions".
+    Example:
+    {{
+        "days": [
+            {{
+                "summary": "on mentioned date in San Ramon, expect a sunny day...",
+                "clothes": "Light clothing, sunglasses, hat....",
+                "precautions": "Wear sunscreen and stay hydrated...."
+            }}
+        ]
+    }}
+5. Do NOT use the location as if it were a person’s name. Mention it neutrally in the summary.
+6. Make it human-friendly and easy to read, but avoid greetings like "Hey there".
+7. Friendly, casual tone.
+"""
+
+
+# Compact variants: no role preamble, no numbered instructions, no JSON example
+WEATHER_PROMPT_COMPACT = """Weather in {location} on {date}: {temp}°C, humidity {humidity}%, wind {wind_speed} km/h, {description}.
+Write for a user in a friendly, casual tone, no greetings. Mention the location neutrally, never as a person's name.
+summary: 2-3 sentences on temperature, wind, humidity and conditions. clothes: one sentence. precautions: one sentence."""
+
+WEATHER_BATCH_PROMPT_COMPACT = """Weather for {count} days:
+{days}
+For each day, in input order, write for a user in a friendly, casual tone, no greetings. Mention the location neutrally, never as a person's name.
+summary: 2-3 sentences on temperature, wind, humidity and conditions. clothes: one sentence. precautions: one sentence."""
+
+# Only needed when no schema is sent (json_mode); Groq also requires the word JSON in the prompt
+JSON_KEYS_INSTRUCTION = """
+Reply with only a JSON object with string keys "summary", "clothes", "precautions"."""
+
+JSON_BATCH_KEYS_INSTRUCTION = """
+Reply with only a JSON object {{"days": [...]}} holding exactly {count} objects with string keys "summary", "clothes", "precautions"."""
+
+PROMPT_VARIANTS = {
+    "full": (WEATHER_PROMPT, WEATHER_BATCH_PROMPT),
+    "compact": (WEATHER_PROMPT_COMPACT, WEATHER_BATCH_PROMPT_COMPACT),
+}
+
+
+def _template_text(variant, output_mode, batch):
+    if variant not in PROMPT_VARIANTS:
+        raise ValueError(f"Unknown prompt variant {variant!r}, expected one of {', '.join(PROMPT_VARIANTS)}")
+    text = PROMPT_VARIANTS[variant][batch]
+    # The full prompt already spells out the JSON format
+    if variant != "full" and output_mode == "json_mode":
+        text += JSON_BATCH_KEYS_INSTRUCTION if batch else JSON_KEYS_INSTRUCTION
+    return text
+
+
+@lru_cache(maxsize=None)
+def get_weather_prompt_template(variant="full", output_mode="function_calling"):
+    from langchain_core.prompts import PromptTemplate
+
+    return PromptTemplate(
+        input_variables=["location", "date", "temp", "humidity", "wind_speed", "description"],
+        validate_template = True,
+        template=_template_text(variant, output_mode, batch=False)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_weather_batch_prompt_template(variant="full", output_mode="function_calling"):
+    from langchain_core.prompts import PromptTemplate
+
+    return PromptTemplate(
+        input_variables=["days", "count"],
+        validate_template = True,
+        template=_template_text(variant, output_mode, batch=True)
+    )
+
+
+_LAZY_TEMPLATES = {
+    "weather_prompt_template": get_weather_prompt_template,
+    "weather_batch_prompt_template": get_weather_batch_prompt_template,
+}
+
+def __getattr__(name):
+    # Keeps `app.utils.weather_prompt_template` working without building it at import time
+    if name in _LAZY_TEMPLATES:
+        return _LAZY_TEMPLATES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,112 @@
+"""
+videos.py
+
+YouTube videos for the weather page, searched once per canonical location (locations.py) instead
+of on every request: search.list costs 100 quota units a call.
+
+- Results are stored per location in the location_videos table and kept in the shared cache
+  (shared_cache.py), so a repeat search is answered from memory.
+- They are searched again after YOUTUBE_CACHE_TTL_SECONDS; until the new results are in, the old
+  ones are still shown.
+- A miss never holds up the page: get_videos returns no videos right away and the search runs in
+  the background. A streamed page fills its videos slot once the search is done (wait_for_videos,
+  at most YOUTUBE_STREAM_WAIT_SECONDS); a slower search is still stored for the next request.
+- Concurrent misses for the same location share one search, across workers too.
+- A failed search (quota exceeded, API error) is neither cached nor stored: the page shows the old
+  videos, or none, and a later request searches again.
+- Without YOUTUBE_API_KEY nothing is called and the page shows no videos.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+import httpx
+
+from app.clients import fetch_youtube_videos
+from app.crud import get_location_videos, save_location_videos
+from app.database import run_in_session
+from app.limits import UpstreamRateLimited
+from app.locations import ResolvedLocation
+from app.metrics import record_cache
+from app.shared_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+# Videos about a place hardly change; a week keeps a popular location at one search a week
+YOUTUBE_CACHE_TTL_SECONDS = float(os.environ.get("YOUTUBE_CACHE_TTL_SECONDS", str(7 * 86400)))
+YOUTUBE_CACHE_SIZE = int(os.environ.get("YOUTUBE_CACHE_SIZE", "2048"))
+YOUTUBE_STREAM_WAIT_SECONDS = float(os.environ.get("YOUTUBE_STREAM_WAIT_SECONDS", "5"))
+
+# str(location id) -> {"videos": [...], "fetched_at": unix time}
+video_cache = TieredCache("youtube", maxsize=YOUTUBE_CACHE_SIZE, ttl=YOUTUBE_CACHE_TTL_SECONDS)
+
+# location id -> search running in the background (also keeps the task referenced)
+_searches = {}
+
+
+def _read_stored(db, location_id: int):
+    row = get_location_videos(db, location_id)
+    return None if row is None else {"videos": row.videos, "fetched_at": row.fetched_at.timestamp()}
+
+
+async def _load(location_id: int):
+    # Stored videos of a location, or None if it was never searched
+    entry = await run_in_session(_read_stored, location_id)
+    if entry is not None:
+        await video_cache.aset(str(location_id), entry)
+    return entry
+
+
+def _search_in_background(client: httpx.AsyncClient, api_key: str, place: ResolvedLocation):
+    async def search():
+        # Raises on failure, so nothing is cached or stored and the next request tries again
+        videos = await fetch_youtube_videos(client, api_key, place.name)
+        fetched_at = datetime.now()
+        await run_in_session(save_location_videos, place.id, videos, fetched_at)
+        return {"videos": videos, "fetched_at": fetched_at.timestamp()}
+
+    def done(task):
+        _searches.pop(place.id, None)
+        # Out of quota is expected under load: the next request for the place tries again
+        if not task.cancelled() and not isinstance(task.exception(), (type(None), UpstreamRateLimited)):
+            logger.warning("YouTube search for %s failed: %r", place.name, task.exception())
+
+    task = _searches.get(place.id)
+    if task is None:
+        task = asyncio.ensure_future(video_cache.fetch(str(place.id), search))
+        task.add_done_callback(done)
+        _searches[place.id] = task
+    return task
+
+
+async def get_videos(client: httpx.AsyncClient, api_key: str, place: ResolvedLocation):
+    # Never raises or waits for a search: the videos are an extra on the weather page
+    if not api_key:
+        return []
+
+    entry = await video_cache.aget(str(place.id)) or await _load(place.id)
+    fresh = entry is not None and time.time() - entry["fetched_at"] < YOUTUBE_CACHE_TTL_SECONDS
+    record_cache("youtube", fresh)
+    if fresh:
+        return entry["videos"]
+
+    _search_in_background(client, api_key, place)
+    return [] if entry is None else entry["videos"]
+
+
+async def wait_for_videos(place: ResolvedLocation, wait: float = YOUTUBE_STREAM_WAIT_SECONDS):
+    """Videos of the search running for `place`, once it is done; [] if there is none or it fails."""
+    task = _searches.get(place.id)
+    if task is None:
+        # Already over: a successful search left its videos in the cache
+        entry = await video_cache.aget(str(place.id))
+        return [] if entry is None else entry["videos"]
+    try:
+        # shield: the page giving up on the search doesn't cancel it
+        entry = await asyncio.wait_for(asyncio.shield(task), wait)
+    except Exception:
+        return []
+    return entry["videos"]
@@ -0,0 +1,70 @@
+"""
+compare.py
+
+Compares two result files from load_test.py or micro.py and flags regressions.
+
+Rows are matched by (scenario or benchmark, seed_rows). A latency metric that grew, or a
+throughput metric that dropped, by more than --threshold percent is a regression; the script
+exits with status 1 if there is any.
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json [--threshold 10]
+"""
+
+import argparse
+import json
+import sys
+
+# metric -> True when higher is better
+METRICS = {
+    "throughput_rps": True,
+    "rows_per_second": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "median_ms": False,
+}
+
+
+def load_results(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {
+        (row.get("scenario") or row.get("benchmark"), row.get("seed_rows")): row
+        for row in report["results"]
+    }
+
+
+def compare(baseline, candidate, threshold):
+    # Returns (lines to print, number of regressions)
+    lines = []
+    regressions = 0
+    for key in sorted(set(baseline) & set(candidate), key=str):
+        for metric, higher_is_better in METRICS.items():
+            if metric not in baseline[key] or metric not in candidate[key]:
+                continue
+            old, new = baseline[key][metric], candidate[key][metric]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ""
+            regressions += bool(flag)
+            lines.append(f"{key[0]:<20} {key[1]!s:>8} {metric:<16} {old:>12.2f} -> {new:>12.2f}  {change:+7.1f}%  {flag}")
+
+    for key in sorted(set(baseline) ^ set(candidate), key=str):
+        lines.append(f"{key[0]:<20} {key[1]!s:>8} only in {'baseline' if key in baseline else 'candidate'}")
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args()
+
+    lines, regressions = compare(load_results(args.baseline), load_results(args.candidate), args.threshold)
+    print("\n".join(lines))
+    print(f"{regressions} regression(s) over {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
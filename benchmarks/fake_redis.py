@@ -0,0 +1,165 @@
+"""
+fake_redis.py
+
+Local stand-in for a Redis server, for benchmarks and offline runs of CACHE_BACKEND=redis.
+Speaks RESP2 and implements what app/shared_cache.py uses: PING, SELECT, AUTH, GET, MGET,
+SET (EX/PX/NX), DEL, SADD, SMEMBERS, PEXPIRE, PUBLISH, SUBSCRIBE, plus DBSIZE and FLUSHALL.
+One in-memory keyspace, expiry checked on access.
+
+Point the app at it with:
+
+    CACHE_BACKEND=redis
+    CACHE_REDIS_URL=redis://127.0.0.1:6399/0
+
+Usage:
+    python benchmarks/fake_redis.py [--port 6399]
+"""
+
+import argparse
+import asyncio
+import time
+
+
+class Store:
+    def __init__(self):
+        self.data = {}      # key -> str or set
+        self.expires = {}   # key -> monotonic deadline
+        self.channels = {}  # channel -> set of subscriber writers
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def expire(self, key, ms):
+        if self._alive(key):
+            self.expires[key] = time.monotonic() + ms / 1000
+            return 1
+        return 0
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    if isinstance(value, bool):
+        return b"+OK\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, (list, set)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    data = value.encode() if isinstance(value, str) else value
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+async def read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.decode().split()  # inline command, e.g. from telnet
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2].decode())
+    return args
+
+
+def run_command(store, args, writer):
+    name, *rest = args
+    name = name.upper()
+    if name == "PING":
+        return b"+PONG\r\n"
+    if name in ("SELECT", "AUTH"):
+        return b"+OK\r\n"
+    if name == "GET":
+        return encode(store.get(rest[0]))
+    if name == "MGET":
+        return encode([store.get(key) for key in rest])
+    if name == "SET":
+        key, value, *options = rest
+        options = [option.upper() for option in options]
+        if "NX" in options and store._alive(key):
+            return encode(None)
+        store.data[key] = value
+        store.expires.pop(key, None)
+        for unit, scale in (("PX", 1), ("EX", 1000)):
+            if unit in options:
+                store.expire(key, int(options[options.index(unit) + 1]) * scale)
+        return encode(True)
+    if name == "DEL":
+        deleted = 0
+        for key in rest:
+            deleted += store._alive(key)
+            store.data.pop(key, None)
+            store.expires.pop(key, None)
+        return encode(deleted)
+    if name == "SADD":
+        key, *members = rest
+        if not store._alive(key):
+            store.data[key] = set()
+        before = len(store.data[key])
+        store.data[key].update(members)
+        return encode(len(store.data[key]) - before)
+    if name == "SMEMBERS":
+        return encode(sorted(store.get(rest[0]) or ()))
+    if name == "PEXPIRE":
+        return encode(store.expire(rest[0], int(rest[1])))
+    if name == "PUBLISH":
+        channel, message = rest
+        subscribers = list(store.channels.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.write(encode(["message", channel, message]))
+        return encode(len(subscribers))
+    if name == "SUBSCRIBE":
+        for count, channel in enumerate(rest, start=1):
+            store.channels.setdefault(channel, set()).add(writer)
+            writer.write(encode(["subscribe", channel, count]))
+        return b""
+    if name == "DBSIZE":
+        return encode(sum(store._alive(key) for key in list(store.data)))
+    if name in ("FLUSHALL", "FLUSHDB"):
+        store.data.clear()
+        store.expires.clear()
+        return encode(True)
+    return encode(ValueError(f"unknown command '{name}'"))
+
+
+def create_server(store, host, port):
+    async def handle(reader, writer):
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if args:
+                    writer.write(run_command(store, args, writer))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in store.channels.values():
+                subscribers.discard(writer)
+            writer.close()
+
+    return asyncio.start_server(handle, host, port)
+
+
+async def main(host, port):
+    server = await create_server(Store(), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
@@ -0,0 +1,259 @@
+"""
+fake_upstreams.py
+
+Local stand-ins for every service the app calls, for benchmarks and offline runs:
+
+- weatherapi.com   /weatherapi/forecast.json, /weatherapi/search.json
+- YouTube Data API /youtube/search
+- Groq (OpenAI-compatible chat completions) /groq/openai/v1/chat/completions
+  Answers tool calls (what with_structured_output sends) and JSON mode requests with filler values
+  matching the schema, and reports prompt/completion token usage. Prompt tokens include the tool
+  schema, output is cut off at max_tokens (finish_reason "length", like the real API), and latency
+  can grow per prompt and completion token (--llm-ms-per-prompt-token, --llm-ms-per-completion-token).
+
+Each service has its own latency (mean + jitter) and error rate (fraction of requests answered 500).
+Point the app at it with:
+
+    WEATHER_API_BASE_URL=http://127.0.0.1:9100/weatherapi
+    YOUTUBE_API_BASE_URL=http://127.0.0.1:9100/youtube
+    GROQ_BASE_URL=http://127.0.0.1:9100/groq
+
+Usage:
+    python benchmarks/fake_upstreams.py [--port 9100] [--weather-latency-ms 80] [--llm-latency-ms 400]
+                                        [--error-rate 0.0] [--llm-error-rate 0.0] ...
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from datetime import date, timedelta
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Locations starting with this are "unknown" to the fake weather API
+UNKNOWN_PREFIX = "nowhere"
+
+CONDITIONS = ["Sunny", "Partly cloudy", "Cloudy", "Light rain", "Heavy rain", "Mist", "Patchy snow"]
+
+
+class ServiceProfile:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    async def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def should_fail(self):
+        return random.random() < self.error_rate
+
+
+def _seed(text):
+    # Same location -> same fake weather
+    return int(hashlib.md5(text.lower().encode("utf-8")).hexdigest()[:8], 16)
+
+
+def fake_coordinates(place):
+    seed = _seed(place)
+    return {"lat": round(seed % 18000 / 100 - 90, 2), "lon": round(seed // 18000 % 36000 / 100 - 180, 2)}
+
+
+def fake_forecast_days(location, days):
+    rng = random.Random(_seed(location))
+    base_temp = rng.uniform(-5, 30)
+    today = date.today()
+    return [
+        {
+            "date": str(today + timedelta(days=i)),
+            "day": {
+                "avgtemp_c": round(base_temp + rng.uniform(-4, 4), 1),
+                "avghumidity": rng.randint(20, 95),
+                "maxwind_kph": round(rng.uniform(0, 45), 1),
+                "condition": {"text": rng.choice(CONDITIONS)},
+            },
+        }
+        for i in range(days)
+    ]
+
+
+# Strings about as long as the model writes for each summary field
+FILLER = {
+    "summary": "Expect a mild, partly cloudy day with temperatures around 18°C and a gentle breeze of about "
+               "12 km/h. Humidity sits near 60%, so it should feel comfortable from morning to evening, "
+               "with a small chance of a passing shower later on.",
+    "clothes": "Light layers work best: a t-shirt with a light jacket or sweater, and comfortable shoes.",
+    "precautions": "Keep a compact umbrella handy and drink water if you plan to be outside for long.",
+}
+
+# What the app expects back in JSON mode, where the request carries no schema
+SUMMARY_SCHEMA = {"type": "object", "properties": {key: {"type": "string"} for key in FILLER}}
+BATCH_SCHEMA = {"type": "object", "properties": {"days": {"type": "array", "items": SUMMARY_SCHEMA}}}
+
+
+def _fake_value(schema, items, name=None):
+    # Filler JSON matching a (simple) JSON schema; arrays get `items` entries
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: _fake_value(prop, items, key) for key, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), items) for _ in range(items)]
+    if kind in ("number", "integer"):
+        return 0
+    if kind == "boolean":
+        return False
+    return FILLER.get(name, "Mild and pleasant with a light breeze; a light jacket is enough.")
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def create_app(weather: ServiceProfile, youtube: ServiceProfile, llm: ServiceProfile,
+               llm_ms_per_prompt_token=0.0, llm_ms_per_completion_token=0.0):
+    stats = {"weatherapi": 0, "youtube": 0, "llm": 0}
+
+    async def guarded(profile, service):
+        stats[service] += 1
+        await profile.delay()
+        if profile.should_fail():
+            return JSONResponse({"error": {"message": f"fake {service} failure"}}, status_code=500)
+        return None
+
+    async def forecast(request):
+        error = await guarded(weather, "weatherapi")
+        if error:
+            return error
+        location = request.query_params.get("q", "")
+        days = int(request.query_params.get("days", "5"))
+        if location.lower().startswith(UNKNOWN_PREFIX):
+            return JSONResponse({"error": {"code": 1006, "message": "No matching location found."}}, status_code=400)
+        return JSONResponse({"location": {"name": location}, "forecast": {"forecastday": fake_forecast_days(location, days)}})
+
+    async def search(request):
+        error = await guarded(weather, "weatherapi")
+        if error:
+            return error
+        q = request.query_params.get("q", "").strip()
+        if not q or q.lower().startswith(UNKNOWN_PREFIX):
+            return JSONResponse([])
+        # "City, Region" searches keep their region on the best match
+        name, _, region = q.partition(",")
+        name, region = name.strip().title(), region.strip() or "North"
+        return JSONResponse([
+            {"name": f"{name}{suffix}", "region": place_region, "country": "Fakeland",
+             **fake_coordinates(f"{name}{suffix}, {place_region}")}
+            for suffix, place_region in (("", region), ("ville", "South"), (" City", "East"), ("ton", "West"))
+        ])
+
+    async def youtube_search(request):
+        error = await guarded(youtube, "youtube")
+        if error:
+            return error
+        max_results = int(request.query_params.get("maxResults", "4"))
+        q = request.query_params.get("q", "")
+        return JSONResponse({"items": [
+            {
+                "id": {"videoId": f"fake{i}"},
+                "snippet": {"title": f"{q} travel video {i}", "thumbnails": {"medium": {"url": f"https://example.com/{i}.jpg"}}},
+            }
+            for i in range(max_results)
+        ]})
+
+    async def chat_completions(request):
+        error = await guarded(llm, "llm")
+        if error:
+            return error
+        body = await request.json()
+        prompt = "\n".join(str(message.get("content") or "") for message in body.get("messages", []))
+        # Batched prompts list one numbered line per day
+        days = len(re.findall(r"^\d+\. Location:", prompt, flags=re.MULTILINE))
+        items = days or 1
+
+        message = {"role": "assistant", "content": None}
+        tools = body.get("tools") or []
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        if tools:
+            function = tools[0]["function"]
+            completion_text = json.dumps(_fake_value(function.get("parameters", {}), items))
+            finish_reason = "tool_calls"
+        elif json_mode:
+            completion_text = json.dumps(_fake_value(BATCH_SCHEMA if days else SUMMARY_SCHEMA, items))
+            finish_reason = "stop"
+        else:
+            completion_text = json.dumps({"summary": _fake_value({}, items)})
+            finish_reason = "stop"
+
+        # The tool schema is part of the prompt the model reads
+        prompt_tokens = _estimate_tokens(prompt + (json.dumps(tools) if tools else ""))
+        completion_tokens = _estimate_tokens(completion_text)
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        if max_tokens and completion_tokens > max_tokens:
+            completion_text, completion_tokens, finish_reason = completion_text[:max_tokens * 4], max_tokens, "length"
+
+        if tools:
+            message["tool_calls"] = [{"id": "call_fake", "type": "function", "function": {"name": function["name"], "arguments": completion_text}}]
+        else:
+            message["content"] = completion_text
+        token_ms = prompt_tokens * llm_ms_per_prompt_token + completion_tokens * llm_ms_per_completion_token
+        if token_ms > 0:
+            await asyncio.sleep(token_ms / 1000)
+        return JSONResponse({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    async def request_counts(request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/weatherapi/forecast.json", forecast),
+        Route("/weatherapi/search.json", search),
+        Route("/youtube/search", youtube_search),
+        Route("/groq/openai/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/stats", request_counts),
+    ])
+
+
+def add_arguments(parser):
+    parser.add_argument("--weather-latency-ms", type=float, default=80)
+    parser.add_argument("--youtube-latency-ms", type=float, default=120)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--jitter", type=float, default=0.25, help="latency jitter as a fraction of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="weatherapi and YouTube error rate")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-ms-per-prompt-token", type=float, default=0.0, help="added to --llm-latency-ms")
+    parser.add_argument("--llm-ms-per-completion-token", type=float, default=0.0, help="added to --llm-latency-ms")
+
+
+def profiles_from_args(args):
+    def profile(latency, error_rate):
+        return ServiceProfile(latency, latency * args.jitter, error_rate)
+    return (
+        profile(args.weather_latency_ms, args.error_rate),
+        profile(args.youtube_latency_ms, args.error_rate),
+        profile(args.llm_latency_ms, args.llm_error_rate),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    app = create_app(*profiles_from_args(args), args.llm_ms_per_prompt_token, args.llm_ms_per_completion_token)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,76 @@
+"""
+import_time.py
+
+Cold-start budget check for `import app.main` (what every uvicorn worker and test run pays).
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters, takes the fastest run,
+and exits with status 1 when:
+- the cumulative import time of app.main is over the budget, or
+- a module that must stay lazy (LLM client, pyarrow, pandas) was imported.
+
+Usage (from the repo root):
+    python benchmarks/import_time.py [--budget-ms 1500] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Only needed on first LLM call / columnar export, never at import
+LAZY_MODULES = ["langchain_core", "langchain_groq", "groq", "pyarrow", "pandas"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure_once():
+    # No GROQ key on purpose: importing the app must not need one
+    env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    code = "import app.main, sys, json; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    cumulative_us = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative_us[match.group(4)] = int(match.group(2))
+    modules = json.loads(proc.stdout.strip().splitlines()[-1])
+    return cumulative_us, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to print")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    cumulative_us, modules = min(runs, key=lambda run: run[0]["app.main"])
+    total_ms = cumulative_us["app.main"] / 1000
+
+    print(f"import app.main: {total_ms:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    for name, us in sorted(cumulative_us.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time over budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    eager = [m for m in LAZY_MODULES if m in modules]
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
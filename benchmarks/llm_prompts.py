@@ -0,0 +1,190 @@
+"""
+llm_prompts.py
+
+Compares the summary prompt variants (SUMMARY_PROMPT) and structured output modes
+(SUMMARY_OUTPUT_MODE) on prompt tokens, completion tokens, latency and the share of replies that
+are a valid {summary, clothes, precautions}, to pick the cheapest setting that still works.
+
+Every variant is called --repeat times for one day and --repeat times for a batch of --days days,
+through the app's own templates, ChatGroq models (with the variant's SUMMARY_MAX_TOKENS cap) and
+response checks, so a reply cut off by the cap counts as invalid.
+
+By default the calls go to the fake LLM of fake_upstreams.py, started on a free port, whose latency
+grows with prompt and completion tokens. Its replies don't depend on the prompt wording, so there
+the completion side only shows the output format overhead. Pass --groq-base-url (and set
+GROQ_API_KEY) to measure the real model instead.
+
+Results are printed and written as JSON (compare two runs with compare.py).
+
+Usage (from the repo root):
+    python benchmarks/llm_prompts.py [--repeat 10] [--days 6] [--variants compact:json_mode,full:function_calling]
+                                     [--max-tokens 200] [--groq-base-url https://api.groq.com]
+                                     [--output results.json] [fake upstream options, see fake_upstreams.py]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from fake_upstreams import add_arguments, fake_forecast_days  # noqa: E402
+from load_test import fake_upstream_args, free_port, git_commit, start_process, wait_until_ready  # noqa: E402
+
+VARIANTS = [
+    "full:function_calling",
+    "full:json_mode",
+    "compact:function_calling",
+    "compact:json_mode",
+]
+
+
+def sample_days(count):
+    # Days shaped like get_weather's results, from the fake forecast
+    return [
+        {"location": "San Ramon, California", "date": day["date"], "temperature": day["day"]["avgtemp_c"],
+         "humidity": day["day"]["avghumidity"], "wind_speed": day["day"]["maxwind_kph"],
+         "description": day["day"]["condition"]["text"]}
+        for day in fake_forecast_days("San Ramon, California", count)
+    ]
+
+
+def run_variant(crud, model, prompts, check, repeat):
+    # Sends every prompt in turn; returns the result row (without its name)
+    latencies, prompt_tokens, completion_tokens = [], [], []
+    errors = valid = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        try:
+            response = model.invoke(prompts(i))
+        except Exception:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        usage = getattr(response["raw"], "usage_metadata", None) or {}
+        prompt_tokens.append(usage.get("input_tokens", 0))
+        completion_tokens.append(usage.get("output_tokens", 0))
+        try:
+            check(crud._parsed(response))
+            valid += 1
+        except ValueError:
+            pass
+
+    if not latencies:
+        return {"calls": repeat, "errors": errors, "valid_rate": 0.0}
+    p95 = float(np.percentile(latencies, 95))
+    return {
+        "calls": repeat,
+        "errors": errors,
+        "valid_rate": round(valid / repeat, 3),
+        "prompt_tokens": statistics.median(prompt_tokens),
+        "completion_tokens": statistics.median(completion_tokens),
+        "median_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(p95, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="calls per variant, single day and batched each")
+    parser.add_argument("--days", type=int, default=6, help="days in a batched call")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="comma separated prompt:output_mode pairs")
+    parser.add_argument("--max-tokens", type=int, help="output cap per day (default: SUMMARY_MAX_TOKENS of the variant)")
+    parser.add_argument("--groq-base-url", help="measure this server instead of the fake LLM")
+    parser.add_argument("--output", default="benchmarks/results/llm_prompts.json")
+    add_arguments(parser)
+    # Rough shape of a small hosted model: fixed overhead, cheap prompt tokens, dearer output tokens
+    parser.set_defaults(llm_latency_ms=150, jitter=0.1, llm_ms_per_prompt_token=0.3, llm_ms_per_completion_token=2.0)
+    args = parser.parse_args()
+
+    variants = [variant.split(":") for variant in args.variants.split(",")]
+    if any(len(variant) != 2 for variant in variants):
+        parser.error("--variants takes prompt:output_mode pairs, e.g. compact:json_mode")
+
+    workdir = Path(tempfile.mkdtemp(prefix="weather-llm-"))
+    fake = None
+    if args.groq_base_url:
+        base_url = args.groq_base_url
+    else:
+        port = free_port()
+        fake = start_process(
+            [sys.executable, str(REPO_ROOT / "benchmarks" / "fake_upstreams.py"), "--port", str(port),
+             *fake_upstream_args(args)],
+            os.environ.copy(), workdir / "fake_upstreams.log"
+        )
+        base_url = f"http://127.0.0.1:{port}/groq"
+        os.environ.setdefault("GROQ_API_KEY", "bench")
+
+    # The app reads these on import
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'weather.db'}"
+    import app.crud as crud
+    from app.utils import get_weather_prompt_template
+
+    days = sample_days(args.days)
+    results = []
+    try:
+        if fake is not None:
+            wait_until_ready(f"http://127.0.0.1:{port}/stats")
+        for variant, output_mode in variants:
+            max_tokens = args.max_tokens or crud.SUMMARY_MAX_TOKENS_BY_PROMPT[variant]
+            template = get_weather_prompt_template(variant, output_mode)
+            runs = {
+                "single": (
+                    crud.get_structured_model(output_mode, max_tokens),
+                    lambda i: template.invoke(crud._summary_args(days[i % len(days)])),
+                    crud._check_summary,
+                ),
+                "batch": (
+                    crud.get_structured_batch_model(output_mode, max_tokens * len(days)),
+                    lambda i: crud._batch_prompt(days, variant, output_mode),
+                    lambda parsed: crud._check_batch_response(parsed, days),
+                ),
+            }
+            for kind, (model, prompts, check) in runs.items():
+                result = {
+                    "benchmark": f"{kind}:{variant}:{output_mode}",
+                    "days": 1 if kind == "single" else len(days),
+                    "max_tokens": max_tokens,
+                    **run_variant(crud, model, prompts, check, args.repeat),
+                }
+                results.append(result)
+                print(f"{result['benchmark']:<34} prompt {result.get('prompt_tokens', 0):>6} tok  "
+                      f"completion {result.get('completion_tokens', 0):>6} tok  "
+                      f"p50 {result.get('median_ms', 0):>8.1f}  p95 {result.get('p95_ms', 0):>8.1f} ms  "
+                      f"valid {result['valid_rate']:.0%}  errors {result['errors']}")
+    finally:
+        if fake is not None:
+            fake.terminate()
+            fake.wait()
+
+    report = {
+        "meta": {
+            "benchmark": "llm_prompts",
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+load_test.py
+
+End-to-end load test: runs the app under uvicorn against the fake upstream services
+(fake_upstreams.py), seeds the Weather table at each requested size and reports throughput and
+p50/p95/p99 latency per endpoint under concurrent load.
+
+For every size in --sizes:
+  1. a fresh SQLite database is seeded with seed.py,
+  2. the app is started in its own process (background prefetch off), with --workers uvicorn
+     workers sharing the --cache-backend cache (redis: fake_redis.py is started too),
+  3. every scenario sends --requests requests with --concurrency in flight.
+
+Results are printed and written as JSON (compare two runs with compare.py).
+
+Usage (from the repo root):
+    python benchmarks/load_test.py [--sizes 1000,10000] [--requests 200] [--concurrency 16]
+                                   [--scenarios get_weather,search_location] [--output results.json]
+                                   [--workers 4] [--cache-backend sqlite|redis|none]
+                                   [fake upstream options, see fake_upstreams.py]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_upstreams import add_arguments  # noqa: E402
+from seed import seed_location_name  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCHMARKS_DIR = REPO_ROOT / "benchmarks"
+
+DAYS_PER_LOCATION = 60
+
+# How index.html shows an error message
+ERROR_MARKER = '<p style="color:red;">'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+# -------------------------------
+# Scenarios: (rng, seeded location count) -> request kwargs for httpx
+# -------------------------------
+def _seeded_location(rng, locations):
+    return seed_location_name(rng.randrange(locations))
+
+
+def get_weather_request(rng, locations):
+    # Mostly seeded locations (today is stored, the next days come from the forecast + LLM),
+    # some brand new ones that miss every cache
+    today = date.today()
+    location = _seeded_location(rng, locations) if rng.random() < 0.8 else f"Bench Town {rng.randrange(10**6)}"
+    return {"method": "POST", "url": "/weather", "data": {
+        "location": location,
+        "start_date": str(today),
+        "end_date": str(today + timedelta(days=rng.randint(0, 4))),
+    }}
+
+
+def search_location_request(rng, locations):
+    prefix = "Seed City " + str(rng.randrange(locations))[:rng.randint(1, 3)] if rng.random() < 0.7 \
+        else "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 4)))
+    return {"method": "GET", "url": "/search_location", "params": {"q": prefix}}
+
+
+def list_weather_request(rng, locations):
+    rows = locations * DAYS_PER_LOCATION
+    return {"method": "GET", "url": "/weather", "params": {"limit": 100, "cursor": rng.randrange(max(rows, 1))}}
+
+
+def export_csv_location_request(rng, locations):
+    return {"method": "GET", "url": "/export/csv", "params": {"location": _seeded_location(rng, locations)}}
+
+
+def export_csv_full_request(rng, locations):
+    return {"method": "GET", "url": "/export/csv"}
+
+
+def weather_stats_request(rng, locations):
+    return {"method": "GET", "url": "/weather/stats", "params": {"location": _seeded_location(rng, locations), "period": "year"}}
+
+
+# name -> (request factory, share of --requests)
+SCENARIOS = {
+    "get_weather": (get_weather_request, 1.0),
+    "search_location": (search_location_request, 1.0),
+    "list_weather": (list_weather_request, 1.0),
+    "export_csv_location": (export_csv_location_request, 1.0),
+    "export_csv_full": (export_csv_full_request, 0.05),
+    "weather_stats": (weather_stats_request, 1.0),
+}
+
+
+async def run_scenario(base_url, factory, total, concurrency, locations, seed=1):
+    rng = random.Random(seed)
+    requests = [factory(rng, locations) for _ in range(total)]
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def worker():
+            nonlocal next_index, errors
+            while next_index < len(requests):
+                request = requests[next_index]
+                next_index += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.request(**request)
+                    await response.aread()
+                    # Form endpoints answer 200 with the error rendered in the page
+                    is_html = response.headers.get("content-type", "").startswith("text/html")
+                    if response.status_code >= 400 or (is_html and ERROR_MARKER in response.text):
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+
+def start_process(args, env, log_path):
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def fake_upstream_args(args):
+    return [
+        "--weather-latency-ms", str(args.weather_latency_ms),
+        "--youtube-latency-ms", str(args.youtube_latency_ms),
+        "--llm-latency-ms", str(args.llm_latency_ms),
+        "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate),
+        "--llm-error-rate", str(args.llm_error_rate),
+        "--llm-ms-per-prompt-token", str(args.llm_ms_per_prompt_token),
+        "--llm-ms-per-completion-token", str(args.llm_ms_per_completion_token),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated Weather row counts")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", default="benchmarks/results/load_test.json")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--cache-backend", default="sqlite", choices=["sqlite", "redis", "none"],
+                        help="shared cache between workers (CACHE_BACKEND)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="weather-bench-"))
+    fake_port = free_port()
+    fake = start_process(
+        [sys.executable, str(BENCHMARKS_DIR / "fake_upstreams.py"), "--port", str(fake_port), *fake_upstream_args(args)],
+        os.environ.copy(), workdir / "fake_upstreams.log"
+    )
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    redis = None
+    if args.cache_backend == "redis":
+        redis_port = free_port()
+        redis = start_process(
+            [sys.executable, str(BENCHMARKS_DIR / "fake_redis.py"), "--port", str(redis_port)],
+            os.environ.copy(), workdir / "fake_redis.log"
+        )
+
+    results = []
+    try:
+        wait_until_ready(f"{fake_url}/stats")
+        for size in sizes:
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{workdir / f'weather_{size}.db'}",
+                "WEATHER_API_KEY": "bench", "YOUTUBE_API_KEY": "bench", "GROQ_API_KEY": "bench",
+                "WEATHER_API_BASE_URL": f"{fake_url}/weatherapi",
+                "YOUTUBE_API_BASE_URL": f"{fake_url}/youtube",
+                "GROQ_BASE_URL": f"{fake_url}/groq",
+                "PREFETCH_ENABLED": "false",
+                "CACHE_BACKEND": args.cache_backend,
+                "CACHE_DB_PATH": str(workdir / f"shared_cache_{size}.db"),
+            }
+            if redis is not None:
+                # A fresh keyspace per size, so no run starts warm
+                env["CACHE_REDIS_URL"] = f"redis://127.0.0.1:{redis_port}/0"
+                env["CACHE_KEY_PREFIX"] = f"bench-{size}:"
+            subprocess.run([sys.executable, str(BENCHMARKS_DIR / "seed.py"), "--rows", str(size),
+                            "--days-per-location", str(DAYS_PER_LOCATION)], cwd=REPO_ROOT, env=env, check=True)
+
+            app_port = free_port()
+            app = start_process(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning",
+                 "--workers", str(args.workers)],
+                env, workdir / f"app_{size}.log"
+            )
+            try:
+                base_url = f"http://127.0.0.1:{app_port}"
+                wait_until_ready(f"{base_url}/")
+                locations = max(1, size // DAYS_PER_LOCATION)
+                for name in scenarios:
+                    factory, share = SCENARIOS[name]
+                    total = max(1, int(args.requests * share))
+                    result = asyncio.run(run_scenario(base_url, factory, total, args.concurrency, locations))
+                    result = {"scenario": name, "seed_rows": size, "concurrency": args.concurrency, **result}
+                    results.append(result)
+                    print(f"{size:>8} rows  {name:<20} {result['throughput_rps']:>8.1f} req/s  "
+                          f"p50 {result['p50_ms']:>8.1f}  p95 {result['p95_ms']:>8.1f}  p99 {result['p99_ms']:>8.1f} ms  "
+                          f"errors {result['errors']}")
+            finally:
+                app.terminate()
+                app.wait()
+    finally:
+        for process in (fake, redis):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    report = {
+        "meta": {
+            "benchmark": "load_test",
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output} (logs in {workdir})")
+
+
+if __name__ == "__main__":
+    main()
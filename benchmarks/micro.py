@@ -0,0 +1,146 @@
+"""
+micro.py
+
+In-process micro-benchmarks of the database paths behind the endpoints, no HTTP or upstreams:
+
+- db_range_read:   crud.get_weather for one location + 5 day range (get_weather's DB read)
+- insert_rows:     crud.insert_weather_rows for 5 new days (get_weather's DB write, incl. weather_stats)
+- list_page:       one GET /weather page (list_weather + limit 100) from a random cursor
+- export_csv:      the full /export/csv stream
+- export_ndjson:   the full GET /weather?format=ndjson stream
+- weather_stats:   get_weather_stats for every location, yearly rollup
+
+Runs against a fresh SQLite database seeded with --rows rows and writes JSON (see compare.py).
+
+Usage (from the repo root):
+    python benchmarks/micro.py [--rows 10000] [--repeat 50] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+DAYS_PER_LOCATION = 60
+
+
+def measure(fn, repeat, setup=None):
+    # Returns per-call timings in ms; setup() output is passed to fn and not timed
+    timings = []
+    for i in range(repeat):
+        arg = setup(i) if setup else None
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(name, timings, rows=None):
+    result = {
+        "benchmark": name,
+        "repeat": len(timings),
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+    }
+    if rows:
+        result["rows_per_second"] = round(rows / (statistics.median(timings) / 1000))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", default="benchmarks/results/micro.json")
+    args = parser.parse_args()
+
+    # The app reads DATABASE_URL on import
+    workdir = Path(tempfile.mkdtemp(prefix="weather-micro-"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'weather.db'}"
+
+    from app.crud import get_locations_for_names, get_weather, insert_weather_rows, list_weather
+    from app.database import SessionLocal
+    from app.export import stream_weather_csv, stream_weather_ndjson
+    from app.migrations import run_migrations
+    from app.stats import get_weather_stats
+    from load_test import git_commit
+    from seed import seed_location_name, seed_weather
+
+    run_migrations()
+    rng = random.Random(7)
+    with SessionLocal() as db:
+        locations = seed_weather(db, args.rows, DAYS_PER_LOCATION)
+        today = date.today()
+
+        def new_rows(name):
+            # get_weather inserts rows of an already resolved location
+            location = get_locations_for_names(db, [name])[name]
+            return [
+                {"location": location.name, "location_id": location.id, "date": today + timedelta(days=d),
+                 "temperature": 20.0, "description": "Sunny", "humidity": 50, "wind_speed": 10.0,
+                 "fetched_at": datetime.utcnow()}
+                for d in range(5)
+            ]
+
+        # Full-table streams are slow on big tables, run them fewer times
+        full_scan_repeat = max(3, args.repeat // 10)
+
+        results = [
+            summarize("db_range_read", measure(
+                lambda location: get_weather(db, location, today - timedelta(days=4), today),
+                args.repeat, setup=lambda i: seed_location_name(rng.randrange(locations))
+            )),
+            summarize("insert_rows", measure(
+                lambda rows: insert_weather_rows(db, rows),
+                args.repeat, setup=lambda i: new_rows(f"Micro Town {i}")
+            )),
+            summarize("list_page", measure(
+                lambda cursor: list_weather(db, after_id=cursor).limit(101).all(),
+                args.repeat, setup=lambda i: rng.randrange(args.rows)
+            )),
+            summarize("export_csv", measure(
+                lambda _: sum(len(chunk) for chunk in stream_weather_csv({})), full_scan_repeat
+            ), rows=args.rows),
+            summarize("export_ndjson", measure(
+                lambda _: sum(len(chunk) for chunk in stream_weather_ndjson({})), full_scan_repeat
+            ), rows=args.rows),
+            summarize("weather_stats", measure(
+                lambda _: get_weather_stats(db, period="year"), full_scan_repeat
+            )),
+        ]
+
+    for result in results:
+        print(f"{result['benchmark']:<16} median {result['median_ms']:>10.3f} ms  min {result['min_ms']:>10.3f} ms"
+              + (f"  {result['rows_per_second']:>10} rows/s" if "rows_per_second" in result else ""))
+
+    report = {
+        "meta": {
+            "benchmark": "micro",
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": [{"seed_rows": args.rows, **result} for result in results],
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+seed.py
+
+Fills the Weather table with synthetic rows for benchmarks.
+
+Rows go through crud.insert_weather_rows (same path as get_weather), so weather_stats is
+maintained as in production. Locations are "Seed City N, Region" with consecutive days ending
+today, so part of every location's rows overlap the forecast window.
+
+Usage (DATABASE_URL selects the database, as for the app):
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --rows 10000 [--days-per-location 60]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+CHUNK_SIZE = 1000
+CONDITIONS = ["Sunny", "Partly cloudy", "Cloudy", "Light rain", "Mist"]
+
+
+def seed_location_name(i):
+    return f"Seed City {i}, Region {i % 50}"
+
+
+def iter_seed_rows(rows, days_per_location, seed=42):
+    rng = random.Random(seed)
+    today = date.today()
+    fetched_at = datetime.utcnow()
+    for n in range(rows):
+        location_number, day_offset = divmod(n, days_per_location)
+        yield {
+            "location": seed_location_name(location_number),
+            "date": today - timedelta(days=day_offset),
+            "temperature": round(rng.uniform(-10, 35), 1),
+            "description": rng.choice(CONDITIONS),
+            "humidity": rng.randint(10, 100),
+            "wind_speed": round(rng.uniform(0, 60), 1),
+            "fetched_at": fetched_at,
+        }
+
+
+def seed_weather(db, rows, days_per_location=60):
+    # Returns the number of locations seeded
+    from app.crud import insert_weather_rows
+
+    chunk = []
+    for row in iter_seed_rows(rows, days_per_location):
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            insert_weather_rows(db, chunk)
+            chunk = []
+    insert_weather_rows(db, chunk)
+    return (rows + days_per_location - 1) // days_per_location
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--days-per-location", type=int, default=60)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+    from app.migrations import run_migrations
+
+    run_migrations()
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        locations = seed_weather(db, args.rows, args.days_per_location)
+    print(f"Seeded {args.rows} rows for {locations} locations in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,163 @@
+"""
+Shared test setup: the app runs against a throwaway SQLite database, in-memory rate limits and
+caches, and fake weatherapi.com / YouTube servers plugged in with httpx.MockTransport.
+The settings below are read when app modules are imported, so they are set first.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import zlib
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+TMP_DIR = tempfile.mkdtemp(prefix="weather-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TMP_DIR}/weather.db",
+    # A pool smaller than the concurrency the tests use, so a handler holding connections shows up
+    "DB_POOL_SIZE": "2",
+    "DB_MAX_OVERFLOW": "0",
+    "DB_POOL_TIMEOUT": "3",
+    # Admission would otherwise follow the pool size and queue those requests before they get in
+    "ADMISSION_WEATHER_CONCURRENCY": "16",
+    "RATE_LIMIT_BACKEND": "memory",
+    "CACHE_BACKEND": "none",
+    "WEATHER_API_KEY": "test-weather-key",
+    "YOUTUBE_API_KEY": "test-youtube-key",
+    "GROQ_API_KEY": "test-groq-key",
+    "SUMMARY_BACKEND": "local",
+    "PREFETCH_ENABLED": "false",
+})
+# Templates and static files are looked up relative to the repo root
+os.chdir(REPO_ROOT)
+sys.path.insert(0, str(REPO_ROOT))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app.crud as crud  # noqa: E402
+from app.limits import MemoryBucketStore, upstream_limiter  # noqa: E402
+from app.main import app, get_http_client  # noqa: E402
+
+
+class FakeUpstreams:
+    """
+    weatherapi.com search.json / forecast.json and YouTube search.
+    Any query is a place of its own ("<Query>, Testshire"), except queries starting with "nowhere".
+    """
+
+    def __init__(self):
+        self.calls = Counter()  # endpoint -> requests
+        self.fail = {}          # endpoint -> HTTP status to answer with
+        self.delay = 0.0        # seconds before every answer
+        self.slow = {}          # endpoint -> extra seconds before its answers
+
+    async def handler(self, request: httpx.Request):
+        endpoint = request.url.path.rsplit("/", 1)[-1]  # search.json, forecast.json or search
+        self.calls[endpoint] += 1
+        if self.delay or endpoint in self.slow:
+            await asyncio.sleep(self.delay + self.slow.get(endpoint, 0.0))
+        if endpoint in self.fail:
+            status = self.fail[endpoint]
+            # weatherapi.com sends code/message; YouTube adds errors[].reason (403 = daily quota used up)
+            reason = "quotaExceeded" if status == 403 else "backendError"
+            return httpx.Response(status, json={"error": {
+                "code": 9999, "message": "upstream failure", "errors": [{"reason": reason}],
+            }})
+
+        q = request.url.params["q"]
+        if endpoint == "search.json":
+            if q.lower().startswith("nowhere"):
+                return httpx.Response(200, json=[])
+            return httpx.Response(200, json=[self.place(q)])
+        if endpoint == "forecast.json":
+            return httpx.Response(200, json={"forecast": {"forecastday": [
+                {"date": str(date.today() + timedelta(days=i)), "day": {
+                    "avgtemp_c": 20.0 + i, "avghumidity": 50, "maxwind_kph": 10.0,
+                    "condition": {"text": "Sunny"},
+                }}
+                for i in range(int(request.url.params.get("days", 5)))
+            ]}})
+        return httpx.Response(200, json={"items": [
+            {"id": {"videoId": f"video{i}"},
+             "snippet": {"title": f"{q} video {i}", "thumbnails": {"medium": {"url": f"https://img/{i}.jpg"}}}}
+            for i in range(int(request.url.params.get("maxResults", 4)))
+        ]})
+
+    @staticmethod
+    def place(q):
+        # Stable coordinates per name, so every spelling of it maps to the same place
+        name = " ".join(q.split()).title()
+        seed = zlib.crc32(name.lower().encode())
+        return {"name": name, "region": "Testshire", "country": "Testland",
+                "lat": seed % 9000 / 100, "lon": seed % 18000 / 100}
+
+
+class FakeLLM:
+    """
+    Stands in for the structured Groq models (crud.get_structured_model / get_structured_batch_model).
+    Answers a summary naming the day's location, or raises `error` for locations in `fail`.
+    """
+
+    def __init__(self):
+        self.calls = Counter()  # "llm" / "llm_batch" -> calls
+        self.fail = set()       # locations whose summaries fail
+        self.error = RuntimeError("LLM is down")
+        self.slow = {}          # location -> seconds before answering for it
+        self.batch = self.BatchModel(self)
+
+    async def ainvoke(self, prompt_value):
+        self.calls["llm"] += 1
+        return await self._answer(prompt_value.to_string())
+
+    async def _answer(self, text):
+        await asyncio.sleep(max([seconds for location, seconds in self.slow.items() if location in text], default=0))
+        if any(location in text for location in self.fail):
+            raise self.error
+        location = text.split("Location: ", 1)[1].split("\n", 1)[0].split(",", 1)[0]
+        return {"summary": f"LLM summary for {location}", "clothes": "Jacket", "precautions": "None"}
+
+    class BatchModel:
+        def __init__(self, llm):
+            self.llm = llm
+
+        async def ainvoke(self, prompt_value):
+            self.llm.calls["llm_batch"] += 1
+            days = prompt_value.to_string().split("Location: ")[1:]
+            return {"days": list(await asyncio.gather(*(self.llm._answer("Location: " + day) for day in days)))}
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+
+    async def ready():
+        pass
+
+    monkeypatch.setattr(crud, "llm_ready", ready)
+    # Fresh rate limit buckets, so earlier tests' calls don't leave this one short of tokens
+    monkeypatch.setattr(upstream_limiter, "store", MemoryBucketStore())
+    monkeypatch.setattr(crud, "get_structured_model", lambda: fake)
+    monkeypatch.setattr(crud, "get_structured_batch_model", lambda: fake.batch)
+    return fake
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def upstreams(client):
+    fake = FakeUpstreams()
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    app.dependency_overrides[get_http_client] = lambda: http_client
+    yield fake
+    app.dependency_overrides.pop(get_http_client, None)
@@ -0,0 +1,71 @@
+"""POST /weather/batch against the fake upstreams in conftest.py."""
+
+import json
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from app.batch import stream_batch_forecast
+from app.limits import MemoryBucketStore, upstream_limiter
+from app.schemas import WeatherBatchRequest
+
+
+def batch(client, locations, days=3):
+    today = date.today()
+    response = client.post("/weather/batch", json={
+        "locations": locations,
+        "start_date": str(today),
+        "end_date": str(today + timedelta(days=days - 1)),
+    })
+    assert response.status_code == 200
+    return {line["location"]: line for line in map(json.loads, response.text.splitlines())}
+
+
+def test_cold_batch_is_paced_to_the_rate_limit(client, upstreams, monkeypatch):
+    # A burst of 2 and 40 calls a second: 12 locations need 24 calls, most of them after a wait
+    monkeypatch.setattr(upstream_limiter, "store", MemoryBucketStore())
+    monkeypatch.setitem(upstream_limiter.limits, "weatherapi", (40.0, 2))
+
+    locations = [f"Batch Town {i}" for i in range(12)]
+    results = batch(client, locations)
+
+    assert [results[location]["status"] for location in locations] == ["ok"] * 12
+    assert upstreams.calls["search.json"] == 12
+    assert upstreams.calls["forecast.json"] == 12
+
+
+def test_batch_returns_ids_of_new_days(client, upstreams):
+    fetched = batch(client, ["Fresh Ids City"])["Fresh Ids City"]
+    assert fetched["status"] == "ok"
+    assert len(fetched["weather"]) == 3
+    assert all(day["id"] is not None for day in fetched["weather"])
+
+    # Served from the DB the second time, with the same rows
+    stored = batch(client, ["Fresh Ids City"])["Fresh Ids City"]
+    assert stored["weather"] == fetched["weather"]
+    assert upstreams.calls["forecast.json"] == 1
+
+
+def test_stored_locations_stream_before_cold_lookups(client, upstreams):
+    assert batch(client, ["Warm Town"])["Warm Town"]["status"] == "ok"
+    upstreams.delay = 0.5
+    today = date.today()
+    request = WeatherBatchRequest(
+        locations=["Cold Town", "warm town", "Warm Town"], start_date=today, end_date=today + timedelta(days=2)
+    )
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(upstreams.handler))
+
+    async def lines():
+        # (seconds since the start, location) per streamed line
+        started = time.monotonic()
+        return [
+            (time.monotonic() - started, json.loads(line)["location"])
+            async for line in stream_batch_forecast(request, http_client, "test-weather-key")
+        ]
+
+    received = client.portal.call(lines)
+    assert [location for _, location in received] == ["warm town", "Warm Town", "Cold Town"]
+    # Every spelling of the stored place came straight from the DB, ahead of the slow upstream
+    assert received[1][0] < 0.3 <= received[2][0]
+    assert upstreams.calls["search.json"] == 2
@@ -0,0 +1,59 @@
+"""CompressionMiddleware (compression.py): gzip / brotli by Accept-Encoding, above COMPRESSION_MINIMUM_SIZE."""
+
+from datetime import date, datetime
+
+import pytest
+
+from app.compression import COMPRESSION_MINIMUM_SIZE
+from app.crud import insert_weather_rows
+from app.database import SessionLocal
+
+LOCATION = "Compressed Town"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def rows(client):
+    with SessionLocal() as db:
+        insert_weather_rows(db, [
+            {"location": LOCATION, "date": date(2024, 5, day), "temperature": 20.0 + day,
+             "description": "Sunny with a few clouds later in the day", "humidity": 50, "wind_speed": 10.0,
+             "fetched_at": datetime(2024, 5, 1)}
+            for day in range(1, 31)
+        ])
+
+
+def get(client, path, encoding, **params):
+    response = client.get(path, params=params, headers={"Accept-Encoding": encoding})
+    assert response.status_code == 200
+    return response
+
+
+def test_large_listing_is_gzipped(client):
+    response = get(client, "/weather", "gzip", location=LOCATION)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(response.content) > COMPRESSION_MINIMUM_SIZE  # decoded by the client
+    assert len(response.json()) == 30
+
+
+def test_brotli_preferred_when_accepted(client):
+    pytest.importorskip("brotli")
+    response = get(client, "/export/csv", "gzip, br", location=LOCATION)
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.text.count("\n") == 31
+
+
+def test_small_bodies_and_identity_are_sent_as_is(client):
+    small = get(client, "/weather", "gzip, br", location=LOCATION, limit=1)
+    assert len(small.content) < COMPRESSION_MINIMUM_SIZE
+    assert "Content-Encoding" not in small.headers
+
+    plain = get(client, "/weather", "identity", location=LOCATION)
+    assert len(plain.content) > COMPRESSION_MINIMUM_SIZE
+    assert "Content-Encoding" not in plain.headers
+
+
+def test_only_listed_paths_are_compressed(client):
+    response = get(client, "/metrics", "gzip")
+    assert len(response.content) > COMPRESSION_MINIMUM_SIZE
+    assert "Content-Encoding" not in response.headers
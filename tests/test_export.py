@@ -0,0 +1,101 @@
+"""/export/csv, /export/parquet and /export/arrow (export.py)."""
+
+import csv
+import io
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.crud import insert_weather_rows
+from app.database import SessionLocal
+from app.export import CSV_HEADER, EXPORT_BATCH_SIZE, stream_weather_csv
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+LOCATIONS = ["Export Town", "Export City", "Export Village"]
+FIRST_DAY = date(2020, 1, 1)
+DAYS = 700  # 2100 rows: more than two export batches
+
+
+@pytest.fixture(scope="module", autouse=True)
+def rows(client):
+    with SessionLocal() as db:
+        insert_weather_rows(db, [
+            {"location": location, "date": FIRST_DAY + timedelta(days=i), "temperature": i / 10,
+             # Every tenth day without the optional columns
+             "description": None if i % 10 == 0 else "Sunny", "humidity": None if i % 10 == 0 else i % 100,
+             "wind_speed": None if i % 10 == 0 else 5.5, "fetched_at": datetime(2020, 1, 1)}
+            for location in LOCATIONS for i in range(DAYS)
+        ])
+
+
+FILTERS = {"start_date": str(FIRST_DAY), "end_date": str(FIRST_DAY + timedelta(days=DAYS - 1))}
+EXPECTED_SCHEMA = [
+    ("id", "int64"), ("location", "string"), ("date", "date32[day]"), ("temperature", "double"),
+    ("description", "string"), ("humidity", "int32"), ("wind_speed", "double"),
+]
+
+
+def export(client, file_format, **params):
+    response = client.get(f"/export/{file_format}", params={**FILTERS, **params})
+    assert response.status_code == 200
+    return response
+
+
+def check_table(table, rows):
+    assert [(field.name, str(field.type)) for field in table.schema] == EXPECTED_SCHEMA
+    assert table.num_rows == rows
+    columns = ["date", "temperature", "description", "humidity", "wind_speed"]
+    first, second = ([row[column] for column in columns] for row in table.slice(0, 2).to_pylist())
+    assert first == [FIRST_DAY, 0.0, None, None, None]
+    assert second == [FIRST_DAY + timedelta(days=1), 0.1, "Sunny", 1, 5.5]
+
+
+def test_parquet_round_trip(client):
+    response = export(client, "parquet")
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    assert response.headers["content-disposition"] == "attachment; filename=weather_data.parquet"
+
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    # One row group per export batch
+    assert parquet.metadata.num_row_groups == -(-len(LOCATIONS) * DAYS // EXPORT_BATCH_SIZE)
+    check_table(parquet.read(), len(LOCATIONS) * DAYS)
+
+
+def test_arrow_round_trip_with_filters(client):
+    response = export(client, "arrow", location="export town")
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    check_table(table, DAYS)
+    assert set(table.column("location").to_pylist()) == {"Export Town"}
+
+
+def test_csv_export(client):
+    response = export(client, "csv", location="Export City")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == "attachment; filename=weather_data.csv"
+
+    lines = list(csv.reader(io.StringIO(response.text)))
+    assert lines[0] == CSV_HEADER
+    assert len(lines) == DAYS + 1
+    assert lines[1] == ["Export City", str(FIRST_DAY), "0.0", "", "", ""]
+    assert lines[2] == ["Export City", str(FIRST_DAY + timedelta(days=1)), "0.1", "Sunny", "1", "5.5"]
+
+
+def test_csv_is_streamed_one_batch_at_a_time():
+    chunks = list(stream_weather_csv({"location": "Export Village"}))
+    # A chunk per export batch, the first one starting with the header
+    assert len(chunks) == -(-DAYS // EXPORT_BATCH_SIZE)
+    assert chunks[0].startswith(",".join(CSV_HEADER))
+    assert sum(chunk.count("\n") for chunk in chunks) == DAYS + 1
+
+    # No rows: just the header
+    assert list(stream_weather_csv({"location": "No Such Export Town"})) == [",".join(CSV_HEADER) + "\r\n"]
+
+
+def test_unknown_format(client):
+    response = client.get("/export/xlsx")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Unknown export format 'xlsx'"}
@@ -0,0 +1,89 @@
+"""ETag / Last-Modified, 304s and the response cache (http_cache.py) on GET /weather."""
+
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from app.crud import get_table_version, insert_weather_rows
+from app.database import SessionLocal
+from app.metrics import cache_requests
+
+
+def add_day(location, day=1):
+    with SessionLocal() as db:
+        insert_weather_rows(db, [{
+            "location": location, "date": date(2024, 5, day), "temperature": 20.0, "description": "Sunny",
+            "humidity": 50, "wind_speed": 10.0, "fetched_at": datetime(2024, 5, 1),
+        }])
+
+
+def weather_version():
+    with SessionLocal() as db:
+        return get_table_version(db, "weather")[0]
+
+
+def response_cache_hits():
+    return cache_requests.value(cache="response", result="hit")
+
+
+def test_writes_bump_the_version_and_etag(client):
+    add_day("Etag Town")
+    version = weather_version()
+    first = client.get("/weather", params={"location": "Etag Town"})
+    assert first.headers["ETag"] == f'W/"weather-{version}"'
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    add_day("Etag Town", day=2)
+    assert weather_version() == version + 1
+    second = client.get("/weather", params={"location": "Etag Town"})
+    assert second.headers["ETag"] == f'W/"weather-{version + 1}"'
+    assert len(second.json()) == 2
+
+
+def test_if_none_match_returns_304_until_a_write(client):
+    add_day("Poll Town")
+    etag = client.get("/weather", params={"location": "Poll Town"}).headers["ETag"]
+
+    not_modified = client.get("/weather", params={"location": "Poll Town"}, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    # Weak comparison and lists of tags
+    assert client.get("/weather", headers={"If-None-Match": f'"other", {etag.removeprefix("W/")}'}).status_code == 304
+
+    add_day("Poll Town", day=2)
+    changed = client.get("/weather", params={"location": "Poll Town"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_if_modified_since(client):
+    add_day("Since Town")
+    last_modified = client.get("/weather").headers["Last-Modified"]
+    assert client.get("/weather", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(hours=1), usegmt=True)
+    assert client.get("/weather", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/weather", headers={"If-Modified-Since": "not a date"}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    assert client.get("/weather", headers={"If-None-Match": '"stale"', "If-Modified-Since": future}).status_code == 200
+
+
+def test_response_cache_is_keyed_by_version_and_query(client):
+    add_day("Cached Town")
+    hits = response_cache_hits()
+    first = client.get("/weather", params={"location": "Cached Town"})
+    assert response_cache_hits() == hits
+
+    assert client.get("/weather", params={"location": "Cached Town"}).content == first.content
+    assert response_cache_hits() == hits + 1
+
+    # Another query is built on its own
+    client.get("/weather", params={"location": "Cached Town", "limit": 1})
+    assert response_cache_hits() == hits + 1
+
+    # A write changes the version: the old body is not served again
+    add_day("Cached Town", day=2)
+    after_write = client.get("/weather", params={"location": "Cached Town"})
+    assert response_cache_hits() == hits + 1
+    assert len(after_write.json()) == 2
@@ -0,0 +1,109 @@
+"""POST /weather/import (importer.py): CSV and NDJSON bulk import / bulk edit."""
+
+import json
+
+import app.models as models
+from app.database import SessionLocal
+from app.importer import import_weather
+
+CSV_HEADER = "Location,Date,Temperature(°C),Description,Humidity(%),Wind Speed(kph)\n"
+
+
+def post_import(client, body, content_type="text/csv"):
+    response = client.post("/weather/import", content=body.encode(), headers={"content-type": content_type})
+    assert response.status_code == 200
+    return response.json()
+
+
+def stored(location):
+    # {date: (temperature, description, humidity, wind_speed)}
+    with SessionLocal() as db:
+        return {
+            str(row.date): (row.temperature, row.description, row.humidity, row.wind_speed)
+            for row in db.query(models.Weather).filter(models.Weather.location == location)
+        }
+
+
+def test_csv_import_with_multi_line_fields(client):
+    report = post_import(client, CSV_HEADER + (
+        "Csv Town,2024-05-01,21.5,Sunny,40,12\n"
+        'Csv Town,2024-05-02,18,"Rain,\nthen ""clearing""",80,20\n'
+        "Csv Town,2024-05-03,15,,,\n"
+    ))
+    assert report == {"rows": 3, "imported": 3, "failed": 0, "errors": [], "errors_truncated": False}
+    assert stored("Csv Town") == {
+        "2024-05-01": (21.5, "Sunny", 40, 12.0),
+        "2024-05-02": (18.0, 'Rain,\nthen "clearing"', 80, 20.0),
+        "2024-05-03": (15.0, None, None, None),
+    }
+
+
+def test_ndjson_import(client):
+    lines = [
+        {"location": "Ndjson Town", "date": "2024-05-01", "temperature": 10, "description": "Fog",
+         "humidity": 90, "wind_speed": 3.5},
+        {"location": "Ndjson Town", "date": "2024-05-02", "temperature": "11.5"},
+    ]
+    report = post_import(client, "\n".join(map(json.dumps, lines)) + "\n", "application/x-ndjson")
+    assert report["imported"] == 2 and report["failed"] == 0
+    assert stored("Ndjson Town") == {"2024-05-01": (10.0, "Fog", 90, 3.5), "2024-05-02": (11.5, None, None, None)}
+
+
+def test_invalid_rows_are_reported_in_line_order(client):
+    report = post_import(client, CSV_HEADER + (
+        "Error Town,2024-05-01,150,Hot,40,12\n"     # line 2
+        "Error Town,2024-05-02,20\n"                # line 3: read error
+        "Error Town,2024-05-03,abc,Odd,40,12\n"     # line 4
+        "Error Town,2024-05-04,20,Ok,50.5,12\n"     # line 5
+        "Error Town,05/05/2024,20,Ok,50,-1\n"       # line 6
+        ",2024-05-06,20,Ok,50,1\n"                  # line 7
+        "Error Town,2024-05-07,20,Ok,50,1\n"        # line 8: fine
+    ))
+    assert report["rows"] == 7 and report["imported"] == 1 and report["failed"] == 6
+    assert report["errors"] == [
+        {"line": 2, "error": "Temperature out of range (-100 to 100 °C)"},
+        {"line": 3, "error": "Expected 6 fields, got 3"},
+        {"line": 4, "error": "Invalid temperature"},
+        {"line": 5, "error": "Humidity must be a whole number between 0 and 100"},
+        {"line": 6, "error": "Missing or invalid date, expected YYYY-MM-DD; Wind speed cannot be negative"},
+        {"line": 7, "error": "Missing location"},
+    ]
+    assert list(stored("Error Town")) == ["2024-05-07"]
+
+    report = post_import(client, '{"location": "Error Town"\n[1, 2]\n', "application/x-ndjson")
+    assert report["errors"] == [{"line": 1, "error": "Invalid JSON"}, {"line": 2, "error": "Expected a JSON object"}]
+
+
+def test_rows_crossing_chunk_boundaries(client):
+    body = (CSV_HEADER + "".join(
+        f'Chunk Town,2024-05-{day:02d},{day},"Line one\nline two °C",50,{"-1" if day % 4 == 0 else "5"}\n'
+        for day in range(1, 11)
+    ) + "Chunk Town,2024-05-11\n").encode()
+
+    async def pieces():
+        # 7 bytes at a time: rows, quoted newlines and the UTF-8 "°" are all split across reads
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    report = client.portal.call(lambda: import_weather(pieces(), "csv", chunk_size=3))
+    assert report["rows"] == 11 and report["imported"] == 8
+    assert [error["line"] for error in report["errors"]] == [8, 16, 22]
+    days = stored("Chunk Town")
+    assert len(days) == 8
+    assert days["2024-05-01"] == (1.0, "Line one\nline two °C", 50, 5.0)
+
+
+def test_overwrite_and_keep_empty_columns(client):
+    post_import(client, CSV_HEADER + "Edit Town,2024-05-01,20,Sunny,40,12\nEdit Town,2024-05-02,21,Cloudy,60,8\n")
+    report = post_import(client, CSV_HEADER + "Edit Town,2024-05-01,25,Windy,45,30\nEdit Town,2024-05-02,-3,,,\n")
+    assert report["imported"] == 2
+    assert stored("Edit Town") == {
+        "2024-05-01": (25.0, "Windy", 45, 30.0),  # every column overwritten
+        "2024-05-02": (-3.0, "Cloudy", 60, 8.0),  # empty columns keep the stored values
+    }
+
+
+def test_csv_without_required_columns(client):
+    response = client.post("/weather/import", content=b"Location,Description\nX,Y\n", headers={"content-type": "text/csv"})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "CSV header is missing column(s): date, temperature"
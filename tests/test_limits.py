@@ -0,0 +1,49 @@
+"""Token buckets (limits.py) on the SQLite store shared by workers."""
+
+import asyncio
+import sqlite3
+import time
+
+from app.limits import SQLiteBucketStore, UpstreamLimiter
+
+
+def test_near_quota_only_reads(tmp_path):
+    limiter = UpstreamLimiter(SQLiteBucketStore(str(tmp_path / "buckets.db")), {"api": (60, 10)})
+    assert asyncio.run(limiter.near_quota("api")) is False
+    with sqlite3.connect(tmp_path / "buckets.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM token_buckets").fetchone() == (0,)
+
+
+def test_locked_store_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    limiter = UpstreamLimiter(SQLiteBucketStore(path), {"api": (60, 10)})
+    asyncio.run(limiter.acquire("api"))
+
+    # Another worker holds the write lock for a while
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        # Readers don't wait for the lock
+        assert await asyncio.wait_for(limiter.near_quota("api"), 0.2) is False
+        acquire = asyncio.create_task(limiter.acquire("api"))
+        await asyncio.sleep(0.3)
+        other.execute("COMMIT")
+        await acquire
+        ticker.cancel()
+        return ticks
+
+    started = time.monotonic()
+    ticks = asyncio.run(main())
+    assert time.monotonic() - started >= 0.3
+    # The loop kept running while acquire waited for the lock
+    assert ticks >= 15
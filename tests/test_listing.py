@@ -0,0 +1,87 @@
+"""GET /weather (main.get_all_weather): keyset pages, filters and NDJSON streaming."""
+
+import json
+from datetime import date, datetime
+
+import pytest
+
+from app.crud import insert_weather_rows
+from app.database import SessionLocal
+
+LOCATIONS = ["Page Town", "Other Page Town"]
+DAYS = [date(2023, 3, day) for day in range(1, 6)]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def rows(client):
+    # Both locations on every day: rows share dates, pages must still split them on id
+    with SessionLocal() as db:
+        insert_weather_rows(db, [
+            {"location": location, "date": day, "temperature": float(day.day), "description": "Sunny",
+             "humidity": 50, "wind_speed": 10.0, "fetched_at": datetime(2023, 3, 1)}
+            for day in DAYS for location in LOCATIONS
+        ])
+
+
+def walk(client, **params):
+    # Every page in turn, following X-Next-Cursor; returns (rows, number of pages)
+    rows, pages, cursor = [], 0, None
+    while True:
+        response = client.get("/weather", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        rows.extend(response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows, pages
+        assert int(cursor) == rows[-1]["id"]
+
+
+def test_cursor_walks_every_row_once(client):
+    rows, pages = walk(client, start_date="2023-03-01", end_date="2023-03-31", limit=3)
+    assert pages == 4  # 10 rows, 3 a page
+    ids = [row["id"] for row in rows]
+    assert ids == sorted(set(ids))
+    assert sorted((row["location"], row["date"]) for row in rows) == \
+        sorted((location, str(day)) for day in DAYS for location in LOCATIONS)
+
+
+def test_last_full_page_has_no_cursor(client):
+    response = client.get("/weather", params={"location": "Page Town", "limit": 5})
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({"location": "page town"}, {("Page Town", str(day)) for day in DAYS}),
+    ({"location": "Page Town", "start_date": "2023-03-02", "end_date": "2023-03-03"},
+     {("Page Town", "2023-03-02"), ("Page Town", "2023-03-03")}),
+    ({"start_date": "2023-03-05", "end_date": "2023-03-05"},
+     {(location, "2023-03-05") for location in LOCATIONS}),
+    ({"location": "Page Town", "start_date": "2023-04-01"}, set()),
+])
+def test_filters(client, params, expected):
+    rows, _ = walk(client, limit=2, **params)
+    assert {(row["location"], row["date"]) for row in rows} == expected
+
+
+def test_cursor_past_the_end_and_before_the_start(client):
+    rows, _ = walk(client, location="Page Town")
+    after_last = client.get("/weather", params={"location": "Page Town", "cursor": rows[-1]["id"]})
+    assert after_last.json() == [] and "X-Next-Cursor" not in after_last.headers
+    assert client.get("/weather", params={"location": "Page Town", "cursor": -1}).json() == rows
+
+
+@pytest.mark.parametrize("params", [{"cursor": "abc"}, {"cursor": ""}, {"cursor": "1.5"}, {"limit": 0}])
+def test_invalid_cursor_or_limit(client, params):
+    assert client.get("/weather", params=params).status_code == 422
+
+
+def test_ndjson_streams_rows_after_the_cursor(client):
+    rows, _ = walk(client, location="Other Page Town")
+    response = client.get("/weather", params={"location": "Other Page Town", "format": "ndjson", "cursor": rows[1]["id"]})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == rows[2:]
+
+    limited = client.get("/weather", params={"location": "Other Page Town", "format": "ndjson", "limit": 2})
+    assert [json.loads(line) for line in limited.text.splitlines()] == rows[:2]
@@ -0,0 +1,77 @@
+"""crud.agenerate_summaries_llm in parallel and batched mode, with the fake LLM from conftest.py."""
+
+import logging
+from datetime import date
+
+import app.crud as crud
+from app.crud import FALLBACK_SUMMARY, agenerate_summaries_llm
+from app.metrics import llm_summary_failures
+
+
+def days(*locations):
+    return [{"location": location, "date": date(2024, 5, 1), "temperature": 20.0, "humidity": 50,
+             "wind_speed": 10.0, "description": "Sunny"} for location in locations]
+
+
+def summarize(client, batch, **options):
+    return client.portal.call(lambda: agenerate_summaries_llm(batch, cache=False, **options))
+
+
+def summaries(results):
+    return [result["summary"] for result in results]
+
+
+def test_parallel_mode_makes_one_call_per_day(client, llm):
+    results = summarize(client, days("Para A", "Para B", "Para C"), mode="parallel")
+    assert summaries(results) == ["LLM summary for Para A", "LLM summary for Para B", "LLM summary for Para C"]
+    assert llm.calls == {"llm": 3}
+
+
+def test_batched_mode_makes_one_call(client, llm):
+    results = summarize(client, days("Batch A", "Batch B", "Batch C"), mode="batched")
+    assert summaries(results) == ["LLM summary for Batch A", "LLM summary for Batch B", "LLM summary for Batch C"]
+    assert llm.calls == {"llm_batch": 1}
+
+
+def test_failed_batch_falls_back_to_per_day_calls(client, llm, caplog):
+    llm.fail.add("Broken Batch B")
+    failures = llm_summary_failures.value(call="batched", error="RuntimeError")
+    with caplog.at_level(logging.WARNING, logger=crud.logger.name):
+        results = summarize(client, days("Broken Batch A", "Broken Batch B"), mode="batched")
+
+    assert results[0]["summary"] == "LLM summary for Broken Batch A"
+    assert results[1] is FALLBACK_SUMMARY
+    assert llm.calls == {"llm_batch": 1, "llm": 2}
+    assert llm_summary_failures.value(call="batched", error="RuntimeError") == failures + 1
+    assert any("RuntimeError: LLM is down" in message for message in caplog.messages)
+
+
+def test_timeout_falls_back_per_day(client, llm, caplog):
+    llm.slow["Slow Day"] = 1.0
+    timeouts = llm_summary_failures.value(call="per_day", error="TimeoutError")
+    with caplog.at_level(logging.WARNING, logger=crud.logger.name):
+        results = summarize(client, days("Quick Day", "Slow Day"), mode="parallel", timeout=0.2)
+
+    # Only the slow day misses its budget
+    assert results[0]["summary"] == "LLM summary for Quick Day"
+    assert results[1] is FALLBACK_SUMMARY
+    assert llm_summary_failures.value(call="per_day", error="TimeoutError") == timeouts + 1
+    assert any("Slow Day" in message and "TimeoutError" in message for message in caplog.messages)
+
+
+def test_batched_timeout_falls_back_for_every_day(client, llm):
+    llm.slow["Slow Batch B"] = 1.0
+    results = summarize(client, days("Slow Batch A", "Slow Batch B"), mode="batched", timeout=0.2)
+    assert results == [FALLBACK_SUMMARY, FALLBACK_SUMMARY]
+    # A timed out batch isn't retried day by day: the budget is already spent
+    assert llm.calls == {"llm_batch": 1}
+
+
+def test_incomplete_answer_is_a_failure(client, llm, monkeypatch):
+    async def incomplete(prompt_value):
+        return {"summary": "Sunny", "clothes": "", "precautions": "None"}
+
+    monkeypatch.setattr(llm, "ainvoke", incomplete)
+    errors = llm_summary_failures.value(call="per_day", error="ValueError")
+    assert summarize(client, days("Half Day"), mode="parallel") == [FALLBACK_SUMMARY]
+    assert llm_summary_failures.value(call="per_day", error="ValueError") == errors + 1
@@ -0,0 +1,45 @@
+"""metrics.py: dependency error counting and the /metrics endpoint."""
+
+import asyncio
+
+import pytest
+
+from app.metrics import dependency_duration, track_dependency, upstream_errors
+
+
+def calls_timed(dependency):
+    prefix = f'dependency_duration_seconds_count{{dependency="{dependency}"}} '
+    return sum(int(line[len(prefix):]) for line in dependency_duration.render() if line.startswith(prefix))
+
+
+def test_errors_are_counted():
+    with pytest.raises(ValueError):
+        with track_dependency("test_failing"):
+            raise ValueError("bad answer")
+    assert upstream_errors.value(dependency="test_failing", error="ValueError") == 1
+    assert calls_timed("test_failing") == 1
+
+
+def test_cancellation_is_not_an_error():
+    async def slow_call():
+        with track_dependency("test_cancelled"):
+            await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(slow_call())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert upstream_errors.value(dependency="test_cancelled", error="CancelledError") == 0
+    assert calls_timed("test_cancelled") == 1
+
+
+def test_metrics_endpoint(client):
+    with track_dependency("test_rendered"):
+        pass
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'dependency_duration_seconds_count{dependency="test_rendered"} 1' in response.text
@@ -0,0 +1,65 @@
+"""Duplicate rows left by old databases (migrations 0001 and 0005), on a throwaway SQLite file."""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import app.models as models
+from app.crud import ensure_weather_unique_index
+from app.locations import merge_duplicate_locations
+
+DAY = date(2024, 5, 1)
+NEXT_DAY = date(2024, 5, 2)
+OLD_FETCH = datetime(2024, 4, 1)
+NEW_FETCH = datetime(2024, 4, 30)
+
+# (location, date, temperature, fetched_at): temperature tells the rows apart
+DUPLICATES = [
+    ("San Ramon", DAY, 1.0, OLD_FETCH),
+    ("San Ramon", DAY, 2.0, OLD_FETCH),         # same fetch as the first: the older row wins
+    ("San Ramon", NEXT_DAY, 3.0, OLD_FETCH),
+    ("San Ramon", NEXT_DAY, 4.0, NEW_FETCH),    # fetched later: wins
+    ("Dublin", DAY, 5.0, NEW_FETCH),
+    ("Dublin", DAY, 6.0, None),                 # edited by hand: wins
+]
+
+
+def kept(db):
+    return sorted(db.execute(text("SELECT location, temperature FROM weather")).fetchall())
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+
+
+def test_unique_index_migration_keeps_one_row_per_day(engine):
+    with Session(engine) as db:
+        db.execute(text(
+            "CREATE TABLE weather (id INTEGER PRIMARY KEY, location VARCHAR NOT NULL, date DATE NOT NULL, "
+            "temperature FLOAT NOT NULL, description VARCHAR, humidity INTEGER, wind_speed FLOAT, fetched_at TIMESTAMP)"
+        ))
+        for location, day, temperature, fetched_at in DUPLICATES:
+            db.execute(text(
+                "INSERT INTO weather (location, date, temperature, fetched_at) VALUES (:l, :d, :t, :f)"
+            ), {"l": location, "d": day, "t": temperature, "f": fetched_at})
+        db.commit()
+
+        ensure_weather_unique_index(db)
+        assert kept(db) == [("Dublin", 6.0), ("San Ramon", 1.0), ("San Ramon", 4.0)]
+
+
+def test_location_merge_uses_the_same_rule_and_keeps_the_display_name(engine):
+    models.Base.metadata.create_all(engine)
+    spellings = ["san ramon ", "SAN RAMON", "San Ramon", "san ramon", "Dublin", "dublin"]
+    with Session(engine) as db:
+        # Every row under a spelling of its own, the way rows were stored before canonical locations
+        for spelling, (_, day, temperature, fetched_at) in zip(spellings, DUPLICATES):
+            db.add(models.Weather(location=spelling, date=day, temperature=temperature, fetched_at=fetched_at))
+        db.commit()
+
+        merge_duplicate_locations(db)
+        assert kept(db) == [("Dublin", 6.0), ("San Ramon", 1.0), ("San Ramon", 4.0)]
+        assert sorted(name for (name,) in db.query(models.Location.name)) == ["Dublin", "San Ramon"]
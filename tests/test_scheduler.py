@@ -0,0 +1,52 @@
+"""ForecastScheduler prefetch against the fake upstreams in conftest.py."""
+
+import asyncio
+
+import httpx
+
+import app.scheduler as scheduler
+import app.shared_cache as shared_cache
+from app.shared_cache import SQLiteCacheStore
+from tests.test_weather import search, stored_days
+
+
+def test_prefetch_fills_missing_days_of_popular_location(client, upstreams, monkeypatch):
+    assert search(client, "Prefetch Point").status_code == 200
+    assert stored_days("Prefetch Point, Testshire") == 3
+
+    popularity = scheduler.PopularityTracker()
+    popularity.record("Prefetch Point, Testshire")
+    monkeypatch.setattr(scheduler, "popularity", popularity)
+
+    forecast_scheduler = scheduler.ForecastScheduler(
+        httpx.AsyncClient(transport=httpx.MockTransport(upstreams.handler)), "test-weather-key"
+    )
+    client.portal.call(forecast_scheduler.run_once)
+
+    assert stored_days("Prefetch Point, Testshire") == scheduler.FORECAST_DAYS
+    assert upstreams.calls["forecast.json"] == 2
+    # Known canonical name: no location lookup upstream
+    assert upstreams.calls["search.json"] == 1
+
+
+def test_workers_refresh_a_location_once_per_cycle(client, upstreams, tmp_path, monkeypatch):
+    assert search(client, "Shared Refresh Town").status_code == 200
+    # Two workers sharing one SQLite L2, both finding the location stale at the same time
+    monkeypatch.setattr(shared_cache, "store", SQLiteCacheStore(str(tmp_path / "shared.db")))
+    monkeypatch.setattr(shared_cache, "_skip_store_until", 0.0)
+    upstreams.delay = 0.2
+    workers = [
+        scheduler.ForecastScheduler(httpx.AsyncClient(transport=httpx.MockTransport(upstreams.handler)), "test-weather-key")
+        for _ in range(2)
+    ]
+
+    async def refresh_everywhere():
+        await asyncio.gather(*(worker.refresh_location("Shared Refresh Town, Testshire") for worker in workers))
+
+    client.portal.call(refresh_everywhere)
+    # One call for the search, one for the refresh
+    assert upstreams.calls["forecast.json"] == 2
+
+    # Still claimed: a later cycle within PREFETCH_CLAIM_SECONDS skips it too
+    client.portal.call(refresh_everywhere)
+    assert upstreams.calls["forecast.json"] == 2
@@ -0,0 +1,160 @@
+"""
+shared_cache.py: the RESP client and Redis store against benchmarks/fake_redis.py, and the
+TieredCache async paths over a SQLite L2.
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+import app.shared_cache as shared_cache
+from app.shared_cache import RedisCacheStore, RedisConnection, RedisError, SQLiteCacheStore, TieredCache
+from benchmarks.fake_redis import Store, create_server
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(create_server(Store(), "127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+# -------------------------------
+# RESP client
+# -------------------------------
+def test_resp_round_trip(redis_url):
+    conn = RedisConnection(redis_url)
+    try:
+        # Bulk strings are length-prefixed: separators and non-ASCII text come back unchanged
+        value = 'line one\r\nline two, 20°C "sunny"'
+        assert conn.execute("SET", "resp:a", value) == "OK"
+        assert conn.execute("GET", "resp:a") == value
+        assert conn.execute("GET", "resp:missing") is None
+        assert conn.execute("MGET", "resp:a", "resp:missing") == [value, None]
+        assert conn.execute("SADD", "resp:set", "x", "y") == 2
+        assert conn.execute("SMEMBERS", "resp:set") == ["x", "y"]
+        assert conn.pipeline(("SET", "resp:b", "1", "PX", 60000, "NX"), ("SET", "resp:b", "2", "NX")) == ["OK", None]
+        assert conn.execute("DEL", "resp:a", "resp:b", "resp:missing") == 2
+    finally:
+        conn.close()
+
+
+def test_resp_error_reply_raises_and_connection_stays_usable(redis_url):
+    conn = RedisConnection(redis_url)
+    try:
+        with pytest.raises(RedisError, match="unknown command"):
+            conn.pipeline(("NOSUCHCOMMAND",), ("SET", "resp:after", "ok"))
+        # Every reply of the pipeline was read, so the next command gets its own reply
+        assert conn.execute("GET", "resp:after") == "ok"
+    finally:
+        conn.close()
+
+
+def test_redis_store_tags_and_locks(redis_url):
+    redis = RedisCacheStore(redis_url, prefix="test-store:")
+    redis.set("a", "1", ttl=60, tag="t1")
+    redis.set("b", "2", ttl=60, tag="t2")
+    assert redis.get_many(["a", "b", "c"]) == {"a": "1", "b": "2"}
+
+    redis.invalidate(["t1"])
+    assert redis.get_many(["a", "b"]) == {"b": "2"}
+
+    assert redis.add("lock", "me", ttl=60) is True
+    assert redis.add("lock", "other", ttl=60) is False
+    redis.delete("lock")
+    assert redis.add("lock", "other", ttl=60) is True
+
+
+def test_redis_store_invalidation_messages(redis_url):
+    redis = RedisCacheStore(redis_url, prefix="test-pubsub:")
+    received, stop = [], threading.Event()
+    delivered = threading.Event()
+
+    def callback(message):
+        received.append(message)
+        delivered.set()
+
+    listener = threading.Thread(target=redis.listen, args=(callback, stop), daemon=True)
+    listener.start()
+    # The subscription is in place once a publish reaches someone
+    for _ in range(100):
+        if redis._pipeline(("PUBLISH", redis.channel, "hello"))[0]:
+            break
+        stop.wait(0.02)
+    assert delivered.wait(2)
+    assert received[0] == "hello"
+
+    stop.set()
+    redis.interrupt()
+    listener.join(2)
+    assert not listener.is_alive()
+
+
+# -------------------------------
+# TieredCache over a SQLite L2
+# -------------------------------
+class RecordingStore(SQLiteCacheStore):
+    # Remembers which threads touched the store
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def _connection(self):
+        self.threads.add(threading.get_ident())
+        return super()._connection()
+
+
+@pytest.fixture
+def l2(tmp_path, monkeypatch):
+    store = RecordingStore(str(tmp_path / "shared.db"))
+    monkeypatch.setattr(shared_cache, "store", store)
+    monkeypatch.setattr(shared_cache, "_skip_store_until", 0.0)
+    return store
+
+
+def test_async_paths_keep_l2_off_the_event_loop(l2):
+    worker_a = TieredCache("tiered-a", maxsize=10, ttl=60)
+
+    async def main():
+        await worker_a.aset("k", {"v": 1}, tag="t")
+        assert await worker_a.aget("k") == {"v": 1}  # L1
+        # A second worker (own L1, same L2) finds it there
+        worker_b = TieredCache("tiered-a", maxsize=10, ttl=60)
+        assert await worker_b.aget_many(["k", "missing"]) == {"k": {"v": 1}}
+        await worker_b.ainvalidate(["t"])
+        assert await TieredCache("tiered-a", maxsize=10, ttl=60).aget("k") is None
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert l2.threads and loop_thread not in l2.threads
+
+
+def test_fetch_waits_for_another_worker(l2):
+    cache = TieredCache("tiered-b", maxsize=10, ttl=60)
+    other_worker = TieredCache("tiered-b", maxsize=10, ttl=60)
+    # Another worker is fetching this key
+    assert l2.add(cache._key("lock:k"), "other", 10)
+    l2.threads.clear()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return "fetched here"
+
+    async def main():
+        waiting = asyncio.create_task(cache.fetch("k", fetch))
+        await asyncio.sleep(0.2)
+        await other_worker.aset("k", "fetched there")
+        return await asyncio.wait_for(waiting, 2), threading.get_ident()
+
+    value, loop_thread = asyncio.run(main())
+    assert value == "fetched there"
+    assert calls == []
+    assert loop_thread not in l2.threads
+    assert json.loads(l2.get_many([cache._key("k")])[cache._key("k")]) == [None, "fetched there"]
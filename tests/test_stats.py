@@ -0,0 +1,68 @@
+"""GET /weather/stats (stats.py): exact percentiles from the weather_stats rollups alone."""
+
+import re
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+import app.stats as stats
+from app.crud import insert_weather_rows
+from app.database import SessionLocal, engine
+
+HUMIDITY = {date(2024, 5, 1): 47, date(2024, 5, 2): 74, date(2024, 6, 1): 92, date(2025, 1, 1): 30}
+
+
+def add_days(location):
+    with SessionLocal() as db:
+        insert_weather_rows(db, [
+            {"location": location, "date": day, "temperature": 20.0 + day.day, "description": "Sunny",
+             "humidity": humidity, "wind_speed": 10.0, "fetched_at": datetime(2024, 5, 1)}
+            for day, humidity in HUMIDITY.items()
+        ])
+
+
+@pytest.fixture
+def statements():
+    # SQL run while the test holds it
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def humidity_stats(client, location, period):
+    response = client.get("/weather/stats", params={"location": location, "period": period})
+    assert response.status_code == 200
+    return {row["period"]: row["humidity"] for row in response.json()}
+
+
+@pytest.mark.parametrize("period, groups", [
+    ("month", {"2024-05": [47, 74], "2024-06": [92], "2025-01": [30]}),
+    ("year", {"2024": [47, 74, 92], "2025": [30]}),
+    ("all", {"all": [47, 74, 92, 30]}),
+])
+def test_percentiles_are_exact_for_every_period(client, statements, period, groups):
+    location = f"Stats Town {period.title()}"
+    add_days(location)
+    statements.clear()
+
+    humidity = humidity_stats(client, location, period)
+    assert set(humidity) == set(groups)
+    for key, values in groups.items():
+        assert humidity[key]["count"] == len(values)
+        assert humidity[key]["min"] == min(values) and humidity[key]["max"] == max(values)
+        assert [humidity[key][f"p{p}"] for p in stats.DEFAULT_PERCENTILES] == \
+            list(np.percentile(values, stats.DEFAULT_PERCENTILES).round(2))
+    # The rollups alone answer the query
+    assert statements and not any(re.search(r"\bweather\b", statement) for statement in statements)
+
+
+def test_year_p25_is_not_a_bin_estimate(client):
+    add_days("Exact Stats Town")
+    assert humidity_stats(client, "Exact Stats Town", "year")["2024"]["p25"] == 60.5
@@ -0,0 +1,140 @@
+"""Summary backends and the auto policy (summarizers.py), with the fake LLM from conftest.py."""
+
+from datetime import date
+
+import pytest
+
+import app.summarizers as summarizers
+from app.summarizers import CircuitBreaker, LocalSummarizer, SummaryPolicy
+
+
+def day(location, temperature=20.0, humidity=50, wind_speed=10.0, description="Partly cloudy", day_number=1):
+    return {"location": location, "date": date(2024, 5, day_number), "temperature": temperature,
+            "humidity": humidity, "wind_speed": wind_speed, "description": description}
+
+
+# -------------------------------
+# LocalSummarizer
+# -------------------------------
+@pytest.mark.parametrize("temperature, feel, clothes", [
+    (-5, "freezing", "heavy winter coat"),
+    (5, "cold", "warm jacket"),
+    (15, "cool", "light jacket"),
+    (20, "pleasant", "light layers"),
+    (28, "warm", "breathable"),
+    (35, "hot", "wide-brimmed hat"),
+])
+def test_local_temperature_bands(temperature, feel, clothes):
+    summary = LocalSummarizer().summarize(day("Rule Town", temperature=temperature))
+    assert f"{feel} temperatures" in summary["summary"]
+    assert clothes in summary["clothes"].lower()
+
+
+@pytest.mark.parametrize("humidity, wind_speed, text", [
+    (85, 10, "humid air"),
+    (20, 10, "dry air"),
+    (50, 30, "breezy conditions"),
+    (50, 60, "strong winds"),
+    (50, 10, "light winds"),
+])
+def test_local_humidity_and_wind(humidity, wind_speed, text):
+    assert text in LocalSummarizer().summarize(day("Rule Town", humidity=humidity, wind_speed=wind_speed))["summary"]
+
+
+def test_local_precautions_follow_the_description():
+    local = LocalSummarizer()
+    rainy = local.summarize(day("Rule Town", description="Light rain shower"))
+    assert "umbrella" in rainy["clothes"] and "umbrella" in rainy["precautions"]
+    assert "sunscreen" in local.summarize(day("Rule Town", temperature=22, description="Sunny"))["precautions"]
+    assert "lightning" in local.summarize(day("Rule Town", description="Thundery outbreaks"))["precautions"]
+    assert local.summarize(day("Rule Town"))["precautions"] == "No special precautions needed, enjoy your day."
+
+
+# -------------------------------
+# CircuitBreaker
+# -------------------------------
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(summarizers.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_failures_in_a_row(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the run
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    clock[0] += 59
+    assert not breaker.allow()
+
+    clock[0] += 1
+    assert breaker.allow()
+    assert not breaker.allow()  # concurrent requests don't all become trial calls
+
+    # Failed trial: open for another reset_seconds
+    breaker.record_failure()
+    clock[0] += 30
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
+
+    # Successful trial: closed again
+    breaker.record_success()
+    assert not breaker.is_open and breaker.allow() and breaker.allow()
+
+
+# -------------------------------
+# SummaryPolicy (auto)
+# -------------------------------
+def test_failed_days_fall_back_one_by_one(client, llm):
+    llm.fail.add("Fallback Town B")
+    days = [day("Fallback Town A"), day("Fallback Town B"), day("Fallback Town C")]
+    summaries = client.portal.call(SummaryPolicy("auto", breaker=CircuitBreaker(5, 60)).summarize, days)
+
+    assert summaries[0]["summary"] == "LLM summary for Fallback Town A"
+    assert summaries[1] == LocalSummarizer().summarize(days[1])
+    assert summaries[2]["summary"] == "LLM summary for Fallback Town C"
+
+
+def test_breaker_counts_each_failed_call(client, llm):
+    llm.fail.update({"Counted Town A", "Counted Town B", "Counted Town C"})
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    policy = SummaryPolicy("auto", breaker=breaker)
+
+    client.portal.call(policy.summarize, [day("Counted Town A"), day("Counted Town B"), day("Counted Town C")])
+    assert llm.calls["llm"] == 3
+    assert breaker.is_open
+
+    # Open: nothing goes to the LLM
+    assert client.portal.call(policy.summarize, [day("Counted Town D")]) == [LocalSummarizer().summarize(day("Counted Town D"))]
+    assert llm.calls["llm"] == 3
+
+
+def test_cache_hits_do_not_reset_the_breaker(client, llm):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    policy = SummaryPolicy("auto", breaker=breaker)
+    cached_day = day("Popular Town")
+    client.portal.call(policy.summarize, [cached_day])
+    assert llm.calls["llm"] == 1
+
+    # The LLM goes down; the popular city keeps being served from the summary cache
+    llm.fail.update({"Quiet Town A", "Quiet Town B"})
+    client.portal.call(policy.summarize, [day("Quiet Town A")])
+    for _ in range(3):
+        assert client.portal.call(policy.summarize, [cached_day])[0]["summary"] == "LLM summary for Popular Town"
+    assert breaker.failures == 1
+
+    client.portal.call(policy.summarize, [day("Quiet Town B")])
+    assert breaker.is_open
+    assert llm.calls["llm"] == 3
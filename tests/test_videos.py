@@ -0,0 +1,66 @@
+"""YouTube videos on the weather page (videos.py) against the fake upstreams in conftest.py."""
+
+import time
+
+import app.models as models
+from app.database import SessionLocal
+from app.limits import MemoryBucketStore, upstream_limiter
+from tests.test_weather import search
+
+
+def stored_videos(name):
+    with SessionLocal() as db:
+        return db.query(models.LocationVideos)\
+            .join(models.Location, models.Location.id == models.LocationVideos.location_id)\
+            .filter(models.Location.name == name).count()
+
+
+def streamed_videos(client, name):
+    # The videos slot of a streamed page: filled in once the location's search is done
+    page = search(client, name, stream="true").text
+    return page.split('<template data-slot="youtube-slot">', 1)[1].split("</template>", 1)[0]
+
+
+def test_videos_searched_once_per_location(client, upstreams):
+    assert "watch?v=video0" in streamed_videos(client, "Tube Town")
+    assert "watch?v=video0" in search(client, "tube town").text
+    assert upstreams.calls["search"] == 1
+    assert stored_videos("Tube Town, Testshire") == 1
+
+
+def test_first_search_does_not_hold_up_the_page(client, upstreams):
+    upstreams.slow["search"] = 1.0
+    started = time.perf_counter()
+    page = search(client, "Slow Tube Town").text
+    assert time.perf_counter() - started < 1.0
+    assert "Slow Tube Town" in page and "watch?v=" not in page
+
+    # The search started by the first page is still running: the streamed page waits for it
+    assert "watch?v=video0" in streamed_videos(client, "Slow Tube Town")
+    assert "watch?v=video0" in search(client, "Slow Tube Town").text
+    assert upstreams.calls["search"] == 1
+
+
+def test_quota_exceeded_is_not_cached_and_stops_searches(client, upstreams, monkeypatch):
+    monkeypatch.setattr(upstream_limiter, "store", MemoryBucketStore())
+    upstreams.fail["search"] = 403
+
+    assert "watch?v=" not in streamed_videos(client, "Quota Town")
+    assert upstreams.calls["search"] == 1
+    assert stored_videos("Quota Town, Testshire") == 0
+
+    # The quota is gone: no more searches until YOUTUBE_QUOTA_RETRY_SECONDS have passed
+    assert "watch?v=" not in streamed_videos(client, "Quota Town")
+    assert "watch?v=" not in streamed_videos(client, "Other Quota Town")
+    assert upstreams.calls["search"] == 1
+
+
+def test_failed_search_is_retried(client, upstreams):
+    upstreams.fail["search"] = 500
+    assert "watch?v=" not in streamed_videos(client, "Flaky Tube City")
+    assert stored_videos("Flaky Tube City, Testshire") == 0
+
+    del upstreams.fail["search"]
+    assert "watch?v=video0" in streamed_videos(client, "Flaky Tube City")
+    assert upstreams.calls["search"] == 2
+    assert stored_videos("Flaky Tube City, Testshire") == 1
@@ -0,0 +1,130 @@
+"""POST /weather and GET /search_location against the fake upstreams in conftest.py."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import app.models as models
+from app.database import DB_POOL_SIZE, DB_POOL_TIMEOUT, SessionLocal
+
+
+def search(client, location, days=3, **form):
+    today = date.today()
+    return client.post("/weather", data={
+        "location": location,
+        "start_date": str(today),
+        "end_date": str(today + timedelta(days=days - 1)),
+        **form,
+    })
+
+
+def stored_days(name):
+    with SessionLocal() as db:
+        return db.query(models.Weather).filter(models.Weather.location == name).count()
+
+
+def test_weather_fetches_forecast_once_then_serves_stored_days(client, upstreams):
+    response = search(client, "Alpha Town")
+    assert response.status_code == 200
+    assert response.text.count('class="weather-card"') == 3
+    assert "Server-Timing" in response.headers
+    assert upstreams.calls["search.json"] == 1
+    assert upstreams.calls["forecast.json"] == 1
+    assert stored_days("Alpha Town, Testshire") == 3
+
+    # Another spelling of the same place: answered from the DB, no upstream call
+    response = search(client, "  alpha town ")
+    assert response.text.count('class="weather-card"') == 3
+    assert upstreams.calls["search.json"] == 1
+    assert upstreams.calls["forecast.json"] == 1
+
+
+def test_weather_streamed_page(client, upstreams):
+    response = search(client, "Streamville", stream="true")
+    assert response.status_code == 200
+    assert response.text.count('data-slot="card-') == 3
+    assert 'data-slot="youtube-slot"' in response.text
+    assert response.text.rstrip().endswith("</html>")
+
+
+def test_weather_unknown_location(client, upstreams):
+    response = search(client, "Nowhere Land")
+    assert response.status_code == 200
+    assert "Location &#39;Nowhere Land&#39; not found or invalid." in response.text
+    assert upstreams.calls["forecast.json"] == 0
+
+
+def test_weather_search_upstream_error(client, upstreams):
+    upstreams.fail["search.json"] = 500
+    response = search(client, "Broken Search City")
+    assert response.status_code == 200
+    assert "500 Internal Server Error" in response.text
+    assert 'class="weather-card"' not in response.text
+    assert upstreams.calls["forecast.json"] == 0
+
+
+def test_weather_forecast_upstream_error(client, upstreams):
+    upstreams.fail["forecast.json"] = 503
+    response = search(client, "Broken Forecast City")
+    assert "503 Service Unavailable" in response.text
+    assert stored_days("Broken Forecast City, Testshire") == 0
+
+    # The failure isn't cached: the next search fetches again and stores the days
+    del upstreams.fail["forecast.json"]
+    response = search(client, "Broken Forecast City")
+    assert response.text.count('class="weather-card"') == 3
+    assert stored_days("Broken Forecast City, Testshire") == 3
+
+
+def test_weather_concurrent_requests_do_not_exhaust_the_pool(client, upstreams):
+    # More requests than pooled connections, all waiting on slow upstreams at the same time:
+    # no request may hold a connection while it waits, or the rest stall for DB_POOL_TIMEOUT
+    upstreams.delay = 0.3
+    requests = DB_POOL_SIZE * 3
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        responses = list(pool.map(lambda i: search(client, f"Pool Town {i}"), range(requests)))
+    elapsed = time.monotonic() - started
+
+    assert [r.status_code for r in responses] == [200] * requests
+    assert all(r.text.count('class="weather-card"') == 3 for r in responses)
+    assert elapsed < DB_POOL_TIMEOUT
+
+
+def test_weather_rejects_bad_dates(client, upstreams):
+    today = date.today()
+    response = client.post("/weather", data={
+        "location": "Alpha Town", "start_date": str(today + timedelta(days=2)), "end_date": str(today),
+    })
+    assert "Start date must be before end date" in response.text
+    assert sum(upstreams.calls.values()) == 0
+
+
+def test_search_location_short_query(client, upstreams):
+    assert client.get("/search_location", params={"q": "a"}).json() == {"locations": []}
+    assert sum(upstreams.calls.values()) == 0
+
+
+def test_search_location_upstream_then_local_index(client, upstreams):
+    response = client.get("/search_location", params={"q": "Gamma Bay"})
+    assert response.json() == {"locations": ["Gamma Bay, Testshire"]}
+    assert upstreams.calls["search.json"] == 1
+
+    # Same prefix again: answered from the cache and the local index
+    response = client.get("/search_location", params={"q": "gamma bay"})
+    assert response.json() == {"locations": ["Gamma Bay, Testshire"]}
+    assert upstreams.calls["search.json"] == 1
+
+    # Submitting a suggestion needs no lookup either
+    response = search(client, "Gamma Bay, Testshire")
+    assert response.text.count('class="weather-card"') == 3
+    assert upstreams.calls["search.json"] == 1
+
+
+def test_search_location_upstream_error(client, upstreams):
+    upstreams.fail["search.json"] = 500
+    response = client.get("/search_location", params={"q": "Delta Falls"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["locations"] == []
+    assert "500 Internal Server Error" in body["error"]